@@ -174,6 +174,7 @@ cdef extern from "semaphore.h" nogil:
         long tv_sec
         long tv_nsec
     int sem_init(sem_t *sem, int pshared, unsigned int value)
+    int sem_destroy(sem_t *sem)
     int sem_wait(sem_t *sem)
     int sem_trywait(sem_t *sem)
     int sem_timedwait(sem_t *sem, const timespec *abs_timeout)
@@ -269,6 +270,7 @@ cdef extern from "ldms.h" nogil:
     ctypedef void (*ldms_dir_cb_t)(ldms_t t, int status, ldms_dir_t dir, void *cb_arg)
     int ldms_xprt_dir(ldms_t x, ldms_dir_cb_t cb, void *cb_arg, uint32_t flags)
     void ldms_xprt_dir_free(ldms_t t, ldms_dir_t dir)
+    int ldms_xprt_dir_cancel(ldms_t t)
 
     # --- lookup operation related --- #
     cpdef enum ldms_lookup_flags:
@@ -420,6 +422,14 @@ cdef extern from "ldms.h" nogil:
     int ldms_type_is_array(ldms_value_type t)
     ldms_value_type ldms_metric_type_get(ldms_set_t s, int i)
     ldms_mval_t ldms_metric_get(ldms_set_t s, int i)
+    ldms_mval_t ldms_metric_get_addr(ldms_set_t s, int i)
+    ldms_mval_t ldms_metric_set_addr(ldms_set_t s, int i)
+    int ldms_metric_flags_get(ldms_set_t s, int i)
+    cpdef enum:
+        MDESC_F_DATA  "LDMS_MDESC_F_DATA"
+        MDESC_F_META  "LDMS_MDESC_F_META"
+        LDMS_MDESC_F_DATA
+        LDMS_MDESC_F_META
     # --- set metric get --- #
     char ldms_metric_get_char(ldms_set_t s, int i)
     uint8_t ldms_metric_get_u8(ldms_set_t s, int i)
@@ -478,6 +488,7 @@ cdef extern from "ldms.h" nogil:
     void ldms_set_put(ldms_set_t s)
     void ldms_ref_get(ldms_set_t s, const char *ref_name)
     void ldms_ref_put(ldms_set_t s, const char *ref_name)
+    void ldms_metric_modify(ldms_set_t s, int i)
     void ldms_metric_set_char(ldms_set_t s, int i, char v)
     void ldms_metric_set_u8(ldms_set_t s, int i, uint8_t v)
     void ldms_metric_set_u16(ldms_set_t s, int i, uint16_t v)
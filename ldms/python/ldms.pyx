@@ -47,15 +47,23 @@ from __future__ import print_function
 from cpython cimport PyObject, Py_INCREF, Py_DECREF, PyGILState_Ensure, \
                      PyGILState_Release, PyGILState_STATE, \
                      PyBytes_FromStringAndSize
+from cpython.buffer cimport PyBUF_WRITABLE, PyBUF_FORMAT, PyBUF_ND, \
+                            PyBUF_STRIDES
 from libc.stdint cimport *
 from libc.stdlib cimport calloc, malloc, free, realloc
+from cpython cimport array as carray
+import array
 import datetime as dt
 import struct
 import io
 import os
 import sys
+import threading
+import asyncio
 import copy
 import json
+import re
+import collections
 from queue import Queue
 cimport cython
 cimport ldms
@@ -114,6 +122,23 @@ def xprt_cb(xprt, ev, arg):
 x.connect(host="localhost", port=10002, cb=xprt_cb, cb_arg=10)
 ```
 
+asyncio Active-side Example
+---------------------------
+```
+import asyncio
+from ovis_ldms import ldms
+ldms.init(16*1024*1024)
+
+async def main():
+    x = ldms.Xprt()
+    await x.aconnect(host="localhost", port=10000)
+    dlist = await x.adir()
+    slist = [ await x.alookup(d.name) for d in dlist ]
+    await asyncio.gather(*[ s.aupdate() for s in slist ])
+
+asyncio.run(main())
+```
+
 Set Data Access Examples
 ------------------------
 ```
@@ -662,6 +687,121 @@ cdef ldms_value_type LDMS_VALUE_TYPE(t):
     return LDMS_VALUE_TYPE_TBL[t]
 
 
+##################################
+### raw data layout (ndarray) ###
+##################################
+
+# The size (in bytes) of a value (or an element of an array) of each type as
+# it is laid out in the set data region.
+METRIC_ELEM_SIZE_TBL = {
+        LDMS_V_CHAR : 1,
+        LDMS_V_U8   : 1,
+        LDMS_V_S8   : 1,
+        LDMS_V_U16  : 2,
+        LDMS_V_S16  : 2,
+        LDMS_V_U32  : 4,
+        LDMS_V_S32  : 4,
+        LDMS_V_U64  : 8,
+        LDMS_V_S64  : 8,
+        LDMS_V_F32  : 4,
+        LDMS_V_D64  : 8,
+
+        LDMS_V_CHAR_ARRAY : 1,
+
+        LDMS_V_U8_ARRAY   : 1,
+        LDMS_V_S8_ARRAY   : 1,
+        LDMS_V_U16_ARRAY  : 2,
+        LDMS_V_S16_ARRAY  : 2,
+        LDMS_V_U32_ARRAY  : 4,
+        LDMS_V_S32_ARRAY  : 4,
+        LDMS_V_U64_ARRAY  : 8,
+        LDMS_V_S64_ARRAY  : 8,
+        LDMS_V_F32_ARRAY  : 4,
+        LDMS_V_D64_ARRAY  : 8,
+    }
+
+# NumPy type string of each metric type. LDMS stores values in little-endian.
+# The char array (string) type is handled separately as "S<len>".
+METRIC_DTYPE_TBL = {
+        LDMS_V_CHAR : "S1",
+        LDMS_V_U8   : "u1",
+        LDMS_V_S8   : "i1",
+        LDMS_V_U16  : "<u2",
+        LDMS_V_S16  : "<i2",
+        LDMS_V_U32  : "<u4",
+        LDMS_V_S32  : "<i4",
+        LDMS_V_U64  : "<u8",
+        LDMS_V_S64  : "<i8",
+        LDMS_V_F32  : "<f4",
+        LDMS_V_D64  : "<f8",
+
+        LDMS_V_U8_ARRAY   : "u1",
+        LDMS_V_S8_ARRAY   : "i1",
+        LDMS_V_U16_ARRAY  : "<u2",
+        LDMS_V_S16_ARRAY  : "<i2",
+        LDMS_V_U32_ARRAY  : "<u4",
+        LDMS_V_S32_ARRAY  : "<i4",
+        LDMS_V_U64_ARRAY  : "<u8",
+        LDMS_V_S64_ARRAY  : "<i8",
+        LDMS_V_F32_ARRAY  : "<f4",
+        LDMS_V_D64_ARRAY  : "<f8",
+    }
+
+# `array.array` type code of the elements of each metric array type
+METRIC_ARRAY_CODE_TBL = {
+        LDMS_V_U8_ARRAY   : "B",
+        LDMS_V_S8_ARRAY   : "b",
+        LDMS_V_U16_ARRAY  : "H",
+        LDMS_V_S16_ARRAY  : "h",
+        LDMS_V_U32_ARRAY  : "I",
+        LDMS_V_S32_ARRAY  : "i",
+        LDMS_V_U64_ARRAY  : "Q",
+        LDMS_V_S64_ARRAY  : "q",
+        LDMS_V_F32_ARRAY  : "f",
+        LDMS_V_D64_ARRAY  : "d",
+    }
+
+# `array.array` type code of the value (or an element) of each numeric type
+METRIC_ELEM_CODE_TBL = dict(METRIC_ARRAY_CODE_TBL)
+METRIC_ELEM_CODE_TBL.update({
+        LDMS_V_U8   : "B",
+        LDMS_V_S8   : "b",
+        LDMS_V_U16  : "H",
+        LDMS_V_S16  : "h",
+        LDMS_V_U32  : "I",
+        LDMS_V_S32  : "i",
+        LDMS_V_U64  : "Q",
+        LDMS_V_S64  : "q",
+        LDMS_V_F32  : "f",
+        LDMS_V_D64  : "d",
+    })
+
+# The kind (unsigned, signed or floating point) of the `memoryview.format`
+# (struct module) element codes
+BUFFER_ELEM_KIND = dict([ (c, "u") for c in "BHILQN" ] +
+                        [ (c, "i") for c in "bhilqn" ] +
+                        [ (c, "f") for c in "efd" ])
+
+# LDMS data is little-endian; raw copies need byte swapping on big-endian hosts
+cdef bint HOST_BIG_ENDIAN = (sys.byteorder == "big")
+
+cdef object METRIC_DTYPE(ldms_value_type t, uint32_t alen):
+    """The NumPy dtype field format of a metric of type `t` and length `alen`"""
+    if t == LDMS_V_CHAR_ARRAY:
+        return "S{}".format(alen)
+    if ldms_type_is_array(t):
+        return (METRIC_DTYPE_TBL[t], (alen,))
+    return METRIC_DTYPE_TBL[t]
+
+cdef object NUMPY():
+    """Import NumPy on demand; it is only needed for the ndarray access"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is required for ndarray access of ldms.Set")
+    return numpy
+
+
 cdef class Ptr(object):
     """Pointer wrapper so that C pointer can be passed around as PyOBJ"""
     cdef void *c_ptr
@@ -727,6 +867,8 @@ cdef class XprtEvent(object):
 cdef void xprt_cb(ldms_t _x, ldms_xprt_event *e, void *arg) with gil:
     cdef Xprt x = <Xprt>arg
     cdef bytes b
+    if e.type == EVENT_DISCONNECTED:
+        x._dir_release()
     if x._conn_cb:
         # Call the callback
         x._conn_cb(x, XprtEvent(PTR(e)), x._conn_cb_arg)
@@ -771,6 +913,7 @@ cdef void passive_xprt_cb(ldms_t _x, ldms_xprt_event *e, void *arg) with gil:
        e.type == EVENT_REJECTED or \
        e.type == EVENT_ERROR:
         lx._psv_xprts.pop(<uint64_t>_x, None)
+        x._dir_release()
     if x._conn_cb:
         # Call the callback
         x._conn_cb(x, XprtEvent(PTR(e)), x._conn_cb_arg)
@@ -883,35 +1026,99 @@ cdef class DirData(object):
                                 for i in range(0, d.set_count) ]
 
 
+cdef class Completion(object):
+    """The completion of a blocking request
+
+    Each blocking request (`Xprt.dir()`, `Xprt.lookup()` and `Set.update()`)
+    waits on its own Completion object, so that multiple threads can issue
+    blocking requests on the same transport (or set) concurrently.
+    """
+    cdef sem_t _sem
+    cdef int rc
+    cdef list result
+
+    def __cinit__(self):
+        sem_init(&self._sem, 0, 0)
+        self.rc = 0
+        self.result = list()
+
+    def __dealloc__(self):
+        sem_destroy(&self._sem)
+
+    cdef void post(self):
+        sem_post(&self._sem)
+
+    cdef void wait(self):
+        with nogil:
+            sem_wait(&self._sem)
+
+
 # This is the dir callback interposer. If Python dir callback is supplied to
 # `Xprt.dir()`, this function calls the callback. Otherwise, it works internally
-# to provide blocking `Xprt.dir()` results.
+# to provide blocking `Xprt.dir()` results. The `arg` is a tuple of
+# (xprt, cb, cb_arg, completion, flags, state) owned by the request, where
+# `state` is `[status, cancelled]`: the first error status of the request, and
+# whether the DIR_F_NOTIFY dir has been cancelled (see `Xprt._dir_cancel()`).
 cdef void dir_cb(ldms_t _x, int status, ldms_dir_t d, void *arg) with gil:
-    x = <Xprt>arg
-    if x._dir_cb:
+    cdef Completion c
+    (px, cb, cb_arg, pc, flags, state) = <tuple>arg
+    x = <Xprt>px
+    if state[1]:
+        # cancelled; the events until the cancel reply are discarded
+        if d:
+            ldms_xprt_dir_free(x.xprt, d)
+        return
+    # NOTE: `d` is NULL if `status` is not 0. This does not end the request:
+    #       LDMS keeps calling back with the same `arg` for the remaining
+    #       DIR_LIST chunks, and for the events of a DIR_F_NOTIFY dir. So the
+    #       error is recorded in `state`, and `arg` is released only by the
+    #       last DIR_LIST chunk (d.more == 0) of a dir without DIR_F_NOTIFY.
+    if not d and not state[0]:
+        state[0] = status
+    if cb:
         # Call the callback
-        x._dir_cb(x, status, DirData(PTR(d)), x._dir_cb_arg)
+        cb(x, status, DirData(PTR(d)) if d else None, cb_arg)
+        if not d:
+            return
+        last = d.type == LDMS_DIR_LIST and not d.more
         ldms_xprt_dir_free(x.xprt, d)
+        if last and not (flags & DIR_F_NOTIFY):
+            Py_DECREF(<tuple>arg)
+        # else, DIR_F_NOTIFY keeps delivering events; `arg` stays alive until
+        # `Xprt._dir_release()`
         return
     # Else, use blocking-dir
+    c = <Completion>pc
+    if not d:
+        if not c.rc:
+            # wake up the waiter with the error; the remaining chunks are
+            # discarded
+            c.rc = status
+            c.post()
+        return
     if d.type != LDMS_DIR_LIST:
         # NOTE warn about unhandling dir msg?
+        ldms_xprt_dir_free(x.xprt, d)
         return
-    if status:
-        x._dir_rc = status
-    for i in range(0, d.set_count):
-        x._dir_list.append(DirSet(PTR(&d.set_data[i])))
-    if not d.more:
-        sem_post(&x._dir_sem)
+    if not c.rc:
+        for i in range(0, d.set_count):
+            c.result.append(DirSet(PTR(&d.set_data[i])))
+    more = d.more
     ldms_xprt_dir_free(x.xprt, d)
+    if not more:
+        if not c.rc:
+            c.post()
+        Py_DECREF(<tuple>arg)
 
 
 # This is the lookup callback interposer. If Python lookup callback is provided
 # to `Xprt.lookup()`, this function callas the Python callback. Otherwise, it
-# works internally to provide blocking `Xprt.lookup()` results.
+# works internally to provide blocking `Xprt.lookup()` results. The `arg` is a
+# tuple of (xprt, cb, cb_arg, completion) owned by the request.
 cdef void lookup_cb(ldms_t _x, ldms_lookup_status status, int more,
                     ldms_set_t s, void *arg) with gil:
-    (px, cb, cb_arg, slist) = <tuple>arg
+    cdef Completion c
+    (px, cb, cb_arg, pc) = <tuple>arg
     x = <Xprt>px
     if s:
         lset = Grp(None, set_ptr=PTR(s)) if ldms_is_grp(s) else \
@@ -924,20 +1131,24 @@ cdef void lookup_cb(ldms_t _x, ldms_lookup_status status, int more,
         if not more:
             Py_DECREF(<tuple>arg)
         return
+    c = <Completion>pc
     if status:
-        x._lookup_rc = status
+        c.rc = status
     if lset:
-        slist.append(lset)
+        c.result.append(lset)
     if not more:
-        sem_post(&x._lookup_sem)
+        c.post()
+        Py_DECREF(<tuple>arg)
 
 
 # This is the update callback interposer. If Python update callback is provided
 # to `Set.update()`, this function callas the Python callback. Otherwise, it
-# works internally to provide blocking `Set.update()` results.
+# works internally to provide blocking `Set.update()` results. The `arg` is a
+# tuple of (set, cb, cb_arg, completion) owned by the request.
 cdef void update_cb(ldms_t _t, ldms_set_t _s, int flags, void *arg) with gil:
     cdef int rc = LDMS_UPD_ERROR(flags)
-    (ps, cb, cb_arg) = <tuple>arg
+    cdef Completion c
+    (ps, cb, cb_arg, pc) = <tuple>arg
     py_set = <Set>ldms_ctxt_get(_s)
     s = <Set>ps
     assert(py_set is s or type(s) is Grp)
@@ -948,9 +1159,373 @@ cdef void update_cb(ldms_t _t, ldms_set_t _s, int flags, void *arg) with gil:
         if py_set is s and 0 == (flags & LDMS_UPD_F_MORE):
             Py_DECREF(<tuple>arg)
         return
-    s._update_rc = rc
+    c = <Completion>pc
+    if rc:
+        c.rc = rc
     if py_set is s and 0 == (flags & LDMS_UPD_F_MORE):
-        sem_post(&s._sem)
+        c.post()
+        Py_DECREF(<tuple>arg)
+
+
+# ==================== #
+# == asyncio bridge == #
+# ==================== #
+
+# The following are the Python callbacks of the awaitable API (`Xprt.aconnect()`,
+# `Xprt.adir()`, `Xprt.alookup()`, `Set.aupdate()`, ...). They run on LDMS
+# threads and hand the results over to the event loop with
+# `loop.call_soon_threadsafe()`, so no thread is parked per operation.
+
+# connection error code of the transport events
+XPRT_EVENT_RC_TBL = {
+        EVENT_REJECTED     : ECONNREFUSED,
+        EVENT_ERROR        : ECONNABORTED,
+        EVENT_DISCONNECTED : ENOTCONN,
+    }
+
+def _aio_resolve(fut, result, exc):
+    """Resolve `fut` (in the event loop thread) unless it is done/cancelled"""
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+def _aio_xprt_cb(Xprt x, XprtEvent ev, arg):
+    (loop, fut) = arg
+    if ev.type == EVENT_CONNECTED:
+        loop.call_soon_threadsafe(_aio_resolve, fut, None, None)
+    elif ev.type == EVENT_RECV:
+        loop.call_soon_threadsafe(x._aio_recv_queue.put_nowait, ev.data)
+    else: # REJECTED, ERROR or DISCONNECTED
+        rc = XPRT_EVENT_RC_TBL.get(ev.type, ECONNABORTED)
+        exc = ConnectionError(rc, "Connect error: {}".format(ERRNO_SYM(rc)))
+        loop.call_soon_threadsafe(_aio_resolve, fut, None, exc)
+        # `None` marks the end of the receive stream
+        loop.call_soon_threadsafe(x._aio_recv_queue.put_nowait, None)
+
+def _aio_dir_cb(Xprt x, int status, DirData dd, arg):
+    (loop, fut, dlist) = arg
+    if status:
+        exc = RuntimeError("dir callback status: {}".format(ERRNO_SYM(status)))
+        loop.call_soon_threadsafe(_aio_resolve, fut, None, exc)
+        return
+    if dd.type != DIR_LIST:
+        return
+    dlist.extend(dd.set_data)
+    if not dd.more:
+        loop.call_soon_threadsafe(_aio_resolve, fut, dlist, None)
+
+def _aio_dir_queue_cb(Xprt x, int status, DirData dd, arg):
+    (loop, queue) = arg
+    loop.call_soon_threadsafe(queue.put_nowait, (status, dd))
+
+def _aio_lookup_cb(Xprt x, int status, int more, lset, arg):
+    (loop, fut, flags, slist) = arg
+    if status:
+        exc = RuntimeError("lookup callback status: {}"\
+                           .format(ERRNO_SYM(status)))
+        loop.call_soon_threadsafe(_aio_resolve, fut, None, exc)
+        return
+    if lset:
+        slist.append(lset)
+    if more:
+        return
+    # same results as the blocking `Xprt.lookup()`
+    if flags & (LDMS_LOOKUP_BY_SCHEMA|LDMS_LOOKUP_RE) or len(slist) > 1:
+        loop.call_soon_threadsafe(_aio_resolve, fut, slist, None)
+    elif slist:
+        loop.call_soon_threadsafe(_aio_resolve, fut, slist[0], None)
+    else:
+        loop.call_soon_threadsafe(_aio_resolve, fut, None,
+                                  KeyError("Set not found"))
+
+def _aio_update_cb(lset, int flags, arg):
+    (loop, fut) = arg
+    if flags & LDMS_UPD_F_MORE:
+        return # group members; the group itself completes last
+    rc = LDMS_UPD_ERROR(flags)
+    exc = RuntimeError("update error: {}".format(ERRNO_SYM(rc))) if rc else None
+    loop.call_soon_threadsafe(_aio_resolve, fut, None, exc)
+
+
+# ============================ #
+# == streaming lookup (iter) == #
+# ============================ #
+
+# The lookup callback of `LookupIter`. `arg` is the LookupIter, referenced
+# once per lookup in flight. The callback runs on the transport thread and
+# never blocks: the number of results queued is bounded by the number of
+# lookups in flight. After the iterator is closed, the results are not
+# wrapped nor queued.
+cdef void lookup_iter_cb(ldms_t _x, ldms_lookup_status status, int more,
+                         ldms_set_t s, void *arg) with gil:
+    cdef LookupIter it = <LookupIter>arg
+    if not it.closed:
+        if s:
+            lset = Grp(None, set_ptr=PTR(s)) if ldms_is_grp(s) else \
+                   Set(None, None, set_ptr=PTR(s))
+        else:
+            lset = None
+        it._queue.put_nowait((status, more, lset))
+    if not more:
+        Py_DECREF(it)
+
+
+cdef class LookupIter(object):
+    """The iterator of `Xprt.lookup_iter()` results
+
+    The instance names to look up are resolved from the directory of the
+    peer when the iterator is created. The sets are then looked up by
+    instance, keeping at most `maxsize` lookups in flight: the next lookup is
+    issued when the application takes a set, so at most `maxsize` sets are
+    buffered and no result is dropped.
+    """
+
+    cdef readonly Xprt xprt
+    """(Xprt) The transport of the lookups"""
+
+    cdef readonly int maxsize
+    """(int) The maximum number of lookups in flight"""
+
+    cdef readonly bint closed
+    """(bool) True when the iteration has ended or was closed"""
+
+    # instance names not looked up yet
+    cdef object _names
+    # (status, more, lset) of the lookup results
+    cdef object _queue
+    # the number of lookups issued, of which the last result (`more` == 0)
+    # has not been taken from `_queue`
+    cdef int _inflight
+
+    def __init__(self, Xprt xprt, names, int maxsize):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.xprt = xprt
+        self.maxsize = maxsize
+        self.closed = False
+        self._names = collections.deque(names)
+        self._queue = Queue()
+        self._inflight = 0
+        self._issue()
+
+    cdef _issue(self):
+        """Issue lookups until `maxsize` are in flight"""
+        cdef int rc
+        while self._names and self._inflight < self.maxsize:
+            name = self._names.popleft()
+            Py_INCREF(self)
+            rc = ldms_xprt_lookup(self.xprt.xprt, BYTES(name),
+                                  LOOKUP_BY_INSTANCE,
+                                  lookup_iter_cb, <void*>self)
+            if rc:
+                Py_DECREF(self)
+                self.close()
+                raise RuntimeError("ldms_xprt_lookup() error: {}"\
+                                   .format(ERRNO_SYM(rc)))
+            self._inflight += 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._inflight and not self.closed:
+            (status, more, lset) = self._queue.get()
+            if not more:
+                self._inflight -= 1
+            # ENOENT: the set was deleted since the dir; skip it
+            if status and status != ENOENT:
+                self.close()
+                raise RuntimeError("lookup callback status: {}"\
+                                   .format(ERRNO_SYM(status)))
+            self._issue()
+            if lset:
+                return lset
+        self.close()
+        raise StopIteration
+
+    def close(self):
+        """I.close() - end the iteration
+
+        The lookups not issued yet are abandoned; the sets of the lookups in
+        flight are left to the transport.
+        """
+        self.closed = True
+        self._names.clear()
+
+
+# =============== #
+# == dir cache == #
+# =============== #
+
+cdef class DirCache(object):
+    """A set directory of a peer kept up-to-date by dir notification
+
+    A DirCache is obtained by `Xprt.dir_cache()`. It performs a `dir()` with
+    DIR_F_NOTIFY once, loads the DIR_LIST results, and then applies DIR_ADD,
+    DIR_DEL and DIR_UPD events as they arrive. Queries are served from the
+    in-memory index (by instance name and by schema name) without re-listing
+    the directory from the peer.
+
+    Example:
+    >>> dc = x.dir_cache() # waits for the initial DIR_LIST
+    >>> "node-1/meminfo" in dc
+    >>> dc["node-1/meminfo"] # the DirSet
+    >>> dc.by_schema("meminfo") # list of DirSet of schema "meminfo"
+    >>> v = dc.version
+    >>> v = dc.wait(v, timeout=5) # block until the directory changed
+    """
+
+    cdef readonly Xprt xprt
+    """(Xprt) The transport of the directory"""
+
+    cdef readonly unsigned long version
+    """(int) The change version, incremented by each applied dir event"""
+
+    cdef readonly int status
+    """(int) The error status of the dir notification (0 if OK)"""
+
+    cdef readonly bint ready
+    """(bool) True when the initial DIR_LIST has been received completely"""
+
+    # instance name :-> DirSet
+    cdef dict _sets
+    # schema name :-> dict(instance name :-> DirSet)
+    cdef dict _schemas
+    cdef object _cond
+
+    def __init__(self, Xprt xprt):
+        self.xprt = xprt
+        self.version = 0
+        self.status = 0
+        self.ready = False
+        self._sets = dict()
+        self._schemas = dict()
+        self._cond = threading.Condition()
+
+    cdef _add(self, DirSet ds):
+        cdef DirSet old = self._sets.get(ds.name)
+        if old is not None and old.schema_name != ds.schema_name:
+            self._remove(old)
+        self._sets[ds.name] = ds
+        sch = self._schemas.get(ds.schema_name)
+        if sch is None:
+            sch = self._schemas[ds.schema_name] = dict()
+        sch[ds.name] = ds
+
+    cdef _remove(self, DirSet ds):
+        cdef DirSet old = self._sets.pop(ds.name, None)
+        if old is None:
+            return
+        sch = self._schemas.get(old.schema_name)
+        if sch is None:
+            return
+        sch.pop(old.name, None)
+        if not sch:
+            del self._schemas[old.schema_name]
+
+    cdef _apply(self, int status, DirData dd):
+        with self._cond:
+            if status:
+                self.status = status
+            elif dd.type == DIR_DEL:
+                for ds in dd.set_data:
+                    self._remove(ds)
+            else: # DIR_LIST, DIR_ADD, DIR_UPD
+                for ds in dd.set_data:
+                    self._add(ds)
+                if dd.type == DIR_LIST and not dd.more:
+                    self.ready = True
+            self.version += 1
+            self._cond.notify_all()
+
+    def _check_status(self):
+        if self.status:
+            raise RuntimeError("dir callback status: {}"\
+                               .format(ERRNO_SYM(self.status)))
+
+    def wait_ready(self, timeout=None):
+        """D.wait_ready(timeout=None) - wait for the initial DIR_LIST
+
+        Returns True if the cache is ready, or False if `timeout` (seconds)
+        expired. RuntimeError is raised if the dir notification failed.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.ready or self.status, timeout)
+            self._check_status()
+            return self.ready
+
+    def wait(self, version=None, timeout=None):
+        """D.wait(version=None, timeout=None) - wait for a directory change
+
+        Blocks until the change version differs from `version` (default: the
+        current version) or `timeout` (seconds) expired, and returns the
+        version at that time. RuntimeError is raised if the dir notification
+        failed.
+        """
+        with self._cond:
+            if version is None:
+                version = self.version
+            self._cond.wait_for(lambda: self.version != version or self.status,
+                                timeout)
+            self._check_status()
+            return self.version
+
+    def close(self):
+        """D.close() - stop the dir notification of the cache"""
+        if self.xprt._dir_cache is self:
+            self.xprt._dir_cache = None
+            self.xprt._dir_cancel()
+
+    def get(self, name, default=None):
+        """D.get(name, default=None) - the DirSet of instance `name`"""
+        return self._sets.get(name, default)
+
+    def names(self):
+        """D.names() - a list of set instance names"""
+        with self._cond:
+            return list(self._sets.keys())
+
+    def sets(self):
+        """D.sets() - a list of DirSet of all sets"""
+        with self._cond:
+            return list(self._sets.values())
+
+    def schemas(self):
+        """D.schemas() - a list of schema names"""
+        with self._cond:
+            return list(self._schemas.keys())
+
+    def has_schema(self, name):
+        """D.has_schema(name) - True if a set of schema `name` exists"""
+        return name in self._schemas
+
+    def by_schema(self, name):
+        """D.by_schema(name) - a list of DirSet of the sets of schema `name`"""
+        with self._cond:
+            sch = self._schemas.get(name)
+            return list(sch.values()) if sch else list()
+
+    def __contains__(self, name):
+        return name in self._sets
+
+    def __getitem__(self, name):
+        return self._sets[name]
+
+    def __len__(self):
+        return len(self._sets)
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __repr__(self):
+        return "<DirCache sets={} version={} ready={}>"\
+               .format(len(self._sets), self.version, self.ready)
+
+def _dir_cache_cb(Xprt x, int status, DirData dd, DirCache dc):
+    dc._apply(status, dd)
 
 
 cdef class Schema(object):
@@ -1118,12 +1693,20 @@ cdef class MetricArray(list):
     >>> a[-1] # negative index works too, a[-1] is a[4]
     >>> a[2:4] # using 2:4 `slice` returns list() of values of index 2,3.
     >>> a == [7,8,9,10,11] # comparing to the list works too
+
+    Bulk access copies the whole array at once:
+    >>> a.tolist() # all elements as a list
+    >>> a.to_array() # all elements as `array.array`
+    >>> a.to_array(ndarray=True) # all elements as `numpy.ndarray`
+    >>> a.assign_from(array.array("B", [1,2,3,4,5])) # bulk assignment
     """
     cdef Set _set
     cdef ldms_set_t _c_set
     cdef ldms_value_type _type
     cdef int _mid
     cdef int _len
+    cdef int _elem_size
+    cdef str _code
     cdef object _getter
     cdef object _setter
 
@@ -1138,6 +1721,8 @@ cdef class MetricArray(list):
         if self._type == LDMS_V_CHAR_ARRAY:
             raise TypeError("CHAR_ARRAY should be access as `str`")
         self._len = ldms_metric_array_get_len(self._c_set, self._mid)
+        self._elem_size = METRIC_ELEM_SIZE_TBL[self._type]
+        self._code = METRIC_ARRAY_CODE_TBL[self._type]
         self._getter = METRIC_GETTER_TBL[self._type]
         self._setter = METRIC_SETTER_TBL[self._type]
 
@@ -1145,16 +1730,85 @@ cdef class MetricArray(list):
         return self._len
 
     def __iter__(self):
-        for i in range(0, len(self)):
-            yield self[i]
+        return iter(self.tolist())
 
     def __reversed__(self):
-        _len = len(self)
-        for i in range(0, _len):
-            yield self[_len - i - 1]
+        return reversed(self.tolist())
+
+    @property
+    def typecode(self):
+        """The `array.array` type code of the array elements"""
+        return self._code
+
+    def to_array(self, ndarray=False):
+        """A.to_array(ndarray=False) -> array.array
+
+        Copy all elements of the metric array at once into a new `array.array`
+        (see `typecode`), or into a new `numpy.ndarray` if `ndarray` is True.
+        """
+        cdef carray.array a
+        cdef char *src
+        cdef size_t sz
+        a = carray.clone(array.array(self._code), self._len, False)
+        sz = self._len * self._elem_size
+        src = <char*>ldms_metric_get_addr(self._c_set, self._mid)
+        with nogil:
+            memcpy(a.data.as_voidptr, src, sz)
+        if HOST_BIG_ENDIAN:
+            a.byteswap()
+        if ndarray:
+            return NUMPY().frombuffer(a, dtype=self._code)
+        return a
+
+    def tolist(self):
+        """A.tolist() -> list of all elements of the metric array"""
+        return self.to_array().tolist()
+
+    def assign_from(self, buf, int start=0):
+        """A.assign_from(buf, start=0) - bulk-assign elements from `buf`
+
+        `buf` is an object supporting the buffer protocol (e.g. `array.array`,
+        `numpy.ndarray` or `memoryview`) of which elements have the same size and
+        kind (unsigned integer, signed integer or floating point) as the
+        elements of the metric array. The elements are copied as-is to
+        `A[start:start+len(buf)]` at once.
+        """
+        cdef const unsigned char[::1] src
+        cdef char *dst
+        cdef size_t sz
+        m = memoryview(buf)
+        if m.itemsize != self._elem_size or m.format[:1] in (">", "!") or \
+                BUFFER_ELEM_KIND.get(m.format[-1:]) != \
+                BUFFER_ELEM_KIND[self._code]:
+            raise TypeError("buffer format '{}' does not match array type '{}'"\
+                            .format(m.format, self._code))
+        if start < 0:
+            start += self._len
+        sz = m.nbytes
+        if start < 0 or start * self._elem_size + sz > \
+                            self._len * self._elem_size:
+            raise IndexError("MetricArray assignment out of range")
+        if not sz:
+            return
+        if HOST_BIG_ENDIAN:
+            a = array.array(self._code)
+            a.frombytes(m.tobytes())
+            a.byteswap()
+            m = memoryview(a)
+        try:
+            src = m.cast("B")
+        except TypeError: # not C-contiguous
+            src = m.tobytes()
+        # the set-side address: inside a transaction, `ldms_metric_get_addr()`
+        # is the previous set array entry
+        dst = <char*>ldms_metric_set_addr(self._c_set, self._mid)
+        dst += start * self._elem_size
+        with nogil:
+            memcpy(dst, &src[0], sz)
+        ldms_metric_modify(self._c_set, self._mid)
 
     def _cmp(self, other):
-        for v0, v1 in zip(self, other):
+        for v0, v1 in zip(self.tolist(), other):
             if v0 < v1:
                 return -1
             if v0 > v1:
@@ -1187,15 +1841,23 @@ cdef class MetricArray(list):
 
     def __getitem__(self, idx):
         if type(idx) == slice:
-            return [ self._getter(self._set, self._mid, i) \
-                        for i in range(*idx.indices(self._len)) ]
+            return self.to_array()[idx].tolist()
         if idx < 0:
             idx += self._len
         return self._getter(self._set, self._mid, idx)
 
     def __setitem__(self, idx, val):
         if type(idx) == slice:
-            for i,v in zip(range(*idx.indices(self._len)), val):
+            rng = range(*idx.indices(self._len))
+            if rng.step == 1 and type(val) in (list, tuple, range, array.array):
+                try:
+                    a = array.array(self._code, val[:len(rng)])
+                except (TypeError, OverflowError):
+                    pass # e.g. float to int array; use element setters below
+                else:
+                    self.assign_from(a, rng.start)
+                    return
+            for i,v in zip(rng, val):
                 self._setter(self._set, self._mid, i, v)
         else:
             if idx < 0:
@@ -1207,7 +1869,8 @@ cdef class MetricArray(list):
 
     def __repr__(self):
         sio = io.StringIO()
-        print("[", ", ".join(str(s) for s in self), "]", file=sio, end="", sep="")
+        print("[", ", ".join(str(s) for s in self.tolist()), "]", file=sio,
+              end="", sep="")
         return sio.getvalue()
 
     def __call__(self, *args, **kwargs):
@@ -1256,6 +1919,387 @@ cdef class MetricArray(list):
         raise TypeError("MetricArray does not support `sort()`")
 
 
+# AccessPlan objects shared by the sets, keyed by
+# (schema_name, meta_gn, card, meta_sz, data_sz). The sizes and the cardinality
+# tell apart same-name schemas of different definitions (e.g. from different
+# sampler versions).
+cdef dict ACCESS_PLAN_CACHE = dict()
+# The cache is simply dropped when it grows beyond this many plans.
+ACCESS_PLAN_CACHE_MAX = 4096
+
+cdef class AccessPlan(object):
+    """The metric access plan of the sets of a schema
+
+    The plan describes the metrics of a set -- names, types, array lengths and
+    data offsets -- and holds the getter and setter of each metric. It is built
+    once per schema and meta-data generation and shared by all `Set` objects
+    having the same schema (see `ACCESS_PLAN()`). The application does not
+    create this object directly.
+    """
+
+    cdef readonly str schema_name
+    """(str) The name of the schema"""
+
+    cdef readonly uint64_t meta_gn
+    """(int) The meta-data generation the plan is built from"""
+
+    cdef readonly int card
+    """(int) The number of metrics"""
+
+    cdef readonly tuple names
+    """(tuple) The metric names ordered by metric ID"""
+
+    cdef readonly tuple types
+    """(tuple) The metric value types ordered by metric ID"""
+
+    cdef readonly tuple lengths
+    """(tuple) The metric array lengths (1 for scalars) ordered by metric ID"""
+
+    cdef readonly dict index
+    """(dict) metric name :-> metric ID"""
+
+    cdef readonly tuple getters
+    """(tuple) The getter of each metric, None for MetricArray metrics"""
+
+    cdef readonly tuple setters
+    """(tuple) The setter of each metric, None for MetricArray metrics"""
+
+    cdef readonly list fields
+    """(list) (metric_id, name, type, offset, length) of the data metrics"""
+
+    cdef readonly int base_id
+    """(int) The ID of the data metric at offset 0, -1 if no data metric"""
+
+    cdef readonly size_t data_size
+    """(int) The size of the data metrics region"""
+
+    cdef object _dtype
+    # metric ID :-> position in `fields`
+    cdef dict _field_pos
+    # type, offset, length and element size of `fields` as C arrays for the
+    # raw buffer loops (see `_raw_delta()`)
+    cdef carray.array _f_type
+    cdef carray.array _f_off
+    cdef carray.array _f_len
+    cdef carray.array _f_esz
+    # The `array.array` type code and the element stride of the data region
+    # if all metrics are data scalars of one numeric type in metric ID order
+    # (see `Set.write_batch()`), or None
+    cdef object _bulk_code
+    cdef Py_ssize_t _bulk_stride
+
+    def __cinit__(self, Ptr set_ptr):
+        cdef ldms_set_t c_set = <ldms_set_t>set_ptr.c_ptr
+        cdef int i
+        cdef uintptr_t lo = 0
+        cdef uintptr_t hi = 0
+        cdef uintptr_t addr, end
+        cdef uint32_t alen
+        cdef ldms_value_type t
+        self.schema_name = STR(ldms_set_schema_name_get(c_set))
+        self.meta_gn = ldms_set_meta_gn_get(c_set)
+        self.card = ldms_set_card_get(c_set)
+        self._dtype = None
+        self.base_id = -1
+        names = list()
+        types = list()
+        lengths = list()
+        getters = list()
+        setters = list()
+        rows = list()
+        for i in range(0, self.card):
+            name = STR(ldms_metric_name_get(c_set, i))
+            t = ldms_metric_type_get(c_set, i)
+            alen = ldms_metric_array_get_len(c_set, i)
+            names.append(name)
+            types.append(t)
+            lengths.append(alen)
+            if ldms_type_is_array(t) and t != LDMS_V_CHAR_ARRAY:
+                getters.append(None)
+                setters.append(None)
+            else:
+                getters.append(METRIC_GETTER_TBL[t])
+                setters.append(METRIC_SETTER_TBL[t])
+            if not ldms_metric_flags_get(c_set, i) & LDMS_MDESC_F_DATA:
+                continue
+            addr = <uintptr_t>ldms_metric_get_addr(c_set, i)
+            end = addr + <uintptr_t>METRIC_ELEM_SIZE_TBL[t] * alen
+            if not lo or addr < lo:
+                lo = addr
+                self.base_id = i
+            if end > hi:
+                hi = end
+            rows.append((i, name, t, addr, alen))
+        self.names = tuple(names)
+        self.types = tuple(types)
+        self.lengths = tuple(lengths)
+        self.getters = tuple(getters)
+        self.setters = tuple(setters)
+        self.index = { name: i for i, name in enumerate(names) }
+        self.fields = [ (i, name, t, addr - lo, alen) \
+                            for (i, name, t, addr, alen) in rows ]
+        self.data_size = hi - lo
+        self._field_pos = { f[0]: k for k, f in enumerate(self.fields) }
+        self._f_type = array.array("i", [ f[2] for f in self.fields ])
+        self._f_off = array.array("q", [ f[3] for f in self.fields ])
+        self._f_len = array.array("q", [ f[4] for f in self.fields ])
+        self._f_esz = array.array("i", [ METRIC_ELEM_SIZE_TBL[f[2]] \
+                                            for f in self.fields ])
+        self._bulk_code = None
+        self._bulk_stride = 0
+        if self.card and len(self.fields) == self.card:
+            t0 = self.fields[0][2]
+            stride = self.fields[1][3] if self.card > 1 else \
+                     METRIC_ELEM_SIZE_TBL[t0]
+            if t0 in METRIC_ELEM_CODE_TBL and not ldms_type_is_array(t0) and \
+               all([ f[0] == k and f[2] == t0 and f[3] == k * stride \
+                     for k, f in enumerate(self.fields) ]):
+                self._bulk_code = METRIC_ELEM_CODE_TBL[t0]
+                self._bulk_stride = stride
+
+    def dtype(self):
+        """P.dtype() - NumPy structured dtype of the data metrics region"""
+        if self._dtype is None:
+            np = NUMPY()
+            self._dtype = np.dtype({
+                    "names": [ f[1] for f in self.fields ],
+                    "formats": [ METRIC_DTYPE(f[2], f[4]) for f in self.fields ],
+                    "offsets": [ f[3] for f in self.fields ],
+                    "itemsize": self.data_size,
+                })
+        return self._dtype
+
+    cdef object _raw_value(self, const unsigned char *base, Py_ssize_t k):
+        """The value of `fields[k]` in the raw data region at `base`"""
+        (mid, name, t, off, alen) = self.fields[k]
+        cdef const char *p = <const char*>base + <size_t>off
+        if t == LDMS_V_CHAR or t == LDMS_V_CHAR_ARRAY:
+            return STR(p[:alen].split(b"\0", 1)[0])
+        a = array.array(METRIC_ELEM_CODE_TBL[t])
+        a.frombytes(p[:alen * METRIC_ELEM_SIZE_TBL[t]])
+        if HOST_BIG_ENDIAN:
+            a.byteswap()
+        if ldms_type_is_array(t):
+            return a.tolist()
+        return a[0]
+
+cdef AccessPlan ACCESS_PLAN(ldms_set_t c_set):
+    """Returns the (cached) AccessPlan for the set `c_set`"""
+    key = (STR(ldms_set_schema_name_get(c_set)),
+           ldms_set_meta_gn_get(c_set), ldms_set_card_get(c_set),
+           ldms_set_meta_sz_get(c_set), ldms_set_data_sz_get(c_set))
+    plan = ACCESS_PLAN_CACHE.get(key)
+    if plan is None:
+        if len(ACCESS_PLAN_CACHE) >= ACCESS_PLAN_CACHE_MAX:
+            ACCESS_PLAN_CACHE.clear()
+        plan = AccessPlan(PTR(c_set))
+        ACCESS_PLAN_CACHE[key] = plan
+    return plan
+
+
+# ============================ #
+# == set snapshot and delta == #
+# ============================ #
+
+cdef inline double _elem_diff_f64(const unsigned char *p,
+                                  const unsigned char *q, int t) nogil:
+    """The difference of the numeric values at `p` and `q` of type `t` (host
+    byte order) as double
+
+    The difference is computed in the metric type before the conversion, so
+    that 64-bit counters do not lose precision; it is modular for the
+    unsigned types, so that a counter wraparound gives a positive difference.
+    """
+    if t == LDMS_V_U8 or t == LDMS_V_U8_ARRAY:
+        return <uint8_t>((<uint8_t*>p)[0] - (<uint8_t*>q)[0])
+    if t == LDMS_V_S8 or t == LDMS_V_S8_ARRAY:
+        return <int>(<int8_t*>p)[0] - <int>(<int8_t*>q)[0]
+    if t == LDMS_V_U16 or t == LDMS_V_U16_ARRAY:
+        return <uint16_t>((<uint16_t*>p)[0] - (<uint16_t*>q)[0])
+    if t == LDMS_V_S16 or t == LDMS_V_S16_ARRAY:
+        return <int>(<int16_t*>p)[0] - <int>(<int16_t*>q)[0]
+    if t == LDMS_V_U32 or t == LDMS_V_U32_ARRAY:
+        return <uint32_t>((<uint32_t*>p)[0] - (<uint32_t*>q)[0])
+    if t == LDMS_V_S32 or t == LDMS_V_S32_ARRAY:
+        return <int64_t>(<int32_t*>p)[0] - <int64_t>(<int32_t*>q)[0]
+    if t == LDMS_V_U64 or t == LDMS_V_U64_ARRAY:
+        return (<uint64_t*>p)[0] - (<uint64_t*>q)[0]
+    if t == LDMS_V_S64 or t == LDMS_V_S64_ARRAY:
+        # subtract as unsigned to avoid the signed overflow
+        return <int64_t>(<uint64_t>(<int64_t*>p)[0] - \
+                         <uint64_t>(<int64_t*>q)[0])
+    if t == LDMS_V_F32 or t == LDMS_V_F32_ARRAY:
+        return <double>(<float*>p)[0] - <double>(<float*>q)[0]
+    return (<double*>p)[0] - (<double*>q)[0]
+
+# The bit width of the unsigned metric types, for the modular difference of
+# `_int_diff()`
+_UNSIGNED_BITS = {
+        LDMS_V_U8: 8, LDMS_V_U8_ARRAY: 8,
+        LDMS_V_U16: 16, LDMS_V_U16_ARRAY: 16,
+        LDMS_V_U32: 32, LDMS_V_U32_ARRAY: 32,
+        LDMS_V_U64: 64, LDMS_V_U64_ARRAY: 64,
+    }
+
+def _int_diff(a, b, int t):
+    """`a - b` of the values of metric type `t`, modular if unsigned"""
+    bits = _UNSIGNED_BITS.get(t)
+    if bits:
+        return (a - b) % (1 << bits)
+    return a - b
+
+cdef dict _raw_delta(AccessPlan plan, const unsigned char *cur, double cur_ts,
+                     SetSnapshot prev, bint rate):
+    """The changes of data region `cur` (at `cur_ts`) since snapshot `prev`
+
+    The changed metrics are found by comparing the raw regions metric by metric.
+    The result is a dict of metric ID :-> value (or rate per second of the
+    numeric metrics if `rate` is True).
+    """
+    cdef AccessPlan pplan = prev.plan
+    # The meta-data generation differs among the sets of a schema (and
+    # changes when e.g. the producer name is updated), so the plans are
+    # matched by the data layout instead.
+    if pplan is not plan and (pplan.schema_name != plan.schema_name or \
+                              pplan.data_size != plan.data_size or \
+                              pplan.fields != plan.fields):
+        raise ValueError("the snapshot is not of the same schema/data layout")
+    cdef const unsigned char *old = prev.data
+    cdef Py_ssize_t n = len(plan.fields)
+    cdef carray.array changed = array.array("i", bytes(n * sizeof(int)))
+    cdef int *chg = changed.data.as_ints
+    cdef int *ftype = plan._f_type.data.as_ints
+    cdef long long *foff = plan._f_off.data.as_longlongs
+    cdef long long *flen = plan._f_len.data.as_longlongs
+    cdef int *fesz = plan._f_esz.data.as_ints
+    cdef Py_ssize_t k, j, e, pos
+    cdef Py_ssize_t nchg = 0
+    cdef Py_ssize_t nelem = 0
+    cdef long long o
+    cdef int t
+    cdef double dt = cur_ts - prev.timestamp
+    cdef carray.array rates
+    cdef double *r
+    with nogil:
+        for k in range(n):
+            if memcmp(cur + foff[k], old + foff[k], flen[k] * fesz[k]):
+                chg[nchg] = k
+                nchg += 1
+                if ftype[k] != LDMS_V_CHAR and ftype[k] != LDMS_V_CHAR_ARRAY:
+                    nelem += flen[k]
+    out = dict()
+    if not rate:
+        for j in range(nchg):
+            k = chg[j]
+            out[plan.fields[k][0]] = plan._raw_value(cur, k)
+        return out
+    if not nelem:
+        return out
+    if dt <= 0:
+        raise ValueError("non-positive time interval between the snapshots")
+    if HOST_BIG_ENDIAN:
+        for j in range(nchg):
+            k = chg[j]
+            if ftype[k] == LDMS_V_CHAR or ftype[k] == LDMS_V_CHAR_ARRAY:
+                continue
+            t = ftype[k]
+            v1 = plan._raw_value(cur, k)
+            v0 = plan._raw_value(old, k)
+            if type(v1) is list:
+                out[plan.fields[k][0]] = [ _int_diff(a, b, t) / dt \
+                                           for a, b in zip(v1, v0) ]
+            else:
+                out[plan.fields[k][0]] = _int_diff(v1, v0, t) / dt
+        return out
+    rates = array.array("d", bytes(nelem * sizeof(double)))
+    r = rates.data.as_doubles
+    pos = 0
+    with nogil:
+        for j in range(nchg):
+            k = chg[j]
+            t = ftype[k]
+            if t == LDMS_V_CHAR or t == LDMS_V_CHAR_ARRAY:
+                continue
+            for e in range(flen[k]):
+                o = foff[k] + e * fesz[k]
+                r[pos] = _elem_diff_f64(cur + o, old + o, t) / dt
+                pos += 1
+    pos = 0
+    for j in range(nchg):
+        k = chg[j]
+        t = ftype[k]
+        if t == LDMS_V_CHAR or t == LDMS_V_CHAR_ARRAY:
+            continue
+        if ldms_type_is_array(<ldms_value_type>t):
+            out[plan.fields[k][0]] = rates[pos:pos + flen[k]].tolist()
+        else:
+            out[plan.fields[k][0]] = r[pos]
+        pos += flen[k]
+    return out
+
+
+cdef class SetSnapshot(object):
+    """An immutable copy of the data metrics of a set
+
+    A SetSnapshot is created by `Set.snapshot()`. It holds a copy of the set
+    data region (`data`) and the transaction timestamp at the time of the
+    snapshot. Meta metrics are not part of the snapshot.
+
+    Data metric values can be accessed by metric ID or name, e.g. `snap[3]` or
+    `snap["metric_a"]`. Array metrics are given as `list`.
+    """
+
+    cdef readonly AccessPlan plan
+    """(AccessPlan) The metric access plan of the set"""
+
+    cdef readonly bytes data
+    """(bytes) The copy of the set data region (see `Set.dtype`)"""
+
+    cdef readonly str name
+    """(str) The set instance name"""
+
+    cdef readonly double timestamp
+    """(float) The transaction timestamp of the data (seconds)"""
+
+    cdef readonly uint64_t data_gn
+    """(int) The data generation number"""
+
+    def __init__(self):
+        raise TypeError("SetSnapshot is created by `Set.snapshot()`")
+
+    def delta(self, SetSnapshot prev, rate=False):
+        """P.delta(prev, rate=False) - the changes since the `prev` snapshot
+
+        See `Set.delta()`.
+        """
+        return _raw_delta(self.plan, self.data, self.timestamp, prev, rate)
+
+    def keys(self):
+        """P.keys() - the names of the data metrics"""
+        return [ f[1] for f in self.plan.fields ]
+
+    def as_dict(self):
+        """P.as_dict() - dict(name :-> value) of the data metrics"""
+        cdef Py_ssize_t k
+        fields = self.plan.fields
+        return { fields[k][1]: self.plan._raw_value(self.data, k) \
+                 for k in range(len(fields)) }
+
+    def __getitem__(self, key):
+        mid = key if type(key) == int else self.plan.index[key]
+        k = self.plan._field_pos.get(mid)
+        if k is None:
+            raise KeyError("{} is not a data metric".format(key))
+        return self.plan._raw_value(self.data, k)
+
+    def __len__(self):
+        return len(self.plan.fields)
+
+    def __repr__(self):
+        return "<SetSnapshot {} data_gn={} timestamp={}>"\
+               .format(self.name, self.data_gn, self.timestamp)
+
+
 cdef class Set(object):
     """The metric set
 
@@ -1299,17 +2343,26 @@ cdef class Set(object):
     ...           # similar to dict.items(), but ordered by metric index
     >>> s.as_dict() # generate a dictionary { metric_key: metric_value }
     >>> s.as_list() # generate a list [ metric_value ]
+
+    The data part of the set (the metrics, excluding meta attributes) is also
+    exported through the buffer protocol without copying, e.g. for bulk
+    processing with NumPy.
+    >>> m = memoryview(s) # read-only bytes of the set data
+    >>> a = s.as_ndarray() # structured ndarray view, fields are metric names
+    >>> a["an_uint64_array"][0] # the array metric as a NumPy array
+    >>> numpy.concatenate([ x.as_ndarray() for x in slist ]) # stack sets
     """
     cdef ldms_set_t c_set
-    cdef sem_t _sem
-    cdef int _update_rc
-    # getter/setter for each metric
-    cdef list _getter
-    cdef list _setter
+    # metric access plan shared with the sets of the same schema
+    cdef AccessPlan _plan
+    # metric ID :-> MetricArray, for array metrics
+    cdef dict _marrays
+    # shape/strides of the exported buffer (see __getbuffer__)
+    cdef Py_ssize_t _buf_shape[1]
+    cdef Py_ssize_t _buf_strides[1]
 
     def __cinit__(self, *args, **kwargs):
         self.c_set = NULL
-        sem_init(&self._sem, 0, 0)
 
     def __init__(self, str name, Schema schema,
                        int uid=0, int gid=0,
@@ -1331,7 +2384,7 @@ cdef class Set(object):
         else:
             raise AttributeError("Requires `name` and `schema`")
         self.__common_init__()
-        self._init_getter_setter()
+        self._init_plan()
 
     def __common_init__(self):
         assert(not ldms_ctxt_get(self.c_set))
@@ -1351,19 +2404,23 @@ cdef class Set(object):
             raise KeyError("Set `{}` not found".format(name))
         return py_set
 
-    def _init_getter_setter(self):
-        self._getter = list()
-        self._setter = list()
-        cdef ldms_value_type t
-        for i in range(0, len(self)):
-            t = ldms_metric_type_get(self.c_set, i)
-            if ldms_type_is_array(t) and t != LDMS_V_CHAR_ARRAY:
-                ma = MetricArray(self, i)
-                self._getter.append(ma)
-                self._setter.append(ma)
-            else:
-                self._getter.append(METRIC_GETTER_TBL[t])
-                self._setter.append(METRIC_SETTER_TBL[t])
+    def _init_plan(self):
+        self._plan = ACCESS_PLAN(self.c_set)
+        self._marrays = dict()
+
+    cdef AccessPlan _get_plan(self):
+        """The access plan of the set, renewed if the meta-data has changed"""
+        if self._plan is None or \
+                self._plan.meta_gn != ldms_set_meta_gn_get(self.c_set):
+            self._init_plan()
+        return self._plan
+
+    cdef MetricArray _metric_array(self, int idx):
+        ma = self._marrays.get(idx)
+        if ma is None:
+            ma = MetricArray(self, idx)
+            self._marrays[idx] = ma
+        return ma
 
     def __del__(self):
         if self.c_set:
@@ -1414,24 +2471,22 @@ cdef class Set(object):
 
     def keys(self):
         """S.keys() - iterates over keys (metric names) of the set"""
-        cdef int i
-        for i in range(0, ldms_set_card_get(self.c_set)):
-            yield STR(ldms_metric_name_get(self.c_set, i))
+        return iter(self._get_plan().names)
 
     def values(self):
         """S.values() - iterate over metric values of the set"""
         cdef int i
-        for i in range(0, ldms_set_card_get(self.c_set)):
+        for i in range(0, self._get_plan().card):
             v = self.get_metric(i)
             yield v
 
     def items(self):
         """S.items() - iterate over metrics, yielding (key, value)"""
         cdef int i
-        for i in range(0, ldms_set_card_get(self.c_set)):
-            k = STR(ldms_metric_name_get(self.c_set, i))
+        names = self._get_plan().names
+        for i in range(0, len(names)):
             v = self.get_metric(i)
-            yield (k, v)
+            yield (names[i], v)
 
     def as_dict(self):
         """S.as_dict() -> dict(S.items())"""
@@ -1441,6 +2496,119 @@ cdef class Set(object):
         """S.as_list() -> list(S.values())"""
         return list(self.values())
 
+    cdef tuple _data_layout(self):
+        """Describe the data region of the set
+
+        Returns `(base, size, fields)`. `base` is the address of the first data
+        metric of the current set array entry, and `size` is the number of bytes
+        from `base` to the end of the last data metric. `fields` is a list of
+        `(metric_id, name, type, offset, length)` of the data metrics, where
+        `offset` is relative to `base`. Meta attributes live in the meta-data
+        region and are not included.
+        """
+        cdef AccessPlan plan = self._get_plan()
+        cdef uintptr_t base = 0
+        if plan.base_id >= 0:
+            base = <uintptr_t>ldms_metric_get_addr(self.c_set, plan.base_id)
+        return (base, plan.data_size, plan.fields)
+
+    def __getbuffer__(self, Py_buffer *buf, int flags):
+        cdef uintptr_t base
+        cdef Py_ssize_t size
+        if flags & PyBUF_WRITABLE:
+            raise BufferError("ldms.Set data buffer is read-only")
+        (base, size, fields) = self._data_layout()
+        if not fields:
+            raise BufferError("set `{}` has no data metric".format(self.name))
+        self._buf_shape[0] = size
+        self._buf_strides[0] = 1
+        buf.buf = <void*>base
+        buf.obj = self
+        buf.len = size
+        buf.readonly = 1
+        buf.itemsize = 1
+        buf.format = NULL
+        if flags & PyBUF_FORMAT:
+            buf.format = b"B"
+        buf.ndim = 1
+        buf.shape = NULL
+        if flags & PyBUF_ND:
+            buf.shape = self._buf_shape
+        buf.strides = NULL
+        if (flags & PyBUF_STRIDES) == PyBUF_STRIDES:
+            buf.strides = self._buf_strides
+        buf.suboffsets = NULL
+        buf.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer *buf):
+        pass
+
+    @property
+    def dtype(self):
+        """NumPy structured dtype describing the set data buffer
+
+        The fields are the data metrics (by name) at their offsets in the set
+        data region. Array metrics are sub-array fields and `char[]` metrics are
+        `S<len>` fields.
+        """
+        return self._get_plan().dtype()
+
+    def as_ndarray(self):
+        """S.as_ndarray() -> numpy.ndarray
+
+        Returns a read-only, zero-copy structured array of shape (1,) viewing
+        the set data (see `dtype`). The values reflect the current content of
+        the set, e.g. they change after `update()`. Use `.copy()` on the result
+        to keep the values. Arrays of many sets of the same schema can be
+        stacked with `numpy.concatenate()`.
+        """
+        np = NUMPY()
+        return np.frombuffer(self, dtype=self.dtype)
+
+    def snapshot(self):
+        """S.snapshot() -> SetSnapshot
+
+        Returns an immutable copy of the current data metrics of the set (see
+        SetSnapshot). The snapshot can be given to `delta()` later to find
+        which metrics have changed since.
+        """
+        cdef SetSnapshot snap = SetSnapshot.__new__(SetSnapshot)
+        cdef ldms_timestamp ts = ldms_transaction_timestamp_get(self.c_set)
+        (base, size, fields) = self._data_layout()
+        snap.plan = self._get_plan()
+        snap.data = (<char*><uintptr_t>base)[:size] if size else b""
+        snap.name = self.name
+        snap.timestamp = ts.sec + ts.usec * 1e-6
+        snap.data_gn = ldms_set_data_gn_get(self.c_set)
+        return snap
+
+    def delta(self, SetSnapshot prev, rate=False):
+        """S.delta(prev, rate=False) - the changes since the `prev` snapshot
+
+        Compares the current data metrics with the snapshot `prev` (see
+        `snapshot()`) of the same set (or a set of the same schema), and returns
+        a dict of metric ID :-> value of the metrics that have changed. Array
+        metric values are given as `list`.
+
+        If `rate` is True, the values are the rates of change per second of the
+        changed numeric metrics, i.e. (value - prev value) / (time difference
+        of the `transaction_timestamp`). The difference is computed in the
+        metric type, modulo 2^bits for the unsigned types, so that a counter
+        wraparound gives a positive rate. Unchanged metrics (rate 0) and
+        `char`/`char[]` metrics are not included. ValueError is raised if the
+        time difference is not positive.
+
+        The snapshot may have a different meta-data generation (e.g. another
+        set of the schema, or a meta metric changed since), but ValueError is
+        raised if its schema name or data layout differs.
+        """
+        cdef ldms_timestamp ts = ldms_transaction_timestamp_get(self.c_set)
+        (base, size, fields) = self._data_layout()
+        if not size:
+            return dict()
+        return _raw_delta(self._get_plan(), <const unsigned char*><uintptr_t>base,
+                          ts.sec + ts.usec * 1e-6, prev, rate)
+
     def update(self, cb=None, cb_arg=None):
         """S.update(cb=None, cb_arg=None) - update set data from the remote peer
 
@@ -1462,7 +2630,8 @@ cdef class Set(object):
         - `arg` is the `cb_arg` supplied to `update()`.
         """
         cdef int rc
-        tpl = (self, cb, cb_arg)
+        cdef Completion c = None if cb else Completion()
+        tpl = (self, cb, cb_arg, c)
         Py_INCREF(tpl)
         rc = ldms_xprt_update(self.c_set, update_cb, <void*>tpl)
         if rc: # synchronous error
@@ -1471,11 +2640,21 @@ cdef class Set(object):
                                .format(ERRNO_SYM(rc)))
         if cb:
             return
-        with nogil:
-            sem_wait(&self._sem)
-        if self._update_rc:
+        c.wait()
+        if c.rc:
             raise RuntimeError("update error: {}"\
-                               .format(ERRNO_SYM(self._update_rc)))
+                               .format(ERRNO_SYM(c.rc)))
+
+    async def aupdate(self):
+        """await S.aupdate() - update set data from the remote peer (asyncio)
+
+        The awaitable variant of the blocking `update()`. RuntimeError is raised
+        if the update failed.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self.update(cb=_aio_update_cb, cb_arg=(loop, fut))
+        await fut
 
     @property
     def instance_name(self):
@@ -1579,25 +2758,28 @@ cdef class Set(object):
 
     def get_metric_by_name(self, key):
         """S.get_metric_by_name(key) - equivalent to S[key]"""
-        cdef int idx = ldms_metric_by_name(self.c_set, BYTES(key))
-        if idx < 0:
+        idx = self._get_plan().index.get(STR(key))
+        if idx is None:
             raise KeyError("metric '{}' not found".format(key))
         return self.get_metric(idx)
 
     def get_metric(self, int idx):
         """S.get_metric(idx) - equivalent to S[idx]"""
-        cdef ldms_value_type t = ldms_metric_type_get(self.c_set, idx)
-        g = self._getter[idx]
+        cdef AccessPlan plan = self._get_plan()
+        if idx < 0:
+            idx += plan.card
+        g = plan.getters[idx]
+        if g is None:
+            return self._metric_array(idx)
         return g(self, idx)
 
     def units(self, metric):
         """S.units(metric) - get the units of `metric` (string or index)"""
-        cdef int idx
         if type(metric) == int:
             idx = metric
         else:
-            idx = ldms_metric_by_name(self.c_set, BYTES(metric))
-            if idx < 0:
+            idx = self._get_plan().index.get(STR(metric))
+            if idx is None:
                 raise KeyError("Metric '{}' not found".format(metric))
         return STR(ldms_metric_units_get(self.c_set, idx))
 
@@ -1617,25 +2799,165 @@ cdef class Set(object):
 
     def set_metric_by_name(self, str key, val):
         """S.set_metric_by_name(k, v) - equivalent to S[k]=v"""
-        cdef int idx = ldms_metric_by_name(self.c_set, BYTES(key))
-        if idx < 0:
+        idx = self._get_plan().index.get(key)
+        if idx is None:
             raise KeyError("metric '{}' not found".format(key))
         return self.set_metric(idx, val)
 
     def set_metric(self, int metric_id, val, sub_idx=None):
         """S.set_metric(i, v, j=None) - equivalent to S[i]=v or S[i][j]=v"""
-        cdef ldms_value_type t = ldms_metric_type_get(self.c_set, metric_id)
-        cdef int alen
-        _setter = self._setter[metric_id]
-        if not ldms_type_is_array(t) or t == LDMS_V_CHAR_ARRAY:
+        cdef AccessPlan plan = self._get_plan()
+        if metric_id < 0:
+            metric_id += plan.card
+        _setter = plan.setters[metric_id]
+        if _setter is not None:
             _setter(self, metric_id, val)
             return
-        # else, the metric is an array and _setter is MetricArray
+        # else, the metric is an array
+        ma = self._metric_array(metric_id)
         if sub_idx is not None:
-            _setter[sub_idx] = val
+            ma[sub_idx] = val
             return
         # else, set value for entire array
-        _setter[:] = val
+        ma[:] = val
+
+    cdef tuple _stage_values(self, AccessPlan plan, items):
+        """Stage `(key, value)` items into a copy of the data region
+
+        Returns `(stage, meta)`, where `stage` is a `bytearray` of the data
+        region in the set layout with the data metric values written, and
+        `meta` is a list of `(metric_id, value)` of the meta metrics.
+        """
+        stage = bytearray(memoryview(self)) if plan.base_id >= 0 else None
+        meta = list()
+        for key, val in items:
+            if type(key) == int:
+                mid = key + plan.card if key < 0 else key
+                if mid < 0 or mid >= plan.card:
+                    raise IndexError("metric index {} out of range".format(key))
+            else:
+                mid = plan.index.get(key)
+                if mid is None:
+                    raise KeyError("metric '{}' not found".format(key))
+            k = plan._field_pos.get(mid)
+            if k is None:
+                meta.append((mid, val))
+                continue
+            (mid, name, t, off, alen) = plan.fields[k]
+            try:
+                if t == LDMS_V_CHAR:
+                    if type(val) not in (str, bytes) or len(val) != 1:
+                        raise TypeError("A char must be a `str` or `bytes` of "
+                                        "length 1")
+                    stage[off] = BYTES(val)[0]
+                elif t == LDMS_V_CHAR_ARRAY:
+                    b = BYTES(val)[:alen]
+                    stage[off:off+alen] = b + bytes(alen - len(b))
+                elif ldms_type_is_array(t):
+                    a = array.array(METRIC_ELEM_CODE_TBL[t], val)
+                    if len(a) > alen:
+                        raise ValueError("{} elements given to an array of "
+                                         "length {}".format(len(a), alen))
+                    if HOST_BIG_ENDIAN:
+                        a.byteswap()
+                    stage[off:off+len(a)*a.itemsize] = a.tobytes()
+                else:
+                    struct.pack_into("<" + METRIC_ELEM_CODE_TBL[t], stage, off,
+                                     val)
+            except (struct.error, OverflowError, TypeError) as e:
+                raise TypeError("metric '{}': {}".format(name, e))
+        return (stage, meta)
+
+    def write_batch(self, values):
+        """S.write_batch(values) - set many metrics in one data transaction
+
+        `values` is one of the following:
+        - a sequence (list, tuple or range): `values[i]` is the value of the
+          metric `i`. If all metrics are data scalars of one numeric type,
+          the values of all metrics are converted at once into an
+          `array.array`, which is copied into the set,
+        - a dict: metric ID or metric name :-> value,
+        - an object supporting the buffer protocol (e.g. `bytes` or a NumPy
+          record/array of `S.dtype`) holding the entire data region in the set
+          data layout (see `dtype`).
+
+        The values are type-checked and staged before the set is touched; an
+        invalid value raises TypeError (or ValueError/KeyError/IndexError) and
+        leaves the set unmodified. Then `transaction_begin()`, the copy of the
+        staged data region and `transaction_end()` are performed in one go
+        without the GIL. The data metrics not given in `values` keep their
+        current values. Meta metrics given in `values` are set individually.
+        """
+        cdef AccessPlan plan = self._get_plan()
+        cdef const unsigned char[::1] src
+        cdef size_t sz = plan.data_size
+        cdef int base_id = plan.base_id
+        cdef int rc = 0
+        cdef carray.array bulk = None
+        cdef const char *bulk_src = NULL
+        cdef Py_ssize_t bulk_n = 0
+        cdef Py_ssize_t esz = 0
+        cdef Py_ssize_t stride = plan._bulk_stride
+        cdef Py_ssize_t k
+        cdef char *dst
+        items = None
+        if isinstance(values, dict):
+            items = values.items()
+        elif type(values) in (list, tuple, range):
+            if plan._bulk_code is not None and len(values) == plan.card:
+                try:
+                    bulk = array.array(plan._bulk_code, values)
+                except (OverflowError, TypeError):
+                    # the staging below reports the offending metric
+                    bulk = None
+            if bulk is None:
+                items = enumerate(values)
+        if bulk is not None:
+            if HOST_BIG_ENDIAN:
+                bulk.byteswap()
+            bulk_src = bulk.data.as_chars
+            bulk_n = len(bulk)
+            esz = bulk.itemsize
+        elif items is None:
+            m = memoryview(values)
+            dtype = getattr(values, "dtype", None)
+            if dtype is not None and dtype.fields is not None and \
+                    dtype != self.dtype:
+                raise TypeError("record dtype does not match the set dtype")
+            if m.nbytes != sz:
+                raise ValueError("buffer size {} does not match the set data "
+                                 "size {}".format(m.nbytes, sz))
+            try:
+                src = m.cast("B")
+            except (TypeError, NotImplementedError): # not C-contiguous/simple
+                src = m.tobytes()
+        else:
+            (stage, meta) = self._stage_values(plan, items)
+            for (mid, val) in meta:
+                self.set_metric(mid, val)
+            if stage is None:
+                return
+            src = stage
+        if base_id < 0: # no data metric
+            return
+        with nogil:
+            rc = ldms_transaction_begin(self.c_set)
+            if not rc:
+                # `transaction_begin()` may move to the next set array entry;
+                # write to it, not to the entry `ldms_metric_get_addr()` reads
+                dst = <char*>ldms_metric_set_addr(self.c_set, base_id)
+                if bulk_src == NULL:
+                    memcpy(dst, &src[0], sz)
+                elif stride == esz:
+                    memcpy(dst, bulk_src, bulk_n * esz)
+                else: # padded scalars
+                    for k in range(bulk_n):
+                        memcpy(dst + k * stride, bulk_src + k * esz, esz)
+                ldms_metric_modify(self.c_set, base_id)
+                rc = ldms_transaction_end(self.c_set)
+        if rc:
+            raise RuntimeError("write_batch transaction error: {}"\
+                               .format(ERRNO_SYM(rc)))
 
 cdef class Grp(Set):
     """A special LDMS Set that is a collection of other LDMS sets
@@ -1665,7 +2987,7 @@ cdef class Grp(Set):
         else:
             raise AttributeError("`name` is required")
         self.__common_init__()
-        self._init_getter_setter()
+        self._init_plan()
 
     def add(self, str member_name):
         """Add a member into the group"""
@@ -1689,6 +3011,10 @@ cdef class Grp(Set):
         """Metric modification is not allowed."""
         raise TypeError("Metric modification is not allowed in Grp")
 
+    def write_batch(self, values):
+        """Metric modification is not allowed."""
+        raise TypeError("Metric modification is not allowed in Grp")
+
     def __iter__(self):
         """Yields names of the members"""
         cdef int rc
@@ -1726,6 +3052,80 @@ cdef class Grp(Set):
         return tuple(self)
 
 
+cdef class UpdateBatch(object):
+    """Completion tracking of the updates posted by `update_many()`"""
+
+    cdef readonly list status
+    """(list) The update status of each set; None if not completed yet"""
+
+    cdef readonly int pending
+    """(int) The number of updates not completed yet"""
+
+    cdef object _cond
+
+    def __init__(self, int n):
+        self.status = [ None ] * n
+        self.pending = n
+        self._cond = threading.Condition()
+
+    def complete(self, int idx, int rc):
+        """B.complete(idx, rc) - record the completion of the update `idx`"""
+        with self._cond:
+            if self.status[idx] is not None:
+                return # already completed
+            self.status[idx] = rc
+            self.pending -= 1
+            if not self.pending:
+                self._cond.notify_all()
+
+    def update_cb(self, lset, int flags, int idx):
+        """The `Set.update()` callback of the updates in the batch"""
+        if flags & LDMS_UPD_F_MORE:
+            return # group members; the group itself completes last
+        self.complete(idx, LDMS_UPD_ERROR(flags))
+
+    def wait(self, timeout=None):
+        """B.wait(timeout=None) - wait for all updates to complete
+
+        Returns True if all updates have completed, or False if `timeout`
+        (seconds) ran out first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.pending, timeout)
+
+
+def update_many(sets, timeout=None):
+    """update_many(sets, timeout=None) -> list of status
+
+    Update all `sets` from their remote peers concurrently. The sets may come
+    from one or more transports. All updates are posted first, then the function
+    waits for all of them to complete (or for `timeout` seconds), so updating N
+    sets takes about one round trip rather than N.
+
+    Returns a list of the update status of each set in the order of `sets`:
+    0 for success, an errno for a failure (posting or completion), or None if
+    the update has not completed before the `timeout`.
+
+    Example:
+    >>> slist = x.lookup(".*", ldms.LOOKUP_RE)
+    >>> rcs = ldms.update_many(slist, timeout=5)
+    >>> failed = [ s for s, rc in zip(slist, rcs) if rc != 0 ]
+    """
+    cdef Set s
+    cdef int i, rc
+    sets = list(sets)
+    batch = UpdateBatch(len(sets))
+    for i, s in enumerate(sets):
+        tpl = (s, batch.update_cb, i, None)
+        Py_INCREF(tpl)
+        rc = ldms_xprt_update(s.c_set, update_cb, <void*>tpl)
+        if rc: # synchronous error
+            Py_DECREF(tpl)
+            batch.complete(i, rc)
+    batch.wait(timeout)
+    return list(batch.status)
+
+
 cdef class Xprt(object):
     """LDMS transport
 
@@ -1759,6 +3159,19 @@ cdef class Xprt(object):
 
     Please see `listen()`, `connect()`, `dir()`, `lookup()` for more
     information. They support both blocking and non-blocking (callback) styles.
+
+    Applications polling the directory can use the notification-driven
+    directory cache instead of repeated `dir()` (see DirCache):
+    >>> dc = x.dir_cache()
+    >>> v = dc.wait(timeout=5) # block until the directory changed
+
+    asyncio applications can use the awaitable variants instead:
+    >>> await x.aconnect(host="localhost", port=10000)
+    >>> dlist = await x.adir()
+    >>> slist = await x.alookup(".*", ldms.LOOKUP_RE)
+    >>> await asyncio.gather(*[ s.aupdate() for s in slist ])
+    >>> async for dd in x.adir_events(): # DIR_LIST, then DIR_ADD/DEL/UPD
+    ...     print(dd.type, [ d.name for d in dd.set_data ])
     """
 
     cdef public object ctxt
@@ -1772,19 +3185,15 @@ cdef class Xprt(object):
     cdef object _conn_cb
     cdef object _conn_cb_arg
 
-    cdef sem_t _dir_sem
-    cdef int _dir_rc
-    cdef public str _dir_rc_msg
-    cdef object _dir_cb
-    cdef object _dir_cb_arg
-    cdef list _dir_list
-
-    cdef sem_t _lookup_sem
-    cdef int _lookup_rc
-    cdef public str _lookup_rc_msg
-
     cdef public object _recv_queue
     cdef public object _accept_queue
+    # asyncio.Queue of received data for arecv(), created by aconnect()
+    cdef object _aio_recv_queue
+    # DirCache created by dir_cache()
+    cdef object _dir_cache
+    # The request tuple of the DIR_F_NOTIFY dir (see `dir_cb()`), active or
+    # cancelled, until LDMS cannot call back with it anymore
+    cdef object _dir_notify
 
     cdef public object _psv_xprts
     # _psv_xprts is a dict(ldms_t :-> Xprt). This is a work around as the newly
@@ -1805,18 +3214,11 @@ cdef class Xprt(object):
         self._conn_rc_msg = "OK"
         self._conn_cb = None
         self._conn_cb_arg = None
-        # dir
-        sem_init(&self._dir_sem, 0, 0)
-        self._dir_rc = 0
-        self._dir_rc_msg = "OK"
-        self._dir_cb = None
-        self._dir_cb_arg = None
-        # lookup
-        sem_init(&self._lookup_sem, 0, 0)
-        self._lookup_rc = 0
-        self._lookup_rc_msg = "OK"
         # recv_queue (thread-safe) for synchronous/blocking recv()
         self._recv_queue = Queue()
+        self._aio_recv_queue = None
+        self._dir_cache = None
+        self._dir_notify = None
         # accept queue (thread-safe) for synchronous/blocking accept()
         self._accept_queue = Queue()
         self._psv_xprts = dict()
@@ -1959,33 +3361,106 @@ cdef class Xprt(object):
         operation results with the following args:
         - xprt (Xprt): The transport object.
         - status (int): The status of dir operation (non-zero means error).
-        - dir_data (DirData): The data of the dir result (see DirData).
+        - dir_data (DirData): The data of the dir result (see DirData), or
+          None if `status` is not 0.
         - args (object): The `cb_arg` supplied to `dir()`.
 
+        An error `status` does not end the dir: the remaining DIR_LIST data
+        (and the DIR_F_NOTIFY events) may still be delivered afterward.
+
         If `flags` is 0, the `cb` is only called to deliver DIR_LIST, possibly
         multiple times until dd.more==0.
 
         If `flags` is DIR_F_NOTIFY, other DIR events (DIR_ADD, DIR_DEL,
-        DIR_UPD) will also be delivered to `cb()`.
+        DIR_UPD) will also be delivered to `cb()` until the dir is cancelled
+        (by closing the `adir_events()` iterator or the `dir_cache()`) or the
+        transport is disconnected.
+
+        NOTE: LDMS does not perform any other dir on the transport while a
+        DIR_F_NOTIFY dir is open (including until the peer acknowledges its
+        cancel): `dir()` raises RuntimeError with EBUSY. The exception is the
+        blocking `dir()` while the `dir_cache()` is open, which returns the
+        sets of the cache instead.
         """
         cdef int rc
-        self._dir_cb = cb
-        self._dir_cb_arg = cb_arg
-        self._dir_list = list()
+        cdef DirCache dc
+        cdef Completion c = None if cb else Completion()
         if not cb:
             flags = 0
-        rc = ldms_xprt_dir(self.xprt, dir_cb, <void*>self, flags)
+            if self._dir_cache is not None:
+                dc = self._dir_cache
+                dc.wait_ready()
+                return dc.sets()
+        tpl = (self, cb, cb_arg, c, flags, [ 0, False ])
+        Py_INCREF(tpl)
+        rc = ldms_xprt_dir(self.xprt, dir_cb, <void*>tpl, flags)
         if rc:
+            Py_DECREF(tpl)
             raise RuntimeError("ldms_xprt_dir() error: {}"\
                                .format(ERRNO_SYM(rc)))
+        # LDMS accepted the dir, so no DIR_F_NOTIFY dir is open: a cancelled
+        # one will not call back anymore
+        self._dir_release()
+        if flags & DIR_F_NOTIFY:
+            self._dir_notify = tpl
         if cb:
             return
-        with nogil:
-            sem_wait(&self._dir_sem)
-        if self._dir_rc:
+        c.wait()
+        if c.rc:
             raise RuntimeError("dir callback status: {}"\
-                               .format(ERRNO_SYM(self._dir_rc)))
-        return self._dir_list
+                               .format(ERRNO_SYM(c.rc)))
+        return c.result
+
+    cdef _dir_cancel(self):
+        """Cancel the DIR_F_NOTIFY dir
+
+        LDMS does not call back on the cancel reply, so the request tuple is
+        kept in `_dir_notify` until `_dir_release()`.
+        """
+        if self._dir_notify is None:
+            return
+        state = self._dir_notify[5]
+        if state[1]:
+            return
+        state[1] = True
+        if self.xprt:
+            ldms_xprt_dir_cancel(self.xprt)
+
+    cdef _dir_release(self):
+        """Release the request tuple of the DIR_F_NOTIFY dir
+
+        Called only when LDMS cannot call back with it anymore, i.e. after a
+        new dir was accepted or the transport is disconnected.
+        """
+        if self._dir_notify is None:
+            return
+        Py_DECREF(self._dir_notify)
+        self._dir_notify = None
+
+    def dir_cache(self, wait=True, timeout=None):
+        """X.dir_cache(wait=True, timeout=None) - the DirCache of the transport
+
+        The first call creates the DirCache (see DirCache) of the transport by
+        performing `dir()` with DIR_F_NOTIFY. Subsequent calls return the same
+        DirCache object until it is closed. If `wait` is True, the call waits
+        (up to `timeout` seconds) for the initial DIR_LIST to be loaded.
+
+        Since LDMS allows only one dir notification per transport, this
+        function raises RuntimeError if another DIR_F_NOTIFY `dir()` (e.g.
+        `adir_events()`) is active on the transport. While the cache is open,
+        LDMS rejects any other dir on the transport (EBUSY), so the blocking
+        `dir()` and `adir()` return the sets of the cache, and `dir()` with a
+        callback raises RuntimeError. `DirCache.close()` cancels the dir
+        notification.
+        """
+        cdef DirCache dc = self._dir_cache
+        if dc is None:
+            dc = DirCache(self)
+            self.dir(cb=_dir_cache_cb, cb_arg=dc, flags=DIR_F_NOTIFY)
+            self._dir_cache = dc
+        if wait:
+            dc.wait_ready(timeout)
+        return dc
 
     def lookup(self, name, flags=0, cb=None, cb_arg=None):
         """X.lookup(name, flags=0, cb=None, cb_arg=None)
@@ -2028,19 +3503,23 @@ cdef class Xprt(object):
                         application.
         """
         cdef int rc
-        slist = list()
-        tpl = (self, cb, cb_arg, slist)
+        cdef Completion c = None if cb else Completion()
+        tpl = (self, cb, cb_arg, c)
         Py_INCREF(tpl)
         rc = ldms_xprt_lookup(self.xprt, BYTES(name), flags,
                               lookup_cb, <void*>tpl)
+        if rc: # synchronous error
+            Py_DECREF(tpl)
+            raise RuntimeError("ldms_xprt_lookup() error: {}"\
+                               .format(ERRNO_SYM(rc)))
         if cb:
             return
         # else, release the GIL and wait
-        with nogil:
-            sem_wait(&self._lookup_sem)
-        if self._lookup_rc:
+        c.wait()
+        if c.rc:
             raise RuntimeError("lookup callback status: {}"\
-                               .format(ERRNO_SYM(self._lookup_rc)))
+                               .format(ERRNO_SYM(c.rc)))
+        slist = c.result
         if flags & (LDMS_LOOKUP_BY_SCHEMA|LDMS_LOOKUP_RE) or \
                 len(slist) > 1:
             return slist
@@ -2048,13 +3527,52 @@ cdef class Xprt(object):
             return slist[0]
         raise KeyError("Set not found")
 
-    def send(self, bytes data):
-        """X.send(bytes) - send data to peer"""
+    def lookup_iter(self, name, flags=LOOKUP_RE, int maxsize=64):
+        """X.lookup_iter(name, flags=LOOKUP_RE, maxsize=64) -> LookupIter
+
+        Perform LDMS lookups and yield the sets as they arrive, instead of
+        returning them all at the end like the blocking `lookup()`. `name`
+        and `flags` are the same as in `lookup()`.
+
+        The instance names matching `name` are listed by `dir()` first, and
+        the sets are then looked up by instance with at most `maxsize`
+        lookups in flight; the next lookup is issued when the application
+        takes a set. So at most `maxsize` sets are buffered, whatever the
+        number of matching sets, and no set is dropped. The lookup callback
+        never waits for the application, so blocking operations on this Xprt
+        (e.g. `s.update()`) can be done inside the loop. Closing the iterator
+        (`close()`) abandons the lookups not issued yet. The sets deleted
+        between the `dir()` and their lookup are skipped.
+
+        RuntimeError is raised for a lookup error status.
+
+        Example:
+        >>> for s in x.lookup_iter("node.*/meminfo"):
+        ...     s.update()
+        """
+        if flags & LOOKUP_RE:
+            rx = re.compile(name)
+            names = [ d.name for d in self.dir() if rx.search(d.name) ]
+        elif flags & LOOKUP_BY_SCHEMA:
+            names = [ d.name for d in self.dir() if d.schema_name == name ]
+        else:
+            names = [ name ]
+        return LookupIter(self, names, maxsize)
+
+    def send(self, data):
+        """X.send(data) - send data to peer
+
+        `data` is a `bytes` or an object supporting the buffer protocol (e.g.
+        `bytearray` or `memoryview`), which is sent without an extra copy.
+        """
         cdef int rc
-        cdef int data_len = len(data)
-        cdef char *c_data = data
+        cdef const unsigned char[::1] buf = data
+        cdef int data_len = len(buf)
+        cdef const char *c_data = b""
+        if data_len:
+            c_data = <const char*>&buf[0]
         with nogil:
-            rc = ldms_xprt_send(self.xprt, c_data, data_len)
+            rc = ldms_xprt_send(self.xprt, <char*>c_data, data_len)
         if rc:
             raise RuntimeError("ldms_xprt_send() error: {}"\
                                .format(ERRNO_SYM(rc)))
@@ -2084,3 +3602,108 @@ cdef class Xprt(object):
     def msg_max(self):
         """Maximum length of send/recv message"""
         return ldms_xprt_msg_max(self.xprt)
+
+    # ----- asyncio ----- #
+
+    async def aconnect(self, host, port=411):
+        """await X.aconnect(host, port=411) - connect to the peer (asyncio)
+
+        The awaitable variant of the blocking `connect()`. ConnectionError is
+        raised if the connection is rejected or failed. The data sent by the
+        peer afterward is delivered by `arecv()`.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._aio_recv_queue = asyncio.Queue()
+        self.connect(host, port, cb=_aio_xprt_cb, cb_arg=(loop, fut))
+        await fut
+
+    async def arecv(self):
+        """await X.arecv() -> bytes - receive data from the peer (asyncio)
+
+        Only available on transports connected by `aconnect()`.
+        ConnectionError is raised when the transport is disconnected.
+        """
+        if self._aio_recv_queue is None:
+            raise RuntimeError("arecv() requires a transport from aconnect()")
+        b = await self._aio_recv_queue.get()
+        if b is None:
+            self._aio_recv_queue.put_nowait(None) # for the subsequent calls
+            raise ConnectionError(ENOTCONN, "Transport disconnected")
+        return b
+
+    async def arecv_iter(self):
+        """async for b in X.arecv_iter() - iterate over the received data
+
+        The iteration ends when the transport is disconnected.
+        """
+        while True:
+            try:
+                b = await self.arecv()
+            except ConnectionError:
+                return
+            yield b
+
+    async def adir(self):
+        """await X.adir() -> list of DirSet (asyncio)
+
+        The awaitable variant of the blocking `dir()`. Like `dir()`, it
+        returns the sets of the `dir_cache()` while it is open, and raises
+        RuntimeError with EBUSY while another DIR_F_NOTIFY dir (e.g.
+        `adir_events()`) is open on the transport.
+        """
+        loop = asyncio.get_running_loop()
+        dc = self._dir_cache
+        if dc is not None:
+            await loop.run_in_executor(None, dc.wait_ready)
+            return dc.sets()
+        fut = loop.create_future()
+        self.dir(cb=_aio_dir_cb, cb_arg=(loop, fut, list()))
+        return await fut
+
+    async def adir_events(self):
+        """async for dd in X.adir_events() - iterate over dir events (asyncio)
+
+        Performs `dir()` with DIR_F_NOTIFY and yields DirData of the DIR_LIST
+        results followed by DIR_ADD, DIR_DEL and DIR_UPD events as they arrive.
+        Closing the iterator (e.g. `break` out of `async for`) cancels the dir
+        notification. RuntimeError is raised on a dir error status.
+
+        LDMS allows only one dir notification per transport and no other dir
+        while it is open: `dir()`, `adir()` and another `adir_events()` on the
+        transport raise RuntimeError with EBUSY until the iterator is closed
+        and the peer acknowledged the cancel.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        self.dir(cb=_aio_dir_queue_cb, cb_arg=(loop, queue), flags=DIR_F_NOTIFY)
+        try:
+            while True:
+                (status, dd) = await queue.get()
+                if status:
+                    raise RuntimeError("dir callback status: {}"\
+                                       .format(ERRNO_SYM(status)))
+                yield dd
+        finally:
+            self._dir_cancel()
+
+    async def alookup(self, name, flags=0):
+        """await X.alookup(name, flags=0) -> Set or list of Set (asyncio)
+
+        The awaitable variant of the blocking `lookup()` with the same results:
+        a Set for LOOKUP_BY_INSTANCE, or a list of Set for LOOKUP_BY_SCHEMA and
+        LOOKUP_RE. KeyError is raised if the set is not found.
+        """
+        cdef int rc
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        arg = (loop, fut, flags, list())
+        tpl = (self, _aio_lookup_cb, arg, None)
+        Py_INCREF(tpl)
+        rc = ldms_xprt_lookup(self.xprt, BYTES(name), flags,
+                              lookup_cb, <void*>tpl)
+        if rc:
+            Py_DECREF(tpl)
+            raise RuntimeError("ldms_xprt_lookup() error: {}"\
+                               .format(ERRNO_SYM(rc)))
+        return await fut
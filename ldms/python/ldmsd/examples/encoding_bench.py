@@ -0,0 +1,173 @@
+#######################################################################
+# -*- c-basic-offset: 8 -*-
+# Copyright (c) 2020 Open Grid Computing, Inc. All rights reserved.
+# Copyright (c) 2020 Sandia Corporation. All rights reserved.
+# Under the terms of Contract DE-AC04-94AL85000, there is a non-exclusive
+# license for use of this work by or on behalf of the U.S. Government.
+# Export of this program may require a license from the United States
+# Government.
+#
+# This software is available to you under a choice of one of two
+# licenses.  You may choose to be licensed under the terms of the GNU
+# General Public License (GPL) Version 2, available from the file
+# COPYING in the main directory of this source tree, or the BSD-type
+# license below:
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#      Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#      Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#      Neither the name of Sandia nor the names of any contributors may
+#      be used to endorse or promote products derived from this software
+#      without specific prior written permission.
+#
+#      Neither the name of Open Grid Computing nor the names of any
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+#
+#      Modified source versions must be plainly marked as such, and
+#      must not be misrepresented as being the original software.
+#
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+'''
+Compare the JSON and MessagePack encodings of the LDMSD control protocol
+
+The `export` reply of a synthesized producer configuration is encoded in
+both encodings and the bytes on the wire, the number of records of at most
+--msg-max bytes, and the encode and decode times are reported.
+
+If --port is given, the `export` of the producers of a running LDMSD is
+also timed end-to-end over a connection in each encoding.
+'''
+import sys
+import json
+import time
+from argparse import ArgumentParser
+from ldmsd.ldmsd_config import ldmsdInbandConfig
+from ldmsd.ldmsd_request import LDMSD_Message, set_encoding, msgpack
+
+def export_reply(count):
+    result = {}
+    for i in range(count):
+        name = "node-{0:05d}".format(i)
+        result[name] = { "status" : 0,
+                         "value" : { "schema" : "prdcr",
+                                     "enabled" : "true",
+                                     "perm" : "0770",
+                                     "host" : name,
+                                     "port" : "10001",
+                                     "xprt" : "sock",
+                                     "type" : "active",
+                                     "interval" : "20000000",
+                                     "auth" : "DEFAULT" } }
+    return { "reply" : "export", "id" : 1, "status" : 0, "result" : result }
+
+def timeit(fn, repeat):
+    best = None
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        t = time.perf_counter() - t0
+        if best is None or t < best:
+            best = t
+    return best
+
+def num_records(length, msg_max):
+    data_max = msg_max - LDMSD_Message.LDMSD_REC_HDR_SZ
+    return max(1, -(-length // data_max))
+
+def bench_local(args):
+    reply = export_reply(args.count)
+    codecs = [ ("json", lambda o: json.dumps(o).encode(),
+                        lambda b: json.loads(b.decode())),
+               ("msgpack", lambda o: msgpack.packb(o, use_bin_type=False),
+                           lambda b: msgpack.unpackb(b, raw=False)) ]
+    print("export of {0} producers (best of {1})".format(args.count,
+                                                         args.repeat))
+    print("{0:<8} {1:>12} {2:>8} {3:>12} {4:>12}".format("encoding",
+                        "bytes", "records", "encode (ms)", "decode (ms)"))
+    for name, enc, dec in codecs:
+        data = enc(reply)
+        assert dec(data) == reply
+        t_enc = timeit(lambda: enc(reply), args.repeat)
+        t_dec = timeit(lambda: dec(data), args.repeat)
+        print("{0:<8} {1:>12} {2:>8} {3:>12.2f} {4:>12.2f}".format(name,
+                        len(data), num_records(len(data), args.msg_max),
+                        t_enc * 1000, t_dec * 1000))
+
+def bench_live(args):
+    auth_opt = None
+    if args.auth_args:
+        auth_opt = dict(a.split("=", 1) for a in args.auth_args)
+    print("\nlive export of prdcr from {0}:{1}".format(args.host, args.port))
+    for encoding in [ "json", "msgpack" ]:
+        try:
+            ctrl = ldmsdInbandConfig(host = args.host, port = args.port,
+                                     xprt = args.xprt, auth = args.auth,
+                                     auth_opt = auth_opt)
+        except Exception as e:
+            print("Error connecting to {0}:{1}: {2}".format(args.host,
+                                                            args.port, e))
+            return
+        if set_encoding(ctrl, encoding) != encoding:
+            print("{0:<8} not supported by the LDMSD".format(encoding))
+            ctrl.close()
+            continue
+        req = { "request" : "export", "id" : 0,
+                "schema" : [ "prdcr" ] }
+        def export():
+            req["id"] = LDMSD_Message.next_msg_no()
+            LDMSD_Message(ctrl).send(LDMSD_Message.LDMSD_MSG_TYPE_REQ,
+                                          req, None)
+            msg = LDMSD_Message(ctrl).receive()
+            export.num_rec = msg.num_rec
+        t = timeit(export, args.repeat)
+        print("{0:<8} {1:>8} records {2:>12.2f} ms".format(encoding,
+                                                     export.num_rec, t * 1000))
+        ctrl.close()
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description = "Compare the wire size and the "
+                            "parse time of the LDMSD control encodings")
+    parser.add_argument('--count', type = int, default = 10000,
+                        help = "The number of producers (default 10000)")
+    parser.add_argument('--repeat', type = int, default = 5,
+                        help = "The number of repetitions (default 5)")
+    parser.add_argument('--msg-max', type = int, default = 65536,
+                        help = "The maximum record size (default 65536)")
+    parser.add_argument('--host', default = "localhost",
+                        help = "The LDMSD host of the live benchmark")
+    parser.add_argument('--port',
+                        help = "The LDMSD port of the live benchmark")
+    parser.add_argument('--xprt', default = "sock",
+                        help = "The LDMSD transport (default sock)")
+    parser.add_argument('-a', '--auth', default = "none",
+                        help = "The LDMSD authentication method")
+    parser.add_argument('-A', '--auth-args', action = 'append',
+                        help = "The authentication options, NAME=VALUE")
+    args = parser.parse_args()
+    if msgpack is None:
+        print("The msgpack Python module is required")
+        sys.exit(1)
+    bench_local(args)
+    if args.port:
+        bench_live(args)
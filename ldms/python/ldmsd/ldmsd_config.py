@@ -158,10 +158,10 @@ class ldmsdInbandConfig(ldmsdConfig):
             raise RuntimeError("The connection isn't connected.")
         self.ldms.send(cmd)
 
-    def receive_response(self, recv_len = None):
+    def receive_response(self, recv_len = None, timeout = None):
         if self.state != "CONNECTED":
             raise RuntimeError("The connection isn't connected")
-        return self.ldms.recv()
+        return self.ldms.recv(timeout=timeout)
 
     def comm(self, cmd, attrs=None, **kwargs):
         """Communicate
@@ -213,6 +213,6 @@ class ldmsdInbandConfig(ldmsdConfig):
     def close(self):
         if self.state != "CONNECTED":
             return
-        self.ldms.close
+        self.ldms.close()
         self.state = "CLOSED"
         self.ldms = None
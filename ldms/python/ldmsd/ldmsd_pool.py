@@ -0,0 +1,292 @@
+#######################################################################
+# -*- c-basic-offset: 8 -*-
+# Copyright (c) 2016-2018,2020 National Technology & Engineering Solutions
+# of Sandia, LLC (NTESS). Under the terms of Contract DE-NA0003525 with
+# NTESS, the U.S. Government retains certain rights in this software.
+# Copyright (c) 2016-2018,2020 Open Grid Computing, Inc. All rights reserved.
+#
+# This software is available to you under a choice of one of two
+# licenses.  You may choose to be licensed under the terms of the GNU
+# General Public License (GPL) Version 2, available from the file
+# COPYING in the main directory of this source tree, or the BSD-type
+# license below:
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#      Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#      Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#      Neither the name of Sandia nor the names of any contributors may
+#      be used to endorse or promote products derived from this software
+#      without specific prior written permission.
+#
+#      Neither the name of Open Grid Computing nor the names of any
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+#
+#      Modified source versions must be plainly marked as such, and
+#      must not be misrepresented as being the original software.
+#
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#######################################################################
+
+"""Pooled LDMSD control connections and fan-out requests
+
+LdmsdPool keeps one pipelined control connection (an `LDMSD_Pipeline` on an
+`ldmsd_config.ldmsdInbandConfig`) per daemon, keyed by
+(host, port, xprt, auth, auth_opt), so that a tool controlling many daemons
+pays for the transport setup and authentication once per daemon instead of
+once per command. A connection that failed, or that fails the health check,
+is reconnected on the next use.
+
+`LdmsdPool.fanout()` sends the same request to many daemons concurrently and
+returns a FanoutResult table, e.g.
+
+>>> pool = LdmsdPool(auth="munge")
+>>> res = pool.fanout([("node1", 411), ("node2", 411)],
+...                   {"request": "version"})
+>>> print(res.table())
+>>> pool.close()
+"""
+
+import errno
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ldmsd.ldmsd_config import ldmsdInbandConfig
+from ldmsd.ldmsd_request import LDMSD_Message, LDMSD_Pipeline, \
+                                LDMSDRequestException
+
+class LdmsdPool(object):
+    """A pool of LDMSD control connections
+
+    Parameters:
+      xprt, auth, auth_opt - The defaults of the daemon connections.
+      max_inflight - The bound of the in-flight requests per connection.
+      health_interval - A connection idle for more than `health_interval`
+                        seconds is checked with a `version` request before
+                        it is reused.
+      timeout - The timeout (seconds) of the health check requests.
+    """
+    def __init__(self, xprt="sock", auth="none", auth_opt=None,
+                 max_inflight=1024, health_interval=30, timeout=5):
+        self.xprt = xprt
+        self.auth = auth
+        self.auth_opt = auth_opt
+        self.max_inflight = max_inflight
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # key :-> [pipeline, last use time]
+        self._conns = dict()
+        # key :-> lock serializing the connect of a daemon
+        self._connecting = dict()
+
+    def key(self, host, port, xprt=None, auth=None, auth_opt=None):
+        """The pool key of a daemon connection"""
+        if auth_opt is None:
+            auth_opt = self.auth_opt
+        opts = tuple(sorted(auth_opt.items())) if auth_opt else ()
+        return (host, str(port), xprt or self.xprt, auth or self.auth, opts)
+
+    def _connect(self, key):
+        (host, port, xprt, auth, opts) = key
+        ctrl = ldmsdInbandConfig(host=host, port=port, xprt=xprt, auth=auth,
+                                 auth_opt=dict(opts) if opts else None)
+        return LDMSD_Pipeline(ctrl, max_inflight=self.max_inflight)
+
+    def _discard(self, key, pl):
+        with self._lock:
+            ent = self._conns.get(key)
+            if ent and ent[0] is pl:
+                del self._conns[key]
+        pl.close()
+        pl.ctrl.close()
+
+    def ping(self, pl):
+        """Check the connection with a `version` request"""
+        try:
+            rsp = pl.request({"request": "version",
+                              "id": LDMSD_Message.next_msg_no()},
+                             timeout=self.timeout)
+        except Exception:
+            return False
+        return rsp.get("status") == 0
+
+    def get(self, host, port, xprt=None, auth=None, auth_opt=None):
+        """Return the LDMSD_Pipeline connected to the daemon
+
+        An existing connection is reused if it is healthy; otherwise a new
+        connection is made. The connection errors are raised.
+        """
+        key = self.key(host, port, xprt, auth, auth_opt)
+        with self._lock:
+            clock = self._connecting.setdefault(key, threading.Lock())
+        with clock:
+            with self._lock:
+                ent = self._conns.get(key)
+            if ent:
+                (pl, last) = ent
+                now = time.time()
+                if pl.is_alive() and (now - last < self.health_interval or
+                                      self.ping(pl)):
+                    ent[1] = now
+                    return pl
+                self._discard(key, pl)
+            pl = self._connect(key)
+            with self._lock:
+                self._conns[key] = [pl, time.time()]
+            return pl
+
+    def request(self, host, port, json_ent=None, json_str=None,
+                timeout=None, **kwargs):
+        """Send a request to a daemon and return its JSON response
+
+        `kwargs` are the connection parameters of `get()`.
+        """
+        return self.get(host, port, **kwargs).request(json_ent, json_str,
+                                                      timeout)
+
+    def check(self):
+        """Ping all pooled connections and drop the unhealthy ones
+
+        Return the keys of the dropped connections.
+        """
+        with self._lock:
+            conns = list(self._conns.items())
+        dropped = list()
+        for key, (pl, last) in conns:
+            if not (pl.is_alive() and self.ping(pl)):
+                self._discard(key, pl)
+                dropped.append(key)
+        return dropped
+
+    def fanout(self, daemons, json_ent=None, json_str=None, timeout=None,
+               max_connect=32):
+        """Send the request to all `daemons` concurrently
+
+        `daemons` is a list of `(host, port)` or of dicts of the `get()`
+        parameters. The new connections are made by up to `max_connect`
+        threads; the requests are then all put in flight before any response
+        is awaited. `timeout` (seconds) bounds the wait for the responses.
+
+        Return a FanoutResult with a row per daemon, in the given order.
+        """
+        targets = [ d if isinstance(d, dict) else
+                    { "host": d[0], "port": d[1] } for d in daemons ]
+        res = FanoutResult()
+        futs = list()
+        nthreads = max(1, min(max_connect, len(targets)))
+        with ThreadPoolExecutor(max_workers=nthreads) as tp:
+            conns = [ tp.submit(self.get, **t) for t in targets ]
+            for t, c in zip(targets, conns):
+                try:
+                    fut = c.result().submit(json_ent, json_str)
+                except Exception as e:
+                    fut = e
+                futs.append((t, fut))
+        wait([ f for (t, f) in futs if not isinstance(f, Exception) ],
+             timeout=timeout)
+        for t, fut in futs:
+            name = "{0}:{1}".format(t["host"], t["port"])
+            if isinstance(fut, Exception):
+                res.add(name, None, fut)
+            elif not fut.done():
+                res.add(name, None, LDMSDRequestException("Timed out",
+                                                          errno.ETIMEDOUT))
+            elif fut.exception() is not None:
+                res.add(name, None, fut.exception())
+            else:
+                res.add(name, fut.result(), None)
+        return res
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            conns = list(self._conns.items())
+            self._conns.clear()
+        for key, (pl, last) in conns:
+            pl.close()
+            pl.ctrl.close()
+
+    def __len__(self):
+        return len(self._conns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FanoutResult(object):
+    """The aggregated result of `LdmsdPool.fanout()`
+
+    `rows` is a list of `(daemon, status, response, error)`, where `daemon` is
+    "HOST:PORT", `response` is the JSON response (None on error), `status` is
+    the response status or the errno of the error and `error` is the exception
+    (None on success).
+    """
+    def __init__(self):
+        self.rows = list()
+
+    def add(self, daemon, rsp, error):
+        if error is not None:
+            status = getattr(error, "errcode", errno.EIO)
+        else:
+            status = rsp.get("status", 0)
+        self.rows.append((daemon, status, rsp, error))
+
+    def ok(self):
+        """The rows of the daemons responding with status 0"""
+        return [ r for r in self.rows if r[1] == 0 ]
+
+    def failed(self):
+        """The rows of the failed requests"""
+        return [ r for r in self.rows if r[1] != 0 ]
+
+    def table(self, key=None):
+        """Format the rows as a text table
+
+        `key` extracts the reported value from a successful response; by
+        default, the "result" of the response is reported.
+        """
+        width = max([ len(r[0]) for r in self.rows ] + [len("Daemon")])
+        lines = [ "{0:{w}} {1:6} {2}".format("Daemon", "Status", "Result",
+                                             w=width),
+                  "{0} {1} {2}".format("-"*width, "-"*6, "-"*40) ]
+        for (daemon, status, rsp, error) in self.rows:
+            if error is not None:
+                val = str(error)
+            elif status != 0:
+                val = rsp.get("msg", "")
+            else:
+                val = key(rsp) if key else rsp.get("result")
+            lines.append("{0:{w}} {1:<6} {2}".format(daemon, status, val,
+                                                     w=width))
+        return "\n".join(lines)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
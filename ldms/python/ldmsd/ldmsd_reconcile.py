@@ -0,0 +1,372 @@
+#######################################################################
+# -*- c-basic-offset: 8 -*-
+# Copyright (c) 2016-2018,2020 National Technology & Engineering Solutions
+# of Sandia, LLC (NTESS). Under the terms of Contract DE-NA0003525 with
+# NTESS, the U.S. Government retains certain rights in this software.
+# Copyright (c) 2016-2018,2020 Open Grid Computing, Inc. All rights reserved.
+#
+# This software is available to you under a choice of one of two
+# licenses.  You may choose to be licensed under the terms of the GNU
+# General Public License (GPL) Version 2, available from the file
+# COPYING in the main directory of this source tree, or the BSD-type
+# license below:
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#      Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#      Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#      Neither the name of Sandia nor the names of any contributors may
+#      be used to endorse or promote products derived from this software
+#      without specific prior written permission.
+#
+#      Neither the name of Open Grid Computing nor the names of any
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+#
+#      Modified source versions must be plainly marked as such, and
+#      must not be misrepresented as being the original software.
+#
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#######################################################################
+
+"""Desired-state reconciliation of the LDMSD configuration objects
+
+The desired configuration is given as `create` and `update` requests (e.g.
+the `json` lines of a configuration file). It is compared with the configuration
+exported by a running LDMSD, and only the differing producers, updaters and
+storage policies are changed:
+
+- an object only in the desired configuration is created;
+- an object whose configuration attributes differ is disabled, deleted and
+  created again;
+- an object differing only in its `enabled` state is enabled or disabled;
+- with `prune`, an object missing from the desired configuration is disabled
+  and deleted.
+
+The changes are applied in dependency order: the objects are stopped and
+deleted consumers first (strgp, updtr, prdcr), then created and started
+producers first (prdcr, updtr, strgp). Each phase is sent in `batch`
+requests and completes before the next one starts.
+
+Example:
+>>> desired = desired_config(reqs)
+>>> current = export_config(pipeline)
+>>> diff = ConfigDiff(desired, current)
+>>> print(diff)
+>>> errs = diff.apply(pipeline)
+"""
+
+import re
+import json
+import copy
+
+from ldmsd.ldmsd_request import LDMSD_Message, LDMSDRequestException
+
+# The reconciled cfgobj schemas in dependency order
+SCHEMAS = ("prdcr", "updtr", "strgp")
+
+# The exported attributes that are not configuration attributes
+_NOT_CONFIG = ("enabled", "state")
+
+# The time attributes, given as integer microseconds or as a string with a
+# unit (see ldmsd_time_str2us())
+_TIME_ATTRS = ("interval", "offset")
+
+_TIME_UNITS = ( (lambda u: u == "" or u == "us" or u.startswith("micro"), 1),
+                (lambda u: u == "ms" or u.startswith("milli"), 1000),
+                (lambda u: u == "s" or u.startswith("sec"), 1000000),
+                (lambda u: u.startswith("min"), 60000000),
+                (lambda u: u.startswith("h"), 3600000000),
+                (lambda u: u.startswith("day"), 86400000000) )
+
+# LDMSD_UPDT_HINT_OFFSET_NONE, the exported "none" offset
+_OFFSET_NONE = -2**63
+
+def _time_str2us(s):
+    """The microseconds of the time string `s`, as ldmsd_time_str2us()"""
+    m = re.match(r"\s*(\d+)\s*(\S*)", s)
+    if not m:
+        return s
+    x, unit = int(m.group(1)), m.group(2)
+    for match, mult in _TIME_UNITS:
+        if match(unit):
+            return x * mult
+    return 0
+
+def _strtol(s):
+    """The integer value of `s` as strtol(s, NULL, 0)"""
+    m = re.match(r"\s*([+-]?)(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9][0-9]*)", s)
+    if not m:
+        return 0
+    sign, num = m.groups()
+    if num[:2] in ("0x", "0X"):
+        x = int(num, 16)
+    elif num[0] == "0":
+        x = int(num, 8)
+    else:
+        x = int(num)
+    return -x if sign == "-" else x
+
+def _cfg_value(attr, value):
+    """The desired attribute value in the format the LDMSD exports it
+
+    Time attributes become microseconds, `perm` the octal string and `push`
+    the update push flags, as the LDMSD parses them.
+    """
+    if attr in _TIME_ATTRS and isinstance(value, str):
+        if attr == "offset" and value.lower() == "none":
+            return _OFFSET_NONE
+        return _time_str2us(value)
+    if attr == "perm" and isinstance(value, str):
+        return "0{0:o}".format(_strtol(value))
+    if attr == "push":
+        if isinstance(value, bool):
+            return 1 if value else 0
+        if isinstance(value, str):
+            return { "onchange": 3, "true": 1,
+                     "yes": 1 }.get(value.lower(), value)
+    return value
+
+def _norm(attr, value):
+    """Normalize an attribute value for comparison"""
+    if attr == "perm" and isinstance(value, str):
+        try:
+            return int(value, 8)
+        except ValueError:
+            return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, list):
+        return [ _norm(attr, v) for v in value ]
+    if isinstance(value, dict):
+        return { k: _norm(k, v) for k, v in value.items() }
+    return value
+
+def desired_config(reqs, schemas=SCHEMAS):
+    """Build the desired configuration from `create` and `update` requests
+
+    `reqs` is an iterable of request objects, applied in order as the LDMSD
+    does: a `create` request adds the objects in `spec`; an `update` request
+    changes the `enabled` state and the attributes (`default`, then `spec`)
+    of the objects in `spec`, and the `enabled` state and the `default`
+    attributes of the objects matching the `re` regular expressions. The
+    other requests and the objects of the schemas not in `schemas` are
+    ignored. ValueError is raised if an `update` request names an object not
+    created before.
+
+    Return {schema: {name: {"enabled": bool, "attrs": dict}}}. The attribute
+    values are kept as given in the requests, so that they can be sent again
+    in `create` requests; they are converted to the format the LDMSD exports
+    them (e.g. `interval` "1sec" as 1000000) only to be compared.
+    """
+    cfg = { s: dict() for s in schemas }
+    for req in reqs:
+        objs = cfg.get(req.get("schema"))
+        if objs is None:
+            continue
+        dft = req.get("default", {})
+        if req.get("request") == "create":
+            for name, spc in req.get("spec", {}).items():
+                attrs = copy.deepcopy(dft)
+                attrs.update(copy.deepcopy(spc))
+                objs[name] = { "enabled": req.get("enabled", False),
+                               "attrs": attrs }
+        elif req.get("request") == "update":
+            targets = []
+            for name, spc in req.get("spec", {}).items():
+                if name not in objs:
+                    raise ValueError("update: {0} '{1}' not found"
+                                     .format(req["schema"], name))
+                targets.append((objs[name], copy.deepcopy(spc)))
+            for rx in req.get("re", []):
+                targets.extend([ (obj, {}) for name, obj in objs.items()
+                                 if re.search(rx, name) ])
+            for obj, spc in targets:
+                obj["attrs"].update(copy.deepcopy(dft))
+                obj["attrs"].update(spc)
+                if "enabled" in req:
+                    obj["enabled"] = req["enabled"]
+    return cfg
+
+def export_config(pl, schemas=SCHEMAS, timeout=None):
+    """Export the configuration of the LDMSD connected by the LDMSD_Pipeline
+
+    Return {schema: {name: {"enabled": bool, "attrs": dict}}}.
+    """
+    futs = [ (s, pl.submit({ "request" : "export",
+                             "id"      : LDMSD_Message.next_msg_no(),
+                             "schema"  : s })) for s in schemas ]
+    cfg = dict()
+    for s, fut in futs:
+        rsp = fut.result(timeout)
+        if rsp["status"] != 0:
+            raise LDMSDRequestException(message=rsp.get("msg", ""),
+                                        errcode=rsp["status"])
+        objs = cfg[s] = dict()
+        for name, res in rsp.get("result", {}).items():
+            attrs = res.get("value", {})
+            objs[name] = { "enabled": attrs.get("enabled", False),
+                           "attrs": attrs }
+    return cfg
+
+class ConfigDiff(object):
+    """The change set from the `current` to the `desired` configuration
+
+    Attributes:
+      create   - [(schema, name)] of the objects to be created
+      delete   - [(schema, name)] of the objects to be deleted (`prune`)
+      recreate - [(schema, name, [attr])] of the objects to be replaced and
+                 the differing attributes
+      enable   - [(schema, name, enabled)] of the objects of which only the
+                 `enabled` state changes
+    """
+    def __init__(self, desired, current, prune=False):
+        self.desired = desired
+        self.current = current
+        self.create = []
+        self.delete = []
+        self.recreate = []
+        self.enable = []
+        for s in SCHEMAS:
+            want = desired.get(s, {})
+            have = current.get(s, {})
+            for name in sorted(want):
+                w = want[name]
+                h = have.get(name)
+                if h is None:
+                    self.create.append((s, name))
+                    continue
+                attrs = self._diff_attrs(w["attrs"], h["attrs"])
+                if attrs:
+                    self.recreate.append((s, name, attrs))
+                elif w["enabled"] != h["enabled"]:
+                    self.enable.append((s, name, w["enabled"]))
+            if prune:
+                self.delete.extend([ (s, name) for name in sorted(have)
+                                     if name not in want ])
+
+    @staticmethod
+    def _diff_attrs(want, have):
+        """The desired attributes differing from the current ones
+
+        Only the attributes given in the desired configuration are compared;
+        the others keep the LDMSD defaults. The desired values are compared in
+        the format the LDMSD exports them.
+        """
+        return [ a for a, v in sorted(want.items()) if a not in _NOT_CONFIG
+                 and _norm(a, _cfg_value(a, v)) != _norm(a, have.get(a)) ]
+
+    def __bool__(self):
+        return bool(self.create or self.delete or self.recreate or self.enable)
+
+    def __str__(self):
+        lines = []
+        for s, name in self.delete:
+            lines.append("- {0} {1}".format(s, name))
+        for s, name, attrs in self.recreate:
+            lines.append("~ {0} {1} ({2})".format(s, name, ", ".join(attrs)))
+        for s, name, enabled in self.enable:
+            lines.append("~ {0} {1} ({2})".format(s, name,
+                         "enable" if enabled else "disable"))
+        for s, name in self.create:
+            lines.append("+ {0} {1}".format(s, name))
+        if not lines:
+            return "no changes"
+        return "\n".join(lines)
+
+    def _update(self, schema, names, enabled):
+        return { "request" : "update",
+                 "schema"  : schema,
+                 "enabled" : enabled,
+                 "spec"    : { n: {} for n in names } }
+
+    def phases(self):
+        """The requests of the change set, grouped in ordered phases"""
+        gone = [ (s, n) for (s, n) in self.delete ] + \
+               [ (s, n) for (s, n, a) in self.recreate ]
+        new = [ (s, n) for (s, n) in self.create ] + \
+              [ (s, n) for (s, n, a) in self.recreate ]
+        stop, remove, add, start = [], [], [], []
+        for s in reversed(SCHEMAS):
+            names = [ n for (_s, n) in gone if _s == s ]
+            names += [ n for (_s, n, e) in self.enable if _s == s and not e ]
+            if names:
+                stop.append(self._update(s, names, False))
+            names = [ n for (_s, n) in gone if _s == s ]
+            if names:
+                remove.append({ "request" : "delete",
+                                "schema"  : s,
+                                "key"     : names })
+        for s in SCHEMAS:
+            want = self.desired.get(s, {})
+            spec = { n: want[n]["attrs"] for (_s, n) in new if _s == s }
+            if spec:
+                add.append({ "request" : "create",
+                             "schema"  : s,
+                             "spec"    : spec })
+            names = [ n for (_s, n) in new if _s == s and want[n]["enabled"] ]
+            names += [ n for (_s, n, e) in self.enable if _s == s and e ]
+            if names:
+                start.append(self._update(s, names, True))
+        return [ p for p in (stop, remove, add, start) if p ]
+
+    def apply(self, pl, batch_size=1000, timeout=None):
+        """Apply the change set through the LDMSD_Pipeline `pl`
+
+        The requests of a phase are sent in `batch` requests of up to
+        `batch_size` requests each. A phase is applied after all requests of
+        the previous phase have been answered.
+
+        Return the list of `(request, error message)` of the failed requests.
+        """
+        errs = []
+        for phase in self.phases():
+            futs = []
+            for i in range(0, len(phase), batch_size):
+                reqs = phase[i:i+batch_size]
+                futs.append((reqs, pl.submit({
+                                "request"  : "batch",
+                                "id"       : LDMSD_Message.next_msg_no(),
+                                "requests" : reqs })))
+            for reqs, fut in futs:
+                rsp = fut.result(timeout)
+                if rsp["status"] != 0:
+                    errs.extend([ (r, rsp.get("msg", rsp["status"]))
+                                  for r in reqs ])
+                    continue
+                for req, sub in zip(reqs, rsp["result"]):
+                    errs.extend(_rsp_errors(req, sub))
+        return errs
+
+def _rsp_errors(req, rsp):
+    errs = []
+    if rsp["status"] != 0:
+        errs.append((req, rsp.get("msg", rsp["status"])))
+    result = rsp.get("result")
+    if isinstance(result, dict):
+        for name, r in result.items():
+            if isinstance(r, dict) and r.get("status", 0) != 0:
+                errs.append((req, "'{0}': {1}".format(name,
+                                                      r.get("msg", r["status"]))))
+    return errs
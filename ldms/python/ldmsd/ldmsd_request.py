@@ -50,7 +50,24 @@
 
 import json
 import errno
+import re
 import struct
+import threading
+import traceback
+import asyncio
+from concurrent.futures import Future
+from queue import Empty
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+class LDMSDRequestException(Exception):
+    """An error in the communication with an LDMSD"""
+    def __init__(self, message, errcode=errno.EIO):
+        super(LDMSDRequestException, self).__init__(message)
+        self.message = message
+        self.errcode = errcode
 
 class LDMSD_Message(object):
     LDMSD_MSG_TYPE_REQ = 1
@@ -60,82 +77,510 @@ class LDMSD_Message(object):
 
     LDMSD_REC_F_SOM = 1
     LDMSD_REC_F_EOM = 2
+    LDMSD_REC_F_MSGPACK = 4
 
     MESSAGE_NO = 1
+    MESSAGE_NO_LOCK = threading.Lock()
     LDMSD_REC_HDR_FMT = '!LLLL'
     LDMSD_REC_HDR_SZ = struct.calcsize(LDMSD_REC_HDR_FMT)
 
+    @classmethod
+    def next_msg_no(cls):
+        """Allocate a message number, unique in the process"""
+        with cls.MESSAGE_NO_LOCK:
+            msg_no = LDMSD_Message.MESSAGE_NO
+            LDMSD_Message.MESSAGE_NO = msg_no % 0xFFFFFFFF + 1
+        return msg_no
+
+    # per-thread reusable record buffer of send()
+    _send_buf = threading.local()
+
     def __init__(self, ctrl):
         self.ctrl = ctrl
         self.type = None
         self.msg_no = -1
+        self.rec_flags = 0
         self.json_str = ""
         self.json_ent = None
         self.num_rec = 0
 
-    def _newRecord(self, flags, json_str_offset, remaining):
-        """Create a record
-
-        offset is offset from the request header
-        sz is the size of the data to be sent
-        """
-        rec_len = self.LDMSD_REC_HDR_SZ + remaining
-        hdr =  struct.pack(self.LDMSD_REC_HDR_FMT, self.type, flags,
-                           self.msg_no, rec_len)
-        data = struct.pack(str(remaining) + 's', \
-                           self.json_str[json_str_offset:json_str_offset+remaining].encode())
-        return hdr + data
+    @classmethod
+    def _record_buffer(cls, size):
+        """A reusable record buffer of at least `size` bytes"""
+        buf = getattr(cls._send_buf, "buf", None)
+        if buf is None or len(buf) < size:
+            buf = cls._send_buf.buf = bytearray(size)
+        return buf
 
-    def send(self, type, json_ent, json_str):
-        self.msg_no = self.MESSAGE_NO
-        self.MESSAGE_NO += 1
+    def send(self, type, json_ent, json_str, msg_no=None):
+        if msg_no is None:
+            msg_no = self.next_msg_no()
+        self.msg_no = msg_no
 
         self.type = type
         if json_str:
             self.json_str += json_str
-        if json_ent is not None:
-            self.json_str = json.dumps(json_ent)
-        self.json_str_len = len(self.json_str)
+        enc_flags = 0
+        if getattr(self.ctrl, "encoding", "json") == "msgpack":
+            # the connection negotiated MessagePack (see set_encoding())
+            if json_ent is None:
+                json_ent = json.loads(self.json_str)
+            data = msgpack.packb(json_ent, use_bin_type=False)
+            enc_flags = self.LDMSD_REC_F_MSGPACK
+        else:
+            if json_ent is not None:
+                self.json_str = json.dumps(json_ent)
+            data = self.json_str.encode()
+        # encode once; the records are framed from the encoded bytes
+        data = memoryview(data)
+        self.json_str_len = len(data)
 
         max_msg = self.ctrl.getMaxRecvLen()
+        max_data = max_msg - self.LDMSD_REC_HDR_SZ
+        buf = self._record_buffer(max_msg)
+        rec = memoryview(buf)
         offset = 0
-        leftover = self.json_str_len
-        try:
-            while True:
-                remaining = max_msg - self.LDMSD_REC_HDR_SZ
-                if offset == 0:
-                    flags = self.LDMSD_REC_F_SOM
-                else:
-                    flags = 0
-                if remaining > leftover:
-                    remaining = leftover
-                    flags |= self.LDMSD_REC_F_EOM
-                record = self._newRecord(flags, offset, remaining)
-                offset += remaining
-                leftover -= remaining
-                self.ctrl.send_command(bytes(record))
-                self.num_rec += 1
-                if leftover == 0:
-                    break
-        except:
-            raise
+        while True:
+            remaining = min(max_data, self.json_str_len - offset)
+            flags = enc_flags
+            if offset == 0:
+                flags |= self.LDMSD_REC_F_SOM
+            if offset + remaining == self.json_str_len:
+                flags |= self.LDMSD_REC_F_EOM
+            rec_len = self.LDMSD_REC_HDR_SZ + remaining
+            struct.pack_into(self.LDMSD_REC_HDR_FMT, buf, 0, self.type, flags,
+                             self.msg_no, rec_len)
+            rec[self.LDMSD_REC_HDR_SZ:rec_len] = data[offset:offset+remaining]
+            self.ctrl.send_command(rec[:rec_len])
+            self.num_rec += 1
+            offset += remaining
+            if flags & self.LDMSD_REC_F_EOM:
+                break
 
-    def receive(self):
-        json_str = ""
+    def _records(self):
+        """Receive the records of a message, yielding their data"""
         self.num_rec = 0
         while True:
             record = self.ctrl.receive_response()
             if record is None:
                 raise LDMSDRequestException(message="No data received",
-                                            errcode=errno.ECONRESET)
-            (self.type, flags, self.msg_no, rec_len) = struct.unpack(self.LDMSD_REC_HDR_FMT, \
-                                                              record[:self.LDMSD_REC_HDR_SZ])
-            json_str += struct.unpack(str(rec_len - self.LDMSD_REC_HDR_SZ) + 's',
-                                      record[self.LDMSD_REC_HDR_SZ:])[0].decode()
+                                            errcode=errno.ECONNRESET)
+            (self.type, flags, self.msg_no, rec_len) = struct.unpack_from(
+                                            self.LDMSD_REC_HDR_FMT, record)
+            if self.num_rec == 0:
+                self.rec_flags = flags
             self.num_rec += 1
+            yield memoryview(record)[self.LDMSD_REC_HDR_SZ:rec_len]
             if (flags & self.LDMSD_REC_F_EOM):
                 break
-        self.json_ent = json.loads(json_str)
+
+    @classmethod
+    def decode(cls, data, flags):
+        """Decode a received message according to its record flags"""
+        if flags & cls.LDMSD_REC_F_MSGPACK:
+            if msgpack is None:
+                raise LDMSDRequestException("Received a MessagePack message "
+                                            "but msgpack is not installed",
+                                            errno.ENOTSUP)
+            return msgpack.unpackb(bytes(data), raw=False)
+        return json.loads(data.decode())
+
+    def receive(self):
+        data = bytearray()
+        for chunk in self._records():
+            data += chunk
+        self.json_ent = self.decode(data, self.rec_flags)
         return self
 
+    def receive_stream(self):
+        """Receive a response, yielding its result entries as they arrive
+
+        The response is parsed incrementally as the records arrive (see
+        JSONReplyStream). For each member of the "result" JSON object of the
+        response, `(name, value)` is yielded as soon as the member is complete,
+        so that a very large response (e.g. a query of thousands of objects)
+        is neither buffered nor parsed as a whole. When the generator is
+        exhausted, `json_ent` is the response without the "result" entries.
+        """
+        parser = JSONReplyStream()
+        data = None
+        for chunk in self._records():
+            if self.rec_flags & self.LDMSD_REC_F_MSGPACK:
+                # MessagePack is compact and fast to decode as a whole
+                if data is None:
+                    data = bytearray()
+                data += chunk
+                continue
+            for ent in parser.feed(chunk):
+                yield ent
+        if data is None:
+            self.json_ent = parser.close()
+            return
+        self.json_ent = self.decode(data, self.rec_flags)
+        result = self.json_ent.pop("result", None)
+        if isinstance(result, dict):
+            for ent in result.items():
+                yield ent
+
+
+class JSONReplyStream(object):
+    """Incremental parser of an LDMSD JSON reply
+
+    `feed()` takes the reply text in chunks of any size and returns the
+    `(name, value)` members of the top-level "result" object completed so far.
+    The other top-level attributes (e.g. "reply", "id", "status", "msg") are
+    collected and returned by `close()`. The parser keeps only the incomplete
+    tail of the text.
+    """
+    _STRUCT = re.compile(rb'["{}\[\],:]')
+    _STR_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.S)
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.pos = 0        # scan position in `buf`
+        self.depth = 0      # nesting depth at `pos`
+        self.key = [None, None, None] # the current member key at depth 1, 2
+        self.vstart = None  # the start of the current member value
+        self.in_result = False
+        self.header = dict()
+
+    def _value(self, end):
+        v = json.loads(bytes(self.buf[self.vstart:end]))
+        self.vstart = None
+        return v
+
+    def feed(self, data):
+        buf = self.buf
+        buf += data
+        out = list()
+        pos = self.pos
+        # the member values of interest are at depth 1 (top-level) and at
+        # depth 2 inside the "result" object
+        vdepth = 2 if self.in_result else 1
+        while True:
+            m = self._STRUCT.search(buf, pos)
+            if not m:
+                pos = len(buf)
+                break
+            pos = m.start()
+            c = buf[pos]
+            if c == 0x22: # '"'
+                e = self._STR_END.match(buf, pos + 1)
+                if not e:
+                    break # incomplete string; wait for more data
+                if self.depth == vdepth and self.vstart is None:
+                    self.key[vdepth] = json.loads(bytes(buf[pos:e.end()]))
+                pos = e.end()
+                continue
+            if c == 0x3a: # ':'
+                if self.depth == vdepth:
+                    self.vstart = pos + 1
+            elif c == 0x2c or c == 0x7d or c == 0x5d: # ',', '}', ']'
+                if self.depth == vdepth and self.vstart is not None:
+                    v = self._value(pos)
+                    if self.in_result:
+                        out.append((self.key[2], v))
+                    else:
+                        self.header[self.key[1]] = v
+                if c != 0x2c:
+                    self.depth -= 1
+                    if self.in_result and self.depth == 1:
+                        # end of the "result" object
+                        self.in_result = False
+                        vdepth = 1
+            else: # '{', '['
+                if c == 0x7b and self.depth == 1 and self.vstart is not None \
+                        and self.key[1] == "result" \
+                        and not buf[self.vstart:pos].strip():
+                    self.in_result = True
+                    self.vstart = None
+                    vdepth = 2
+                self.depth += 1
+            pos += 1
+        # drop the consumed text
+        keep = pos if self.vstart is None else self.vstart
+        if keep:
+            del buf[:keep]
+            pos -= keep
+            if self.vstart is not None:
+                self.vstart = 0
+        self.pos = pos
+        return out
+
+    def close(self):
+        """Finish parsing and return the reply attributes other than "result"
+        """
+        if self.depth or self.buf.strip():
+            raise ValueError("incomplete JSON reply")
+        return self.header
+
+
+def set_encoding(ctrl, encoding="msgpack"):
+    """Select the message encoding of the `ctrl` connection
+
+    The LDMSD is asked for the encodings it understands with an `encoding`
+    request (in JSON). If it understands `encoding`, and the encoder is
+    available here, the subsequent messages on the connection are sent in
+    `encoding`, and the LDMSD replies in kind. Otherwise, the connection
+    stays in JSON. Return the selected encoding.
+    """
+    ctrl.encoding = "json"
+    if encoding == "json" or (encoding == "msgpack" and msgpack is None):
+        return ctrl.encoding
+    req = { "request" : "encoding", "id" : LDMSD_Message.next_msg_no() }
+    LDMSD_Message(ctrl).send(LDMSD_Message.LDMSD_MSG_TYPE_REQ, req, None)
+    rsp = LDMSD_Message(ctrl).receive().json_ent
+    if rsp["status"] == 0 and encoding in rsp["result"].get("encodings", []):
+        ctrl.encoding = encoding
+    return ctrl.encoding
+
+def query_iter(ctrl, schema, names=None, limit=256):
+    """Query the cfgobjs of `schema`, yielding `(name, result)` as they arrive
+
+    If `names` is given, only the named objects are queried. Otherwise, all
+    objects of the schema are queried in pages of at most `limit` objects,
+    resuming from the "cursor" of the previous page, so that neither the
+    daemon nor the client holds more than one page at a time. A page is
+    parsed incrementally by LDMSD_Message.receive_stream().
+    """
+    cursor = None
+    while True:
+        req = { "request" : "query",
+                "id"      : LDMSD_Message.next_msg_no(),
+                "schema"  : schema }
+        if names is not None:
+            req["key"] = list(names)
+        else:
+            if limit:
+                req["limit"] = limit
+            if cursor is not None:
+                req["cursor"] = cursor
+        LDMSD_Message(ctrl).send(LDMSD_Message.LDMSD_MSG_TYPE_REQ, req, None)
+        rsp = LDMSD_Message(ctrl)
+        for ent in rsp.receive_stream():
+            yield ent
+        hdr = rsp.json_ent
+        if hdr.get("status", 0) != 0:
+            raise LDMSDRequestException(message=hdr.get("msg", ""),
+                                        errcode=hdr["status"])
+        cursor = hdr.get("cursor")
+        if names is not None or cursor is None:
+            break
+
+
+class LDMSD_Pipeline(object):
+    """Pipelined LDMSD request client
+
+    LDMSD_Pipeline keeps many requests in flight on one LDMSD control
+    connection (e.g. `ldmsd_config.ldmsdInbandConfig`). Every request gets a
+    unique `msg_no` and its response records are routed back to the request by
+    the `msg_no` in the record header, so the requests do not wait for the
+    responses of the previous ones.
+
+    A reader thread owns the receive side of the connection; do not use
+    `LDMSD_Message.receive()` on the same connection while the pipeline is
+    open.
+
+    Threaded example:
+    >>> pl = LDMSD_Pipeline(ctrl)
+    >>> futs = [ pl.submit({"request": "create", ...}) for ... ]
+    >>> rsps = [ f.result() for f in futs ] # the JSON responses
+    >>> rsp = pl.request({"request": "version"}) # submit and wait
+    >>> pl.close()
+
+    asyncio example:
+    >>> rsps = await asyncio.gather(*[ pl.arequest(req) for req in reqs ])
+
+    Status watch example (see watch()):
+    >>> pl.watch(lambda msg: print(msg["changes"]), ["prdcr"])
+    """
+    def __init__(self, ctrl, max_inflight=1024):
+        """Create a pipeline on the `ctrl` connection
+
+        `max_inflight` bounds the number of requests awaiting responses;
+        `submit()` blocks when the bound is reached.
+        """
+        self.ctrl = ctrl
+        self.closed = False
+        self._lock = threading.Lock()
+        # msg_no :-> [future, received message, record flags]
+        self._pending = dict()
+        # watch msg_no :-> callback; msg_no :-> [received message, flags]
+        self._watches = dict()
+        self._notify_bufs = dict()
+        self._window = threading.BoundedSemaphore(max_inflight)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        HDR_FMT = LDMSD_Message.LDMSD_REC_HDR_FMT
+        HDR_SZ = LDMSD_Message.LDMSD_REC_HDR_SZ
+        while not self.closed:
+            try:
+                record = self.ctrl.receive_response(timeout=1)
+            except Empty:
+                continue
+            except Exception as e:
+                self._fail_all(e)
+                return
+            if record is None:
+                self._fail_all(LDMSDRequestException("No data received",
+                                                     errno.ECONNRESET))
+                return
+            (type, flags, msg_no, rec_len) = struct.unpack_from(HDR_FMT, record)
+            if type == LDMSD_Message.LDMSD_MSG_TYPE_NOTIFY:
+                self._notify_record(flags, msg_no,
+                                    memoryview(record)[HDR_SZ:rec_len])
+                continue
+            with self._lock:
+                ent = self._pending.get(msg_no)
+                if ent is None:
+                    continue # not ours (e.g. a late response); drop it
+                if flags & LDMSD_Message.LDMSD_REC_F_SOM:
+                    ent[2] = flags
+                ent[1] += memoryview(record)[HDR_SZ:rec_len]
+                if not (flags & LDMSD_Message.LDMSD_REC_F_EOM):
+                    continue
+                del self._pending[msg_no]
+            self._window.release()
+            (fut, chunks, rflags) = ent
+            if fut.cancelled():
+                continue
+            try:
+                fut.set_result(LDMSD_Message.decode(chunks, rflags))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _notify_record(self, flags, msg_no, data):
+        """Reassemble a NOTIFY message and hand it to its watch callback"""
+        cb = self._watches.get(msg_no)
+        if cb is None:
+            return
+        if flags & LDMSD_Message.LDMSD_REC_F_SOM:
+            self._notify_bufs[msg_no] = [bytearray(), flags]
+        ent = self._notify_bufs.get(msg_no)
+        if ent is None:
+            return
+        ent[0] += data
+        if not (flags & LDMSD_Message.LDMSD_REC_F_EOM):
+            return
+        del self._notify_bufs[msg_no]
+        try:
+            cb(LDMSD_Message.decode(ent[0], ent[1]))
+        except Exception:
+            traceback.print_exc()
+
+    def _fail_all(self, exc):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for (fut, chunks, rflags) in pending:
+            self._window.release()
+            if not fut.cancelled():
+                fut.set_exception(exc)
+
+    def _send(self, type, json_ent, json_str, msg_no=None):
+        """Send the request (the window slot has been acquired)"""
+        if msg_no is None:
+            msg_no = LDMSD_Message.next_msg_no()
+        fut = Future()
+        with self._lock:
+            self._pending[msg_no] = [fut, bytearray(), 0]
+        try:
+            LDMSD_Message(self.ctrl).send(type, json_ent, json_str,
+                                          msg_no=msg_no)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(msg_no, None)
+            self._window.release()
+            fut.set_exception(e)
+        return fut
+
+    def submit(self, json_ent=None, json_str=None,
+                     type=LDMSD_Message.LDMSD_MSG_TYPE_REQ):
+        """Send a request and return a `concurrent.futures.Future`
+
+        The request is either the JSON object `json_ent` or the JSON string
+        `json_str`. The result of the future is the JSON response object.
+        """
+        if self.closed:
+            raise LDMSDRequestException("The pipeline is closed",
+                                        errno.ENOTCONN)
+        self._window.acquire()
+        return self._send(type, json_ent, json_str)
+
+    def request(self, json_ent=None, json_str=None, timeout=None):
+        """Send a request and wait for (and return) its JSON response"""
+        return self.submit(json_ent, json_str).result(timeout)
+
+    def watch(self, callback, schemas=("prdcr", "updtr", "strgp"),
+              interval=1.0, timeout=None):
+        """Subscribe to the status changes of the cfgobjs of `schemas`
+
+        LDMSD sends the changes every `interval` seconds, only if there are
+        any, as NOTIFY messages,
+          { "type": "status", "id": <msg_no>, "seq": <n>,
+            "changes": { <schema>: { <name>: { <attr>: <value> } } } }
+        and `callback(message)` is called for each of them on the reader
+        thread. The first message is a snapshot of all watched objects. A
+        created object comes with all of its attributes, and a deleted object
+        as `<name>: None`. Only
+        one watch is active on a connection; a new watch replaces the old one.
+        Return the `watch` response.
+        """
+        msg_no = LDMSD_Message.next_msg_no()
+        req = { "request"  : "watch",
+                "id"       : msg_no,
+                "schema"   : list(schemas),
+                "interval" : int(interval * 1000000) }
+        # registered before sending; the snapshot may precede the response
+        self._watches.clear()
+        self._watches[msg_no] = callback
+        self._window.acquire()
+        rsp = self._send(LDMSD_Message.LDMSD_MSG_TYPE_REQ, req, None,
+                         msg_no=msg_no).result(timeout)
+        if rsp.get("status", 0) != 0:
+            self._watches.pop(msg_no, None)
+        return rsp
+
+    def unwatch(self, timeout=None):
+        """Cancel the status watch of the connection"""
+        self._watches.clear()
+        return self.request({ "request" : "watch", "schema" : [] },
+                            timeout=timeout)
+
+    def notify(self, json_str):
+        """Send a notification message; LDMSD does not respond to it"""
+        LDMSD_Message(self.ctrl).send(LDMSD_Message.LDMSD_MSG_TYPE_NOTIFY,
+                                      None, json_str)
+
+    async def arequest(self, json_ent=None, json_str=None):
+        """Send a request and await its JSON response (asyncio)"""
+        if self.closed:
+            raise LDMSDRequestException("The pipeline is closed",
+                                        errno.ENOTCONN)
+        if not self._window.acquire(blocking=False):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._window.acquire)
+        fut = self._send(LDMSD_Message.LDMSD_MSG_TYPE_REQ, json_ent, json_str)
+        return await asyncio.wrap_future(fut)
+
+    def close(self):
+        """Stop the reader thread and fail the outstanding requests"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._reader is not threading.current_thread():
+            self._reader.join()
+        self._fail_all(LDMSDRequestException("The pipeline is closed",
+                                             errno.ENOTCONN))
+
+    def is_alive(self):
+        """True if the pipeline is open and its connection has not failed"""
+        return not self.closed and self._reader.is_alive()
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *args):
+        self.close()
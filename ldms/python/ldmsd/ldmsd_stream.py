@@ -0,0 +1,527 @@
+#######################################################################
+# -*- c-basic-offset: 8 -*-
+# Copyright (c) 2016-2018,2020 National Technology & Engineering Solutions
+# of Sandia, LLC (NTESS). Under the terms of Contract DE-NA0003525 with
+# NTESS, the U.S. Government retains certain rights in this software.
+# Copyright (c) 2016-2018,2020 Open Grid Computing, Inc. All rights reserved.
+#
+# This software is available to you under a choice of one of two
+# licenses.  You may choose to be licensed under the terms of the GNU
+# General Public License (GPL) Version 2, available from the file
+# COPYING in the main directory of this source tree, or the BSD-type
+# license below:
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#      Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#      Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#      Neither the name of Sandia nor the names of any contributors may
+#      be used to endorse or promote products derived from this software
+#      without specific prior written permission.
+#
+#      Neither the name of Open Grid Computing nor the names of any
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+#
+#      Modified source versions must be plainly marked as such, and
+#      must not be misrepresented as being the original software.
+#
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+
+"""LDMSD stream publisher and subscriber
+
+StreamPublisher publishes events to an LDMSD stream. The events are queued in
+a bounded queue and a sender thread coalesces them into batch stream messages
+of up to one record (the `msg_max` of the connection) each, sent when the
+record is full or when the oldest event has waited `flush_interval` seconds.
+LDMSD delivers the events of a batch to the stream subscribers one by one, so
+the subscribers see the same events as if they were published one message
+per event, while LDMSD processes one message per batch. When the queue is
+full, `publish()` blocks (policy "block") or drops the event (policy "drop").
+
+>>> pub = StreamPublisher(ctrl, "job_events", "json")
+>>> pub.publish({"job_id": 1, "event": "start"})
+>>> pub.close() # flush and stop
+
+StreamSubscriber subscribes to LDMSD streams (the `stream_subscribe` request)
+and delivers the events through an iterator or asynchronously,
+
+>>> sub = StreamSubscriber(ctrl, ["job_events"])
+>>> for ev in sub:
+...     print(ev.stream, ev.data)
+
+>>> async for ev in sub:
+...     print(ev.stream, ev.data)
+
+Use a dedicated connection (e.g. `ldmsd_config.ldmsdInbandConfig`) for each
+publisher and subscriber; the subscriber owns the receive side of its
+connection.
+"""
+
+import json
+import time
+import errno
+import struct
+import asyncio
+import threading
+from collections import deque, namedtuple
+from queue import Queue, Empty, Full
+
+from ldmsd.ldmsd_request import LDMSD_Message, LDMSDRequestException
+
+LDMSD_STREAM_STRING = 0
+LDMSD_STREAM_JSON = 1
+LDMSD_STREAM_F_BATCH = 0x100
+LDMSD_STREAM_TYPE_MASK = 0xff
+
+STREAM_TYPES = { "string" : LDMSD_STREAM_STRING,
+                 "json"   : LDMSD_STREAM_JSON }
+
+# stream_type, name_len (including the terminating '\0')
+STREAM_HDR_FMT = "!hh"
+STREAM_HDR_SZ = struct.calcsize(STREAM_HDR_FMT)
+BATCH_LEN_FMT = "!L"
+BATCH_LEN_SZ = struct.calcsize(BATCH_LEN_FMT)
+
+StreamEvent = namedtuple("StreamEvent", ["stream", "type", "data"])
+
+def stream_header(stream, stream_type):
+    """The stream header and name of a stream message"""
+    name = stream.encode() + b"\0"
+    return struct.pack(STREAM_HDR_FMT, stream_type, len(name)) + name
+
+class StreamPublisher(object):
+    """Publish events to an LDMSD stream in batches
+
+    Parameters:
+      ctrl - The LDMSD connection (e.g. `ldmsd_config.ldmsdInbandConfig`).
+      stream - The stream name.
+      stream_type - "json" or "string".
+      queue_size - The maximum number of queued events.
+      flush_interval - The maximum time (seconds) an event waits for its
+                       batch to fill up.
+      policy - "block" to block `publish()` while the queue is full, or
+               "drop" to drop the event.
+      batch - False to send one stream message per event, which LDMSD
+              versions without batch stream messages understand.
+    """
+    def __init__(self, ctrl, stream, stream_type="json", queue_size=65536,
+                 flush_interval=0.05, policy="block", batch=True):
+        if stream_type not in STREAM_TYPES:
+            raise ValueError("Unknown stream type '{0}'".format(stream_type))
+        if policy not in ("block", "drop"):
+            raise ValueError("Unknown policy '{0}'".format(policy))
+        self.ctrl = ctrl
+        self.stream = stream
+        self.stream_type = stream_type
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.batch = batch
+        self.closed = False
+        self.error = None
+        # statistics
+        self.events = 0
+        self.dropped = 0
+        self.messages = 0
+        self.bytes = 0
+
+        self._type = STREAM_TYPES[stream_type]
+        self._msg_max = ctrl.getMaxRecvLen()
+        hdr = stream_header(stream, self._type | LDMSD_STREAM_F_BATCH)
+        # record header + stream header + name of a batch message
+        self._batch_hdr_sz = LDMSD_Message.LDMSD_REC_HDR_SZ + len(hdr)
+        self._batch_max = self._msg_max - self._batch_hdr_sz
+        if self._batch_max < BATCH_LEN_SZ + 1:
+            raise ValueError("The stream name is too long")
+        self._batch = bytearray(self._msg_max)
+        self._batch[LDMSD_Message.LDMSD_REC_HDR_SZ:self._batch_hdr_sz] = hdr
+        self._batch_off = self._batch_hdr_sz
+        self._batch_cnt = 0
+        self._batch_t0 = None
+        self._single_hdr = stream_header(stream, self._type)
+
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._pending = deque()
+        self._flush_req = 0
+        self._flush_done = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _encode(self, event):
+        if self._type == LDMSD_STREAM_JSON:
+            if not isinstance(event, (str, bytes)):
+                event = json.dumps(event)
+        if isinstance(event, str):
+            event = event.encode()
+        if self._type == LDMSD_STREAM_STRING:
+            event += b"\0" # as the C publishers send strings
+        return event
+
+    def publish(self, event, timeout=None):
+        """Queue an event for publishing
+
+        A JSON event is either a JSON-serializable object or its JSON text.
+        Return True if the event is queued, or False if it was dropped because
+        the queue is full (policy "drop", or policy "block" and `timeout`
+        seconds passed).
+        """
+        return self.publish_many([ event ], timeout) == 1
+
+    def publish_many(self, events, timeout=None):
+        """Queue many events; return the number of queued events"""
+        data = [ self._encode(e) for e in events ]
+        n = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if self.closed:
+                raise LDMSDRequestException("The publisher is closed",
+                                            errno.ENOTCONN)
+            if self.error:
+                raise self.error
+            for d in data:
+                while len(self._pending) >= self.queue_size:
+                    if self.policy == "drop":
+                        break
+                    wait = None
+                    if deadline is not None:
+                        wait = deadline - time.monotonic()
+                        if wait <= 0:
+                            break
+                    self._not_full.wait(wait)
+                    if self.error:
+                        raise self.error
+                if len(self._pending) >= self.queue_size:
+                    break
+                self._pending.append(d)
+                n += 1
+            self.dropped += len(data) - n
+            self.events += n
+            if n:
+                self._not_empty.notify()
+        return n
+
+    def flush(self, timeout=None):
+        """Send the queued events now and wait until they are sent
+
+        Return False on timeout.
+        """
+        with self._lock:
+            self._flush_req += 1
+            req = self._flush_req
+            self._not_empty.notify()
+            ok = self._flushed.wait_for(lambda: self._flush_done >= req or
+                                        self.error is not None, timeout)
+            if self.error:
+                raise self.error
+            return ok
+
+    def close(self, timeout=None):
+        """Flush the queued events and stop the sender thread"""
+        if self.closed:
+            return
+        try:
+            if self.error is None:
+                self.flush(timeout)
+        finally:
+            with self._lock:
+                self.closed = True
+                self._not_empty.notify()
+            self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _send_record(self, rec, msg_no, flags):
+        struct.pack_into(LDMSD_Message.LDMSD_REC_HDR_FMT, rec, 0,
+                         LDMSD_Message.LDMSD_MSG_TYPE_STREAM, flags, msg_no,
+                         len(rec))
+        self.ctrl.send_command(rec)
+        self.bytes += len(rec)
+
+    def _send_batch(self):
+        if not self._batch_cnt:
+            return
+        rec = memoryview(self._batch)[:self._batch_off]
+        self._send_record(rec, LDMSD_Message.next_msg_no(),
+                          LDMSD_Message.LDMSD_REC_F_SOM |
+                          LDMSD_Message.LDMSD_REC_F_EOM)
+        self.messages += 1
+        self._batch_off = self._batch_hdr_sz
+        self._batch_cnt = 0
+        self._batch_t0 = None
+
+    def _send_single(self, data):
+        """Send an event in its own (possibly multi-record) message"""
+        payload = memoryview(self._single_hdr + data)
+        msg_no = LDMSD_Message.next_msg_no()
+        rec_max = self._msg_max - LDMSD_Message.LDMSD_REC_HDR_SZ
+        rec = bytearray(self._msg_max)
+        off = 0
+        while True:
+            n = min(rec_max, len(payload) - off)
+            flags = LDMSD_Message.LDMSD_REC_F_SOM if off == 0 else 0
+            if off + n == len(payload):
+                flags |= LDMSD_Message.LDMSD_REC_F_EOM
+            rec_len = LDMSD_Message.LDMSD_REC_HDR_SZ + n
+            rec[LDMSD_Message.LDMSD_REC_HDR_SZ:rec_len] = payload[off:off+n]
+            self._send_record(memoryview(rec)[:rec_len], msg_no, flags)
+            off += n
+            if flags & LDMSD_Message.LDMSD_REC_F_EOM:
+                break
+        self.messages += 1
+
+    def _add(self, data):
+        sz = BATCH_LEN_SZ + len(data)
+        if not self.batch or sz > self._batch_max:
+            self._send_batch() # keep the order of the events
+            self._send_single(data)
+            return
+        if self._batch_off + sz > self._msg_max:
+            self._send_batch()
+        struct.pack_into(BATCH_LEN_FMT, self._batch, self._batch_off,
+                         len(data))
+        off = self._batch_off + BATCH_LEN_SZ
+        self._batch[off:off + len(data)] = data
+        self._batch_off = off + len(data)
+        self._batch_cnt += 1
+        if self._batch_t0 is None:
+            self._batch_t0 = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self.closed and \
+                      self._flush_req == self._flush_done:
+                    wait = None
+                    if self._batch_t0 is not None:
+                        wait = self._batch_t0 + self.flush_interval - \
+                               time.monotonic()
+                        if wait <= 0:
+                            break
+                    self._not_empty.wait(wait)
+                items = self._pending
+                self._pending = deque()
+                flush_req = self._flush_req
+                closed = self.closed
+                self._not_full.notify_all()
+            try:
+                for data in items:
+                    self._add(data)
+                if self._batch_t0 is not None and \
+                   (flush_req != self._flush_done or closed or
+                    time.monotonic() - self._batch_t0 >= self.flush_interval):
+                    self._send_batch()
+            except Exception as e:
+                with self._lock:
+                    self.error = e
+                    self._not_full.notify_all()
+                    self._flushed.notify_all()
+                return
+            with self._lock:
+                if flush_req != self._flush_done:
+                    self._flush_done = flush_req
+                    self._flushed.notify_all()
+            if closed:
+                return
+
+
+class StreamSubscriber(object):
+    """Receive the events of LDMSD streams
+
+    The `stream_subscribe` request is sent on `ctrl` and a reader thread
+    delivers the received events, as `StreamEvent(stream, type, data)`, into a
+    queue of at most `queue_size` events, where `data` is the decoded JSON
+    object of a "json" event and the string of a "string" event. When the
+    queue is full, the reader blocks (policy "block"), which pushes back on
+    the connection, or drops the event (policy "drop"). The events are
+    consumed by iterating the subscriber, with `get()`, or asynchronously
+    with `async for` or `aget()`.
+    """
+    def __init__(self, ctrl, streams, queue_size=65536, policy="block",
+                 timeout=5):
+        if policy not in ("block", "drop"):
+            raise ValueError("Unknown policy '{0}'".format(policy))
+        self.ctrl = ctrl
+        self.streams = list(streams)
+        self.policy = policy
+        self.closed = False
+        self.dropped = 0
+        self._queue = Queue(queue_size)
+        self._msgs = dict() # msg_no :-> received stream message
+        self._rsp = Queue()
+        self._msg_no = LDMSD_Message.next_msg_no()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        req = { "request" : "stream_subscribe",
+                "id" : self._msg_no,
+                "stream_names" : self.streams }
+        LDMSD_Message(ctrl).send(LDMSD_Message.LDMSD_MSG_TYPE_REQ, req, None,
+                                 msg_no=self._msg_no)
+        try:
+            rsp = self._rsp.get(timeout=timeout)
+        except Empty:
+            self.close()
+            raise LDMSDRequestException("No response to stream_subscribe",
+                                        errno.ETIMEDOUT)
+        if isinstance(rsp, Exception):
+            self.close()
+            raise rsp
+        if rsp.get("status", 0) != 0:
+            self.close()
+            raise LDMSDRequestException(rsp.get("msg", ""), rsp["status"])
+
+    @staticmethod
+    def _decode(stream_type, data):
+        if data[-1:] == b"\0":
+            data = data[:-1]
+        if stream_type == LDMSD_STREAM_JSON:
+            return json.loads(bytes(data).decode())
+        return bytes(data).decode(errors="replace")
+
+    def _deliver(self, msg):
+        (stream_type, name_len) = struct.unpack_from(STREAM_HDR_FMT, msg)
+        name = bytes(msg[STREAM_HDR_SZ:STREAM_HDR_SZ + name_len - 1]).decode()
+        data = memoryview(msg)[STREAM_HDR_SZ + name_len:]
+        etype = stream_type & LDMSD_STREAM_TYPE_MASK
+        tname = "json" if etype == LDMSD_STREAM_JSON else "string"
+        if not (stream_type & LDMSD_STREAM_F_BATCH):
+            self._put(StreamEvent(name, tname, self._decode(etype, data)))
+            return
+        off = 0
+        while off + BATCH_LEN_SZ <= len(data):
+            (n,) = struct.unpack_from(BATCH_LEN_FMT, data, off)
+            off += BATCH_LEN_SZ
+            self._put(StreamEvent(name, tname,
+                                  self._decode(etype, data[off:off + n])))
+            off += n
+
+    def _put(self, ev):
+        if self.policy == "drop":
+            try:
+                self._queue.put_nowait(ev)
+            except Full:
+                self.dropped += 1
+            return
+        while not self.closed:
+            try:
+                self._queue.put(ev, timeout=1)
+                return
+            except Full:
+                continue
+
+    def _read_loop(self):
+        HDR_FMT = LDMSD_Message.LDMSD_REC_HDR_FMT
+        HDR_SZ = LDMSD_Message.LDMSD_REC_HDR_SZ
+        while not self.closed:
+            try:
+                record = self.ctrl.receive_response(timeout=1)
+            except Empty:
+                continue
+            except Exception as e:
+                self._fail(e)
+                return
+            if record is None:
+                self._fail(LDMSDRequestException("No data received",
+                                                 errno.ECONNRESET))
+                return
+            (type, flags, msg_no, rec_len) = struct.unpack_from(HDR_FMT, record)
+            if flags & LDMSD_Message.LDMSD_REC_F_SOM:
+                self._msgs[(type, msg_no)] = [ bytearray(), flags ]
+            ent = self._msgs.get((type, msg_no))
+            if ent is None:
+                continue
+            ent[0] += memoryview(record)[HDR_SZ:rec_len]
+            if not (flags & LDMSD_Message.LDMSD_REC_F_EOM):
+                continue
+            del self._msgs[(type, msg_no)]
+            try:
+                if type == LDMSD_Message.LDMSD_MSG_TYPE_STREAM:
+                    self._deliver(ent[0])
+                elif type == LDMSD_Message.LDMSD_MSG_TYPE_RSP and \
+                     msg_no == self._msg_no:
+                    self._rsp.put(LDMSD_Message.decode(ent[0], ent[1]))
+            except Exception as e:
+                # a malformed message; skip it
+                self.dropped += 1
+
+    def _fail(self, exc):
+        self._rsp.put(exc)
+        self._put(exc)
+
+    def get(self, timeout=None):
+        """Return the next event; raise queue.Empty on timeout"""
+        ev = self._queue.get(timeout=timeout)
+        if isinstance(ev, Exception):
+            self._queue.put(ev) # for the other consumers
+            raise ev
+        return ev
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self.closed:
+            try:
+                return self.get(timeout=1)
+            except Empty:
+                continue
+        raise StopIteration
+
+    async def aget(self):
+        """Return the next event (asyncio)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        while not self.closed:
+            try:
+                return await loop.run_in_executor(None, self.get, 1)
+            except Empty:
+                continue
+        raise StopAsyncIteration
+
+    def close(self):
+        """Stop the reader thread
+
+        LDMSD keeps publishing to the connection until it is closed.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self._reader is not threading.current_thread():
+            self._reader.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+#
+# A stand-alone test of the bulk data access of `ldms.Set` on sets having a set
+# array (`array_card` > 1). It does not need any other process.
+#
+# Inside a transaction, the metric getters read the previous set array entry
+# while the setters write the new entry. The bulk writes must write the new
+# entry too.
+#
+# [x] MetricArray.assign_from() (and slice assignment)
+#     [x] outside of a transaction
+#     [x] a buffer of another signedness or kind is rejected
+#     [x] inside of a transaction, over the whole set array ring
+# [x] Set.write_batch() over the whole set array ring
+#     [x] from a sequence, a dict and a buffer
+#     [x] the metrics not given keep their values
+#     [x] from a sequence of scalars of one type (converted at once), with
+#         8-byte and with padded 4-byte values
+#     [x] an invalid value leaves the set unmodified
+
+import array
+from ovis_ldms import ldms
+
+ldms.init(16*1024*1024)
+
+def check(text, cond):
+    """Pretty print condition checking"""
+    PASSED = "\033[1;32mPASSED\033[0m"
+    FAILED = "\033[1;31mFAILED\033[0m"
+    print(text, ":", PASSED if cond else FAILED)
+    if not cond:
+        raise RuntimeError(text)
+
+ARRAY_CARD = 4
+
+SCHEMA = ldms.Schema(name = "set_array_test", array_card = ARRAY_CARD,
+                     metric_list = [
+        ( "a_meta"   , "uint64" , 1, "", True ),
+        ( "an_u64"   , "uint64" ),
+        ( "an_array" , "uint64[]", 5 ),
+        ( "a_double_array", "double[]", 3 ),
+    ])
+ARR = 2
+DARR = 3
+
+lset = ldms.Set(name = "set_array_test/0", schema = SCHEMA)
+# complete one transaction so that the getters read the current entry
+lset.transaction_begin()
+lset.transaction_end()
+
+# ---- MetricArray.assign_from() ---- #
+a = array.array("Q", range(10, 15))
+lset[ARR].assign_from(a)
+check("assign_from() outside of a transaction", lset[ARR][:] == a.tolist())
+
+lset[ARR][1:3] = [ 21, 22 ]
+check("slice assignment outside of a transaction",
+      lset[ARR][:] == [ 10, 21, 22, 13, 14 ])
+
+for code in ("q", "d"): # same size, another kind
+    try:
+        lset[ARR].assign_from(array.array(code, [ -1 ] * 5))
+        raised = False
+    except TypeError:
+        raised = True
+    check("assign_from() of '{}' to a uint64 array raises TypeError"\
+          .format(code), raised and lset[ARR][:] == [ 10, 21, 22, 13, 14 ])
+
+last = lset[ARR][:]
+for i in range(2 * ARRAY_CARD): # go around the ring twice
+    vals = array.array("Q", range(100 * i, 100 * i + 5))
+    lset.transaction_begin()
+    # the getters read the previous entry inside a transaction
+    prev = lset[ARR][:]
+    lset[ARR].assign_from(vals)
+    lset[DARR][0:2] = [ i + 0.5, i + 0.25 ]
+    lset.transaction_end()
+    check("entry {}: the previous entry is intact".format(i), prev == last)
+    check("entry {}: assign_from() inside of a transaction".format(i),
+          lset[ARR][:] == vals.tolist())
+    check("entry {}: slice assignment inside of a transaction".format(i),
+          lset[DARR][0:2] == [ i + 0.5, i + 0.25 ])
+    last = vals.tolist()
+
+# ---- Set.write_batch() ---- #
+# a set of the same schema providing data buffers
+ref = ldms.Set(name = "set_array_test/ref", schema = SCHEMA)
+
+for i in range(2 * ARRAY_CARD): # write_batch() does its own transaction
+    expected = lset.as_list()
+    if i % 3 == 0:
+        vals = [ 1000 + i, 2000 + i, list(range(i, i + 5)), [ i, i, i ] ]
+        lset.write_batch(vals)
+        expected = vals
+        what = "a sequence"
+    elif i % 3 == 1:
+        vals = list(range(3 * i, 3 * i + 5))
+        lset.write_batch({ "an_array": vals, "an_u64": 4000 + i })
+        expected[1] = 4000 + i
+        expected[ARR] = vals
+        what = "a dict"
+    else:
+        ref.transaction_begin()
+        ref[1] = 5000 + i
+        ref[ARR] = range(5 * i, 5 * i + 5)
+        ref[DARR] = [ i / 2, i / 4, i / 8 ]
+        ref.transaction_end()
+        lset.write_batch(bytes(memoryview(ref)))
+        expected[1:] = ref.as_list()[1:] # the buffer holds no meta metric
+        what = "a buffer"
+    check("entry {}: write_batch() from {}".format(i, what),
+          lset.as_list() == expected)
+
+# ---- Set.write_batch() of scalars of one type ---- #
+for (typ, vals_of) in (
+        ( "uint64", lambda i: [ 2**64 - 1 - i, i, 2**40 + i ] ),
+        ( "int32", lambda i: [ -i, 2**31 - 1 - i, i ] ),
+        ( "double", lambda i: [ i / 4, -i / 8, 1e300 ] ),
+    ):
+    sch = ldms.Schema(name = "set_array_test_" + typ, array_card = ARRAY_CARD,
+                      metric_list = [ ( "m{}".format(j), typ )
+                                      for j in range(3) ])
+    sset = ldms.Set(name = "set_array_test/" + typ, schema = sch)
+    for i in range(2 * ARRAY_CARD):
+        vals = vals_of(i)
+        sset.write_batch(vals if i % 2 else tuple(vals))
+        check("entry {}: write_batch() of {} scalars".format(i, typ),
+              sset.as_list() == vals)
+    try:
+        sset.write_batch([ 1, "x", 1 ])
+    except TypeError:
+        pass
+    else:
+        check("write_batch() of invalid {} scalars raises".format(typ), False)
+    check("write_batch() of invalid {} scalars".format(typ),
+          sset.as_list() == vals)
+    sset.delete()
@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+#
+# A stand-alone test of `Set.snapshot()`, `Set.delta()` and of the metric
+# access plans shared by the sets of a schema. It does not need any other
+# process.
+#
+# [x] the sets of a schema share the access plan
+# [x] a meta metric change renews the access plan of the set
+# [x] the access plan cache is dropped beyond ACCESS_PLAN_CACHE_MAX
+# [x] snapshot values and as_dict()
+# [x] delta() of the changed metrics only
+# [x] delta() with rate=True
+# [x] delta(rate=True) of 64-bit counters above 2^53 and of a wraparound
+# [x] delta() against a snapshot of another meta-data generation / set
+# [x] delta() against a snapshot of a different schema raises ValueError
+
+import time
+from ovis_ldms import ldms
+
+ldms.init(16*1024*1024)
+
+def check(text, cond):
+    """Pretty print condition checking"""
+    PASSED = "\033[1;32mPASSED\033[0m"
+    FAILED = "\033[1;31mFAILED\033[0m"
+    print(text, ":", PASSED if cond else FAILED)
+    if not cond:
+        raise RuntimeError(text)
+
+SCHEMA = ldms.Schema(name = "set_snapshot_test", metric_list = [
+        ( "a_meta"   , "uint64" , 1, "", True ),
+        ( "an_u64"   , "uint64" ),
+        ( "a_double" , "double" ),
+        ( "an_array" , "uint64[]", 3 ),
+        ( "a_char_array" , "char[]", 8 ),
+    ])
+U64, DBL, ARR, CHR = 1, 2, 3, 4
+
+OTHER = ldms.Schema(name = "set_snapshot_test_other", metric_list = [
+        ( "an_u64"   , "uint64" ),
+    ])
+
+COUNTERS = ldms.Schema(name = "set_snapshot_test_counters", metric_list = [
+        ( "an_u64"   , "uint64" ),
+        ( "an_s64"   , "int64" ),
+        ( "an_u32_array" , "uint32[]", 2 ),
+    ])
+C_U64, C_S64, C_ARR = 0, 1, 2
+
+def set_data(s, u64, dbl, arr, chars):
+    s.transaction_begin()
+    s[U64] = u64
+    s[DBL] = dbl
+    s[ARR] = arr
+    s[CHR] = chars
+    s.transaction_end()
+
+s0 = ldms.Set(name = "set_snapshot_test/0", schema = SCHEMA)
+s1 = ldms.Set(name = "set_snapshot_test/1", schema = SCHEMA)
+o0 = ldms.Set(name = "set_snapshot_test_other/0", schema = OTHER)
+c0 = ldms.Set(name = "set_snapshot_test_counters/0", schema = COUNTERS)
+
+# ---- access plans ---- #
+set_data(s0, 1, 0.5, [ 1, 2, 3 ], "abc")
+set_data(s1, 1, 0.5, [ 1, 2, 3 ], "abc")
+p0 = s0.snapshot().plan
+check("the sets of a schema share the access plan", p0 is s1.snapshot().plan)
+check("the sets of another schema do not",
+      o0.snapshot().plan is not p0)
+check("the plan is reused", s0.snapshot().plan is p0)
+
+s1[0] = 10 # a meta metric change bumps meta_gn
+p1 = s1.snapshot().plan
+check("a meta metric change renews the plan",
+      p1 is not p0 and p1.meta_gn == s1.meta_gn and p0.meta_gn == s0.meta_gn)
+check("the renewed plan has the same layout", p1.fields == p0.fields)
+
+cache_max = ldms.ACCESS_PLAN_CACHE_MAX
+ldms.ACCESS_PLAN_CACHE_MAX = 1
+try:
+    # s0 is now at the meta_gn of s1, i.e. the key of p1, but p1 has been
+    # dropped from the cache
+    s0[0] = 20
+    p2 = s0.snapshot().plan
+    check("the sets are at the same meta_gn", s0.meta_gn == s1.meta_gn)
+    s1[0] = 10 # the same meta value, but meta_gn moves on
+    check("the plans are rebuilt after the cache is dropped",
+          p2 is not p1 and s1.snapshot().plan is not p1)
+    check("the rebuilt plans have the same layout",
+          p2.fields == p0.fields == s1.snapshot().plan.fields)
+finally:
+    ldms.ACCESS_PLAN_CACHE_MAX = cache_max
+
+# ---- snapshot / delta ---- #
+snap = s0.snapshot()
+check("snapshot as_dict()", snap.as_dict() == {
+        "an_u64": 1, "a_double": 0.5, "an_array": [ 1, 2, 3 ],
+        "a_char_array": "abc" })
+check("snapshot keys()",
+      snap.keys() == [ "an_u64", "a_double", "an_array", "a_char_array" ])
+check("no change, no delta", s0.delta(snap) == {})
+
+time.sleep(0.1)
+set_data(s0, 5, 0.5, [ 1, 7, 3 ], "xyz")
+check("snapshot is immutable", snap.as_dict()["an_u64"] == 1)
+d = s0.delta(snap)
+check("delta() of the changed metrics",
+      d == { U64: 5, ARR: [ 1, 7, 3 ], CHR: "xyz" })
+check("snapshot delta() is the same", s0.snapshot().delta(snap) == d)
+
+dt = s0.snapshot().timestamp - snap.timestamp
+r = s0.delta(snap, rate = True)
+check("delta(rate=True) of the numeric metrics",
+      sorted(r) == [ U64, ARR ] and abs(r[U64] - 4 / dt) < 1e-6 and
+      abs(r[ARR][1] - 6 / dt) < 1e-6 and r[ARR][0] == 0)
+# the differences are exact beyond 2^53, and modular for unsigned types
+c0.transaction_begin()
+c0[C_U64] = 2**60 + 1
+c0[C_S64] = -2**60
+c0[C_ARR] = [ 2**32 - 2, 10 ]
+c0.transaction_end()
+csnap = c0.snapshot()
+time.sleep(0.1)
+c0.transaction_begin()
+c0[C_U64] = 2**60 + 8
+c0[C_S64] = -2**60 - 3
+c0[C_ARR] = [ 3, 10 ]
+c0.transaction_end()
+cdt = c0.snapshot().timestamp - csnap.timestamp
+r = c0.delta(csnap, rate = True)
+check("delta(rate=True) of a counter above 2^53",
+      abs(r[C_U64] - 7 / cdt) < 1e-6)
+check("delta(rate=True) of a signed counter",
+      abs(r[C_S64] + 3 / cdt) < 1e-6)
+check("delta(rate=True) of an unsigned wraparound",
+      abs(r[C_ARR][0] - 5 / cdt) < 1e-6 and r[C_ARR][1] == 0)
+
+try:
+    s0.delta(s0.snapshot(), rate = True)
+except ValueError:
+    check("delta(rate=True) with no time difference raises ValueError", True)
+else:
+    check("delta(rate=True) with no time difference raises ValueError", False)
+
+# a snapshot of the other set of the schema, at another meta_gn
+check("the sets are at different meta_gn", s0.meta_gn != s1.meta_gn)
+check("delta() against another set of the schema",
+      s0.delta(s1.snapshot()) == { U64: 5, ARR: [ 1, 7, 3 ], CHR: "xyz" })
+s0[0] = 30
+check("delta() across a meta-data generation change",
+      s0.delta(snap) == d)
+
+try:
+    s0.delta(o0.snapshot())
+except ValueError:
+    check("delta() against another schema raises ValueError", True)
+else:
+    check("delta() against another schema raises ValueError", False)
@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2020 National Technology & Engineering Solutions
+# of Sandia, LLC (NTESS). Under the terms of Contract DE-NA0003525 with
+# NTESS, the U.S. Government retains certain rights in this software.
+# Copyright (c) 2020 Open Grid Computing, Inc. All rights reserved.
+#
+# Under the terms of Contract DE-AC04-94AL85000, there is a non-exclusive
+# license for use of this work by or on behalf of the U.S. Government.
+# Export of this program may require a license from the United States
+# Government.
+#
+# This software is available to you under a choice of one of two
+# licenses.  You may choose to be licensed under the terms of the GNU
+# General Public License (GPL) Version 2, available from the file
+# COPYING in the main directory of this source tree, or the BSD-type
+# license below:
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#      Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#      Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#      Neither the name of Sandia nor the names of any contributors may
+#      be used to endorse or promote products derived from this software
+#      without specific prior written permission.
+#
+#      Neither the name of Open Grid Computing nor the names of any
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+#
+#      Modified source versions must be plainly marked as such, and
+#      must not be misrepresented as being the original software.
+#
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# This file contains test cases of the ldmsd JSON requests and of their
+# ldmsd_controller commands, and of the stream messages
+
+import os
+import re
+import json
+import time
+import errno
+import struct
+import logging
+import tempfile
+import unittest
+import threading
+import subprocess
+from queue import Queue, Empty
+
+from ldmsd.ldmsd_util import LDMSD
+from ldmsd.ldmsd_config import ldmsdInbandConfig
+from ldmsd.ldmsd_request import LDMSD_Message, LDMSD_Pipeline, query_iter, \
+                                set_encoding
+from ldmsd.ldmsd_stream import StreamPublisher, StreamSubscriber, \
+                               stream_header, LDMSD_STREAM_JSON, \
+                               LDMSD_STREAM_F_BATCH
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+log = logging.getLogger(__name__)
+
+class GatedCtrl(object):
+    """A connection of which the sends wait for `gate` to be set
+
+    It stalls the sender thread of a StreamPublisher, so that its queue
+    fills up.
+    """
+    def __init__(self, ctrl):
+        self.ctrl = ctrl
+        self.gate = threading.Event()
+        self.entered = threading.Event() # a send is waiting for the gate
+
+    def getMaxRecvLen(self):
+        return self.ctrl.getMaxRecvLen()
+
+    def send_command(self, cmd):
+        self.entered.set()
+        self.gate.wait()
+        return self.ctrl.send_command(cmd)
+
+
+class TestLDMSDJsonRequests(unittest.TestCase):
+    """Test cases of the JSON requests to an ldmsd"""
+    XPRT = "sock"
+    AUTH = "none"
+    PORT = "10000"
+    LOG = None
+
+    # LDMSD instance
+    ldmsd = None
+    # the control connection
+    ctrl = None
+
+    # the directory of the ldmsd log if LOG is not given
+    logdir = None
+
+    @classmethod
+    def setUpClass(cls):
+        log.info("Setting up " + cls.__name__)
+        cls.logfile = cls.LOG
+        if not cls.logfile:
+            cls.logdir = tempfile.TemporaryDirectory()
+            cls.logfile = os.path.join(cls.logdir.name, "ldmsd.log")
+        try:
+            cls.ldmsd = LDMSD(port = cls.PORT, xprt = cls.XPRT,
+                              auth = cls.AUTH, logfile = cls.logfile)
+            cls.ldmsd.run()
+            time.sleep(1)
+            cls.ctrl = cls._connect()
+        except:
+            del cls.ldmsd
+            raise
+        log.info(cls.__name__ + " set up done")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ctrl.close()
+        del cls.ldmsd
+        if cls.logdir:
+            cls.logdir.cleanup()
+
+    def setUp(self):
+        log.debug("---- %s ----" % self._testMethodName)
+
+    def tearDown(self):
+        log.debug("----------------------------")
+
+    @classmethod
+    def _connect(cls):
+        return ldmsdInbandConfig(host = "localhost", port = cls.PORT,
+                                 xprt = cls.XPRT, auth = cls.AUTH)
+
+    def _request(self, req, ctrl = None):
+        ctrl = ctrl if ctrl else self.ctrl
+        req["id"] = LDMSD_Message.next_msg_no()
+        msg = LDMSD_Message(ctrl)
+        msg.send(LDMSD_Message.LDMSD_MSG_TYPE_REQ, req, None)
+        return LDMSD_Message(ctrl).receive().json_ent
+
+    def _prdcr_create(self, names, enabled = False):
+        rsp = self._request({ "request" : "create",
+                              "schema"  : "prdcr",
+                              "enabled" : enabled,
+                              "default" : { "host" : "localhost",
+                                            "port" : 10001,
+                                            "xprt" : self.XPRT,
+                                            "type" : "active",
+                                            "interval" : "1sec" },
+                              "spec"    : { n: {} for n in names } })
+        self.assertEqual(rsp["status"], 0, rsp)
+
+    def _prdcr_delete(self, names, ctrl = None):
+        rsp = self._request({ "request" : "delete",
+                              "schema"  : "prdcr",
+                              "key"     : list(names) }, ctrl)
+        self.assertEqual(rsp["status"], 0, rsp)
+
+    def _prdcr_names(self):
+        return [ name for name, res in query_iter(self.ctrl, "prdcr") ]
+
+    def _controller(self, *args):
+        """Run ldmsd_controller with `args`; return the output lines"""
+        cmd = [ "ldmsd_controller", "--host", "localhost",
+                "--port", self.PORT, "--xprt", self.XPRT,
+                "-a", self.AUTH ] + list(args)
+        out = subprocess.check_output(cmd, stderr = subprocess.STDOUT)
+        return out.decode().splitlines()
+
+    def _batch(self, lines, size = None):
+        with tempfile.NamedTemporaryFile("w", suffix = ".cfg") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            src = f.name if size is None else \
+                  "--size {0} {1}".format(size, f.name)
+            return f.name, self._controller("--batch", "--source", src)
+
+    # ---- query paging (limit / cursor) ---- #
+
+    def _query(self, limit = None, cursor = None, key = None):
+        req = { "request" : "query", "schema" : "prdcr" }
+        if limit is not None:
+            req["limit"] = limit
+        if cursor is not None:
+            req["cursor"] = cursor
+        if key is not None:
+            req["key"] = key
+        rsp = self._request(req)
+        self.assertEqual(rsp["status"], 0, rsp)
+        return rsp
+
+    def test_query_paging(self):
+        names = [ "page_{0:02d}".format(i) for i in range(10) ]
+        self._prdcr_create(names)
+        pages = []
+        cursor = None
+        while True:
+            rsp = self._query(limit = 3, cursor = cursor)
+            pages.append(sorted(rsp.get("result", {})))
+            cursor = rsp.get("cursor")
+            if cursor is None:
+                break
+            self.assertEqual(cursor, pages[-1][-1])
+        self.assertEqual([ len(p) for p in pages ], [ 3, 3, 3, 1 ])
+        self.assertEqual(sum(pages, []), names)
+        # an exact multiple of the limit; the last page is empty
+        rsp = self._query(limit = 5, cursor = "page_04")
+        self.assertEqual(sorted(rsp["result"]), names[5:])
+        self.assertNotIn("cursor", rsp)
+        # no limit
+        self.assertEqual(sorted(self._query()["result"]), names)
+        # query_iter() pages through all of them
+        self.assertEqual([ n for n, r in query_iter(self.ctrl, "prdcr",
+                                                    limit = 4) ], names)
+        self._prdcr_delete(names)
+
+    def test_query_cursor_deleted(self):
+        names = [ "cur_{0:02d}".format(i) for i in range(6) ]
+        self._prdcr_create(names)
+        rsp = self._query(limit = 3)
+        self.assertEqual(sorted(rsp["result"]), names[:3])
+        self.assertEqual(rsp["cursor"], "cur_02")
+        # the cursor object is deleted between the pages; the next page
+        # resumes from the object following it
+        self._prdcr_delete([ "cur_02" ])
+        rsp = self._query(limit = 3, cursor = "cur_02")
+        self.assertEqual(sorted(rsp["result"]), names[3:])
+        # a cursor beyond the last object
+        rsp = self._query(limit = 3, cursor = "cur_99")
+        self.assertEqual(rsp.get("result", {}), {})
+        self.assertNotIn("cursor", rsp)
+        self._prdcr_delete(names[:2] + names[3:])
+
+    def test_query_cursor_deleted_iter(self):
+        names = [ "iter_{0:02d}".format(i) for i in range(6) ]
+        self._prdcr_create(names)
+        got = []
+        ctrl2 = self._connect()
+        for name, res in query_iter(self.ctrl, "prdcr", limit = 2):
+            got.append(name)
+            if name == "iter_01":
+                # the cursor of the page being received, and the first
+                # object of the next page
+                self._prdcr_delete([ "iter_01", "iter_02" ], ctrl2)
+        ctrl2.close()
+        self.assertEqual(got, [ "iter_00", "iter_01" ] + names[3:])
+        self._prdcr_delete(names[:1] + names[3:])
+
+    def test_query_bad_paging(self):
+        rsp = self._request({ "request" : "query", "schema" : "prdcr",
+                              "limit" : "10" })
+        self.assertNotEqual(rsp["status"], 0)
+        rsp = self._request({ "request" : "query", "schema" : "prdcr",
+                              "cursor" : 10 })
+        self.assertNotEqual(rsp["status"], 0)
+
+    # ---- MessagePack (ldmsd_msgpack_decode / ldmsd_msgpack_encode) ---- #
+
+    # a value of each MessagePack type the ldmsd decodes
+    MSGPACK_VALUES = [
+        0, 127, -1, -32,                        # fixint
+        200, 60000, 2**31, 2**40,               # uint 8/16/32/64
+        -100, -30000, -2**31, -2**40,           # int 8/16/32/64
+        0.5, -1.25e300,                         # float64
+        True, False, None,
+        "", "fixstr", "s" * 100, "t" * 1000,    # fixstr, str 8/16
+        "h\u00e9llo \u2713",
+        list(range(20)),                        # array 16
+        { "k{0}".format(i): i for i in range(20) }, # map 16
+        { "nested": [ { "a": [ 1, [ 2, [ 3 ] ] ] } ] },
+    ]
+
+    def _msgpack_ctrl(self):
+        if msgpack is None:
+            self.skipTest("msgpack is not installed")
+        ctrl = self._connect()
+        self.assertEqual(set_encoding(ctrl), "msgpack")
+        return ctrl
+
+    def _echo(self, ctrl, lst):
+        rsp = self._request({ "request" : "test_protocol",
+                              "mode" : "echo", "list" : lst }, ctrl)
+        self.assertEqual(rsp["status"], 0, rsp)
+        return rsp["echo"]
+
+    def _send_raw(self, ctrl, data):
+        """Send `data` as a one-record MessagePack request"""
+        flags = LDMSD_Message.LDMSD_REC_F_SOM | LDMSD_Message.LDMSD_REC_F_EOM | \
+                LDMSD_Message.LDMSD_REC_F_MSGPACK
+        hdr = struct.pack(LDMSD_Message.LDMSD_REC_HDR_FMT,
+                          LDMSD_Message.LDMSD_MSG_TYPE_REQ, flags,
+                          LDMSD_Message.next_msg_no(),
+                          LDMSD_Message.LDMSD_REC_HDR_SZ + len(data))
+        ctrl.send_command(hdr + data)
+        return LDMSD_Message(ctrl).receive().json_ent
+
+    def test_msgpack_echo(self):
+        ctrl = self._msgpack_ctrl()
+        self.assertEqual(self._echo(ctrl, self.MSGPACK_VALUES),
+                         self.MSGPACK_VALUES)
+        for v in self.MSGPACK_VALUES:
+            self.assertEqual(self._echo(ctrl, [ v ]), [ v ], v)
+        ctrl.close()
+
+    def test_msgpack_float32(self):
+        ctrl = self._msgpack_ctrl()
+        req = { "request" : "test_protocol", "id" : 1, "mode" : "echo",
+                "list" : [ 0.5, -2.25 ] }
+        rsp = self._send_raw(ctrl, msgpack.packb(req, use_single_float = True))
+        self.assertEqual(rsp["echo"], [ 0.5, -2.25 ])
+        ctrl.close()
+
+    def test_msgpack_multi_record(self):
+        ctrl = self._msgpack_ctrl()
+        # str 32 and array 32, spanning many records both ways
+        lst = [ "x" * 70000, list(range(70000)) ]
+        self.assertEqual(self._echo(ctrl, lst), lst)
+        ctrl.close()
+
+    def test_msgpack_depth(self):
+        ctrl = self._msgpack_ctrl()
+        deep = [ 0 ]
+        for i in range(40):
+            deep = [ deep ]
+        self.assertEqual(self._echo(ctrl, deep), deep)
+        for i in range(40):
+            deep = [ deep ]
+        req = { "request" : "test_protocol", "id" : 1, "mode" : "echo",
+                "list" : deep }
+        rsp = self._send_raw(ctrl, msgpack.packb(req))
+        self.assertEqual(rsp["status"], errno.EINVAL, rsp)
+        ctrl.close()
+
+    def test_msgpack_malformed(self):
+        ctrl = self._msgpack_ctrl()
+        req = msgpack.packb({ "request" : "version", "id" : 1 })
+        bad = [ req[:-1],                               # truncated
+                req + b"\x00",                          # trailing data
+                b"\x81\x01\x02",                         # non-string key
+                b"\xc4\x01\x00",                         # bin 8
+                b"\xd4\x01\x00",                         # fixext 1
+                b"\xdb\xff\xff\xff\xff" ]                # str 32 overrun
+        for data in bad:
+            rsp = self._send_raw(ctrl, data)
+            self.assertEqual(rsp["status"], errno.EINVAL, (data, rsp))
+        # the connection is still usable
+        rsp = self._request({ "request" : "version" }, ctrl)
+        self.assertEqual(rsp["status"], 0, rsp)
+        ctrl.close()
+
+    def test_msgpack_cfgobj(self):
+        ctrl = self._msgpack_ctrl()
+        names = [ "msgpack_{0:02d}".format(i) for i in range(20) ]
+        rsp = self._request({ "request" : "create", "schema" : "updtr",
+                              "default" : { "interval" : 2000000,
+                                            "offset" : 100000,
+                                            "producer_filters" : [ "p.*" ] },
+                              "spec" : { n: {} for n in names } }, ctrl)
+        self.assertEqual(rsp["status"], 0, rsp)
+        res = dict(query_iter(ctrl, "updtr"))
+        for n in names:
+            v = res[n]["value"]
+            self.assertEqual(v["interval"], 2000000, v)
+            self.assertEqual(v["offset"], 100000, v)
+            self.assertEqual(v["producer_filters"], [ "p.*" ], v)
+        rsp = self._request({ "request" : "delete", "schema" : "updtr",
+                              "key" : names }, ctrl)
+        self.assertEqual(rsp["status"], 0, rsp)
+        ctrl.close()
+
+    # ---- status watch (snapshot, then deltas) ---- #
+
+    WATCH_INTERVAL = 0.2
+
+    def _watch(self, schemas):
+        """Start a watch on a new connection; return (pipeline, msg queue)"""
+        ctrl = self._connect()
+        pl = LDMSD_Pipeline(ctrl)
+        q = Queue()
+        rsp = pl.watch(q.put, schemas, interval = self.WATCH_INTERVAL,
+                       timeout = 5)
+        self.assertEqual(rsp["status"], 0, rsp)
+        return pl, q
+
+    def _unwatch(self, pl):
+        pl.unwatch(timeout = 5)
+        pl.close()
+        pl.ctrl.close()
+
+    def _prdcr_enable(self, names, enabled):
+        rsp = self._request({ "request" : "update", "schema" : "prdcr",
+                              "enabled" : enabled,
+                              "spec" : { n: {} for n in names } })
+        self.assertEqual(rsp["status"], 0, rsp)
+
+    def test_watch_snapshot_delta(self):
+        names = [ "watch_a", "watch_b" ]
+        self._prdcr_create(names)
+        pl, q = self._watch([ "prdcr" ])
+        # the first message is the snapshot of all watched objects
+        msg = q.get(timeout = 5)
+        self.assertEqual(msg["type"], "status")
+        self.assertEqual(msg["seq"], 0)
+        snap = msg["changes"]["prdcr"]
+        for n in names:
+            self.assertEqual(snap[n], { "state" : "STOPPED" })
+        # then only the changed objects
+        self._prdcr_enable([ "watch_a" ], True)
+        msg = q.get(timeout = 5)
+        self.assertEqual(msg["seq"], 1)
+        self.assertEqual(list(msg["changes"]), [ "prdcr" ])
+        self.assertEqual(list(msg["changes"]["prdcr"]), [ "watch_a" ])
+        self.assertIn(msg["changes"]["prdcr"]["watch_a"]["state"],
+                      ( "CONNECTING", "DISCONNECTED" ))
+        self._prdcr_enable([ "watch_a" ], False)
+        seq = msg["seq"]
+        state = None
+        while state != "STOPPED":
+            msg = q.get(timeout = 5)
+            self.assertEqual(msg["seq"], seq + 1)
+            seq = msg["seq"]
+            self.assertNotIn("watch_b", msg["changes"].get("prdcr", {}))
+            state = msg["changes"].get("prdcr", {}) \
+                                  .get("watch_a", {}).get("state", state)
+        self._unwatch(pl)
+        self._prdcr_delete(names)
+
+    def _watch_changes(self, q, schema, name):
+        """The next changes of object `name` of `schema` in the messages"""
+        while True:
+            msg = q.get(timeout = 5)
+            objs = msg["changes"].get(schema, {})
+            if name in objs:
+                return objs[name]
+
+    def test_watch_create_delete(self):
+        pl, q = self._watch([ "prdcr" ])
+        q.get(timeout = 5) # the snapshot
+        # a created object is posted with its status attributes
+        self._prdcr_create([ "watch_d" ])
+        self.assertEqual(self._watch_changes(q, "prdcr", "watch_d"),
+                         { "state" : "STOPPED" })
+        # and a deleted one as None
+        self._prdcr_delete([ "watch_d" ])
+        self.assertIsNone(self._watch_changes(q, "prdcr", "watch_d"))
+        # created again
+        self._prdcr_create([ "watch_d" ])
+        self.assertEqual(self._watch_changes(q, "prdcr", "watch_d"),
+                         { "state" : "STOPPED" })
+        self._unwatch(pl)
+        self._prdcr_delete([ "watch_d" ])
+
+    def test_watch_heartbeat(self):
+        pl, q = self._watch([ "prdcr" ])
+        q.get(timeout = 5) # the snapshot
+        # nothing changes; an empty message every 10 intervals
+        msg = q.get(timeout = 20 * self.WATCH_INTERVAL)
+        self.assertEqual(msg["changes"], {})
+        self.assertEqual(msg["seq"], 1)
+        self._unwatch(pl)
+
+    def test_watch_schema(self):
+        pl, q = self._watch([ "updtr" ])
+        msg = q.get(timeout = 5)
+        self.assertNotIn("prdcr", msg["changes"])
+        self._prdcr_create([ "watch_c" ], enabled = True)
+        # the prdcr changes are not sent; only the heartbeat comes
+        msg = q.get(timeout = 20 * self.WATCH_INTERVAL)
+        self.assertEqual(msg["changes"], {})
+        self._unwatch(pl)
+        self._prdcr_enable([ "watch_c" ], False)
+        time.sleep(1)
+        self._prdcr_delete([ "watch_c" ])
+
+    def test_unwatch(self):
+        pl, q = self._watch([ "prdcr" ])
+        q.get(timeout = 5) # the snapshot
+        pl.unwatch(timeout = 5)
+        self._prdcr_create([ "watch_d" ], enabled = True)
+        self.assertRaises(Empty, q.get, timeout = 20 * self.WATCH_INTERVAL)
+        pl.close()
+        pl.ctrl.close()
+        self._prdcr_enable([ "watch_d" ], False)
+        time.sleep(1)
+        self._prdcr_delete([ "watch_d" ])
+
+    # ---- batch (ldmsd_controller --batch) ---- #
+
+    def _batch_line(self, name):
+        return "json " + json.dumps({
+                    "request" : "create", "schema" : "prdcr",
+                    "spec" : { name: { "host" : "localhost", "port" : 10001,
+                                       "xprt" : self.XPRT, "type" : "active",
+                                       "interval" : 1000000 } } })
+
+    def test_batch(self):
+        names = [ "batch_{0}".format(i) for i in range(5) ]
+        lines = [ self._batch_line(n) for n in names[:3] ] + \
+                [ "say between the batches" ] + \
+                [ self._batch_line(n) for n in names[3:] ] + \
+                [ "# a comment", "" ]
+        path, out = self._batch(lines, size = 2)
+        self.assertEqual(out, [ "between the batches" ])
+        self.assertEqual([ n for n in self._prdcr_names()
+                           if n.startswith("batch_") ], names)
+        self._prdcr_delete(names)
+
+    def test_batch_failed_requests(self):
+        self._prdcr_create([ "batch_dup" ])
+        lines = [ self._batch_line("batch_dup"),
+                  self._batch_line("batch_new") ]
+        path, out = self._batch(lines)
+        # only the failed request is reported
+        self.assertEqual(len(out), 1, out)
+        self.assertTrue(out[0].startswith("create prdcr 'batch_dup': "), out)
+        self.assertIn("batch_new", self._prdcr_names())
+        self._prdcr_delete([ "batch_dup", "batch_new" ])
+
+    def test_batch_invalid_json(self):
+        lines = [ self._batch_line("batch_bad"),
+                  "json { \"request\": \"create\", ",
+                  "json [ 1, 2 ]",
+                  self._batch_line("batch_bad2") ]
+        path, out = self._batch(lines)
+        self.assertEqual(len(out), 2, out)
+        self.assertTrue(out[0].startswith(path + ":2: invalid JSON"), out)
+        self.assertEqual(out[1], path + ":3: not a request object")
+        # nothing is sent
+        names = self._prdcr_names()
+        self.assertNotIn("batch_bad", names)
+        self.assertNotIn("batch_bad2", names)
+
+    # ---- stream publish/subscribe (batch stream messages) ---- #
+
+    def _subscriber(self, stream, **kwargs):
+        ctrl = self._connect()
+        return ctrl, StreamSubscriber(ctrl, [ stream ], **kwargs)
+
+    def _events(self, sub, n):
+        evs = [ sub.get(timeout = 5) for i in range(n) ]
+        self.assertRaises(Empty, sub.get, timeout = 0.5) # no more events
+        return evs
+
+    def _log_wait(self, text, timeout = 5):
+        """Wait for a line containing `text` in the ldmsd log"""
+        deadline = time.time() + timeout
+        while True:
+            with open(self.logfile) as f:
+                if any([ text in l for l in f ]):
+                    return True
+            if time.time() > deadline:
+                return False
+            time.sleep(0.1)
+
+    def _close(self, *objs):
+        for o in objs:
+            o.close()
+
+    def test_stream_batch_json(self):
+        sctrl, sub = self._subscriber("batch_json")
+        pctrl = self._connect()
+        pub = StreamPublisher(pctrl, "batch_json", "json",
+                              flush_interval = 10)
+        events = [ { "seq": i, "data": "x" * (i % 7) } for i in range(1000) ]
+        self.assertEqual(pub.publish_many(events), len(events))
+        # a JSON text is published as is
+        self.assertTrue(pub.publish('{"seq": 1000, "text": true}'))
+        events.append({ "seq": 1000, "text": True })
+        pub.close()
+        self.assertEqual(pub.events, len(events))
+        self.assertEqual(pub.dropped, 0)
+        # the events are coalesced into a few messages
+        self.assertLess(pub.messages, len(events) // 10)
+        evs = self._events(sub, len(events))
+        self.assertEqual(set([ (e.stream, e.type) for e in evs ]),
+                         set([ ("batch_json", "json") ]))
+        self.assertEqual([ e.data for e in evs ], events)
+        self._close(sub, sctrl, pctrl)
+
+    def test_stream_batch_string(self):
+        sctrl, sub = self._subscriber("batch_string")
+        pctrl = self._connect()
+        pub = StreamPublisher(pctrl, "batch_string", "string",
+                              flush_interval = 10)
+        events = [ "event {0} h\u00e9llo".format(i) for i in range(500) ] + \
+                 [ "", "{ not json" ]
+        self.assertEqual(pub.publish_many(events), len(events))
+        pub.close()
+        self.assertLess(pub.messages, len(events) // 10)
+        evs = self._events(sub, len(events))
+        self.assertEqual(set([ e.type for e in evs ]), set([ "string" ]))
+        self.assertEqual([ e.data for e in evs ], events)
+        self._close(sub, sctrl, pctrl)
+
+    def test_stream_event_larger_than_record(self):
+        sctrl, sub = self._subscriber("batch_large")
+        pctrl = self._connect()
+        big = pctrl.getMaxRecvLen() * 3
+        pub = StreamPublisher(pctrl, "batch_large", "json",
+                              flush_interval = 10)
+        events = [ { "seq": 0 }, { "seq": 1, "big": "y" * big },
+                   { "seq": 2 }, { "seq": 3, "big": "z" * big }, { "seq": 4 } ]
+        self.assertEqual(pub.publish_many(events), len(events))
+        pub.close()
+        # the large events are sent in their own messages, in order
+        self.assertEqual([ e.data for e in self._events(sub, len(events)) ],
+                         events)
+        self._close(sub, sctrl, pctrl)
+
+    def test_stream_batch_disabled(self):
+        sctrl, sub = self._subscriber("batch_off")
+        pctrl = self._connect()
+        pub = StreamPublisher(pctrl, "batch_off", "json", batch = False)
+        events = [ { "seq": i } for i in range(20) ]
+        self.assertEqual(pub.publish_many(events), len(events))
+        pub.close()
+        self.assertEqual(pub.messages, len(events))
+        self.assertEqual([ e.data for e in self._events(sub, len(events)) ],
+                         events)
+        self._close(sub, sctrl, pctrl)
+
+    def _stalled_publisher(self, stream, policy):
+        """A publisher of which the sender thread is stalled on `gate`"""
+        pctrl = self._connect()
+        gctrl = GatedCtrl(pctrl)
+        pub = StreamPublisher(gctrl, stream, "string", queue_size = 4,
+                              flush_interval = 10, policy = policy)
+        # an event larger than a record is sent right away
+        big = "b" * (pctrl.getMaxRecvLen() + 100)
+        self.assertTrue(pub.publish(big))
+        self.assertTrue(gctrl.entered.wait(5))
+        return pctrl, gctrl, pub, big
+
+    def test_stream_publisher_drop(self):
+        sctrl, sub = self._subscriber("batch_drop")
+        pctrl, gctrl, pub, big = self._stalled_publisher("batch_drop", "drop")
+        events = [ "e{0}".format(i) for i in range(10) ]
+        self.assertEqual(pub.publish_many(events), 4)
+        self.assertFalse(pub.publish("late"))
+        self.assertEqual(pub.dropped, 7)
+        gctrl.gate.set()
+        pub.close()
+        self.assertEqual([ e.data for e in self._events(sub, 5) ],
+                         [ big ] + events[:4])
+        self._close(sub, sctrl, pctrl)
+
+    def test_stream_publisher_block(self):
+        sctrl, sub = self._subscriber("batch_block")
+        pctrl, gctrl, pub, big = self._stalled_publisher("batch_block",
+                                                         "block")
+        events = [ "e{0}".format(i) for i in range(4) ]
+        self.assertEqual(pub.publish_many(events), 4)
+        # the queue is full; publish() blocks until `timeout`
+        t0 = time.time()
+        self.assertFalse(pub.publish("timed_out", timeout = 0.5))
+        self.assertGreaterEqual(time.time() - t0, 0.5)
+        self.assertEqual(pub.dropped, 1)
+        # ... or until the queue has room
+        res = []
+        th = threading.Thread(target = lambda: res.append(pub.publish("e4")))
+        th.start()
+        th.join(0.5)
+        self.assertTrue(th.is_alive())
+        gctrl.gate.set()
+        th.join(5)
+        self.assertEqual(res, [ True ])
+        pub.close()
+        self.assertEqual([ e.data for e in self._events(sub, 6) ],
+                         [ big ] + events + [ "e4" ])
+        self._close(sub, sctrl, pctrl)
+
+    def _wait_for(self, cond, timeout = 5):
+        deadline = time.time() + timeout
+        while not cond() and time.time() < deadline:
+            time.sleep(0.1)
+        return cond()
+
+    def test_stream_subscriber_drop(self):
+        sctrl, sub = self._subscriber("batch_sub_drop", queue_size = 5,
+                                      policy = "drop")
+        pctrl = self._connect()
+        pub = StreamPublisher(pctrl, "batch_sub_drop", "json")
+        events = [ { "seq": i } for i in range(20) ]
+        pub.publish_many(events)
+        pub.close()
+        # the events not fitting in the queue are dropped
+        self.assertTrue(self._wait_for(lambda: sub.dropped == 15),
+                        sub.dropped)
+        self.assertEqual([ e.data for e in self._events(sub, 5) ],
+                         events[:5])
+        self._close(sub, sctrl, pctrl)
+
+    def test_stream_subscriber_block(self):
+        sctrl, sub = self._subscriber("batch_sub_block", queue_size = 5,
+                                      policy = "block")
+        pctrl = self._connect()
+        pub = StreamPublisher(pctrl, "batch_sub_block", "json")
+        events = [ { "seq": i } for i in range(50) ]
+        pub.publish_many(events)
+        pub.close()
+        time.sleep(1) # the reader waits for room in the queue
+        self.assertEqual([ e.data for e in self._events(sub, len(events)) ],
+                         events)
+        self.assertEqual(sub.dropped, 0)
+        self._close(sub, sctrl, pctrl)
+
+    def _send_batch(self, ctrl, stream, events, tail = b""):
+        """Send a batch stream message of `events` (bytes) and `tail`"""
+        data = stream_header(stream, LDMSD_STREAM_JSON | LDMSD_STREAM_F_BATCH)
+        for e in events:
+            data += struct.pack("!L", len(e)) + e
+        data += tail
+        hdr = struct.pack(LDMSD_Message.LDMSD_REC_HDR_FMT,
+                          LDMSD_Message.LDMSD_MSG_TYPE_STREAM,
+                          LDMSD_Message.LDMSD_REC_F_SOM |
+                          LDMSD_Message.LDMSD_REC_F_EOM,
+                          LDMSD_Message.next_msg_no(),
+                          LDMSD_Message.LDMSD_REC_HDR_SZ + len(data))
+        ctrl.send_command(hdr + data)
+
+    def test_stream_batch_truncated(self):
+        sctrl, sub = self._subscriber("batch_trunc")
+        pctrl = self._connect()
+        # the last event claims more bytes than the message has
+        self._send_batch(pctrl, "batch_trunc", [ b'{"a":1}', b'{"a":2}' ],
+                         tail = struct.pack("!L", 100) + b'{"a":3}')
+        # the events before the truncated one are delivered
+        self.assertEqual([ e.data for e in self._events(sub, 2) ],
+                         [ { "a": 1 }, { "a": 2 } ])
+        self.assertTrue(self._log_wait("Truncated event in a batch of the "
+                                       "stream 'batch_trunc'"))
+        # an invalid JSON event is skipped, not the rest of the batch
+        self._send_batch(pctrl, "batch_trunc",
+                         [ b'{"a":4}', b'{"a":', b'{"a":5}' ])
+        self.assertEqual([ e.data for e in self._events(sub, 2) ],
+                         [ { "a": 4 }, { "a": 5 } ])
+        self.assertTrue(self._log_wait("Failed to parse a JSON event of the "
+                                       "stream 'batch_trunc'"))
+        self._close(sub, sctrl, pctrl)
+
+
+if __name__ == "__main__":
+    fmt = "%(asctime)s.%(msecs)d %(levelname)s: %(message)s"
+    datefmt = "%F %T"
+    logging.basicConfig(
+            format = fmt,
+            datefmt = datefmt,
+            level = logging.DEBUG,
+            filename = "ldmsd_json_requests.log",
+            filemode = "w",
+    )
+    log = logging.getLogger(__name__)
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    ch.setFormatter(logging.Formatter(fmt, datefmt))
+    log.addHandler(ch)
+    unittest.main(failfast = True, verbosity = 2)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2020 National Technology & Engineering Solutions
+# of Sandia, LLC (NTESS). Under the terms of Contract DE-NA0003525 with
+# NTESS, the U.S. Government retains certain rights in this software.
+# Copyright (c) 2020 Open Grid Computing, Inc. All rights reserved.
+#
+# Under the terms of Contract DE-AC04-94AL85000, there is a non-exclusive
+# license for use of this work by or on behalf of the U.S. Government.
+# Export of this program may require a license from the United States
+# Government.
+#
+# This software is available to you under a choice of one of two
+# licenses.  You may choose to be licensed under the terms of the GNU
+# General Public License (GPL) Version 2, available from the file
+# COPYING in the main directory of this source tree, or the BSD-type
+# license below:
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#      Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#      Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#      Neither the name of Sandia nor the names of any contributors may
+#      be used to endorse or promote products derived from this software
+#      without specific prior written permission.
+#
+#      Neither the name of Open Grid Computing nor the names of any
+#      contributors may be used to endorse or promote products derived
+#      from this software without specific prior written permission.
+#
+#      Modified source versions must be plainly marked as such, and
+#      must not be misrepresented as being the original software.
+#
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# This file contains test cases for the desired-state reconciliation of the
+# ldmsd configuration objects (ldmsd_reconcile). The current configuration is
+# given in the format of the ldmsd `export` results, so no ldmsd is needed.
+
+import os
+import copy
+import json
+import logging
+import unittest
+
+from ldmsd.ldmsd_reconcile import ConfigDiff, desired_config
+
+log = logging.getLogger(__name__)
+
+AGG_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "../../../examples/json-cfg/agg.json")
+
+# The export of an ldmsd configured with agg.json
+AGG_EXPORT = {
+    "prdcr": {
+        "localhost": { "enabled": True,
+                       "attrs": { "schema": "prdcr", "enabled": True,
+                                  "perm": "770", "port": 10001,
+                                  "host": "localhost", "xprt": "sock",
+                                  "type": "active", "interval": 20000000,
+                                  "auth": "ovis" } },
+    },
+    "updtr": {
+        "ALL": { "enabled": True,
+                 "attrs": { "schema": "updtr", "enabled": True,
+                            "perm": "770", "auto_task": False, "push": 0,
+                            "interval": 1000000, "offset": 10000,
+                            "producer_filters": [ ".*" ],
+                            "set_instance_filters": [ ".*meminfo.*" ],
+                            "set_schema_filters": [] } },
+    },
+    "strgp": {},
+}
+
+class TestLDMSDReconcile(unittest.TestCase):
+    """Test cases of the desired configuration and the change set"""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(AGG_JSON) as f:
+            cls.agg = json.load(f)
+
+    def setUp(self):
+        log.debug("---- %s ----" % self._testMethodName)
+        self.current = copy.deepcopy(AGG_EXPORT)
+
+    def tearDown(self):
+        log.debug("----------------------------")
+
+    def test_agg_json_no_change(self):
+        desired = desired_config(self.agg)
+        # the values are kept as given in the requests
+        self.assertEqual(desired["prdcr"]["localhost"]["attrs"]["interval"],
+                         "20sec")
+        self.assertEqual(desired["updtr"]["ALL"]["attrs"]["offset"], "10ms")
+        diff = ConfigDiff(desired, self.current)
+        self.assertFalse(diff, str(diff))
+
+    def test_agg_json_interval_change(self):
+        self.current["updtr"]["ALL"]["attrs"]["interval"] = 2000000
+        diff = ConfigDiff(desired_config(self.agg), self.current)
+        self.assertEqual(diff.recreate, [ ("updtr", "ALL", [ "interval" ]) ])
+        self.assertEqual(diff.create, [])
+        self.assertEqual(diff.enable, [])
+
+    def _updtr_diff(self, attrs, exported):
+        desired = desired_config([ { "request": "create", "schema": "updtr",
+                                     "spec": { "u": attrs } } ])
+        current = { "updtr": { "u": { "enabled": False,
+                                      "attrs": exported } } }
+        return ConfigDiff(desired, current)
+
+    def test_time_units(self):
+        units = { "5": 5, "5us": 5, "5 microseconds": 5, "5ms": 5000,
+                  "5 milliseconds": 5000, "5s": 5000000, "5sec": 5000000,
+                  "5 seconds": 5000000, "5min": 300000000,
+                  "5h": 18000000000, "5 hours": 18000000000,
+                  "5day": 432000000000, "5 bogus": 0 }
+        for s, us in units.items():
+            diff = self._updtr_diff({ "interval": s }, { "interval": us })
+            self.assertFalse(diff, s)
+            diff = self._updtr_diff({ "interval": s }, { "interval": us + 1 })
+            self.assertEqual(diff.recreate, [ ("updtr", "u", [ "interval" ]) ])
+
+    def test_offset_none_perm_push(self):
+        for attrs, exported in [
+                ({ "offset": "None", "push": "onchange", "perm": "0750" },
+                 { "offset": -2**63, "push": 3, "perm": "0750" }),
+                ({ "perm": "0x1ff", "push": True },
+                 { "perm": "0777", "push": 1 }),
+                ({ "push": "yes", "perm": "488" },
+                 { "push": 1, "perm": "0750" }) ]:
+            diff = self._updtr_diff(attrs, exported)
+            self.assertFalse(diff, "{0}: {1}".format(attrs, diff))
+        diff = self._updtr_diff({ "push": "onchange" }, { "push": 1 })
+        self.assertEqual(diff.recreate, [ ("updtr", "u", [ "push" ]) ])
+
+    def test_phases_original_values(self):
+        # the create requests carry the values as given, which the ldmsd
+        # parses, not the exported ones (e.g. `push` must be a bool or a
+        # string)
+        attrs = { "interval": "1sec", "offset": "none",
+                  "push": "onchange", "perm": "0750" }
+        reqs = [ { "request": "create", "schema": "updtr",
+                   "enabled": True, "default": { "auto_task": False },
+                   "spec": { "u": attrs, "v": { "push": True } } } ]
+        current = { "updtr": { "u": { "enabled": True,
+                                      "attrs": { "interval": 1000000,
+                                                 "offset": -2**63,
+                                                 "push": 1,
+                                                 "perm": "0750",
+                                                 "auto_task": False } } } }
+        diff = ConfigDiff(desired_config(reqs), current)
+        self.assertEqual(diff.recreate, [ ("updtr", "u", [ "push" ]) ])
+        self.assertEqual(diff.create, [ ("updtr", "v") ])
+        stop, remove, add, start = diff.phases()
+        self.assertEqual(stop, [ { "request": "update", "schema": "updtr",
+                                   "enabled": False, "spec": { "u": {} } } ])
+        self.assertEqual(remove, [ { "request": "delete", "schema": "updtr",
+                                     "key": [ "u" ] } ])
+        want = dict(attrs, auto_task=False)
+        self.assertEqual(add, [ { "request": "create", "schema": "updtr",
+                                  "spec": { "u": want,
+                                            "v": { "push": True,
+                                                   "auto_task": False } } } ])
+        self.assertEqual(start[0]["spec"], { "u": {}, "v": {} })
+        self.assertEqual(start[0]["enabled"], True)
+
+    def test_update_folded(self):
+        reqs = self.agg + [
+            { "request": "update", "schema": "updtr", "enabled": False,
+              "spec": { "ALL": { "interval": "2sec" } } },
+            { "request": "update", "schema": "prdcr",
+              "default": { "interval": "20000000" }, "re": [ "^local" ] },
+        ]
+        desired = desired_config(reqs)
+        self.assertEqual(desired["updtr"]["ALL"]["enabled"], False)
+        self.assertEqual(desired["updtr"]["ALL"]["attrs"]["interval"],
+                         "2sec")
+        # not changed by an update without `enabled`
+        self.assertEqual(desired["prdcr"]["localhost"]["enabled"], True)
+        self.assertEqual(desired["prdcr"]["localhost"]["attrs"]["interval"],
+                         "20000000")
+        diff = ConfigDiff(desired, self.current)
+        self.assertEqual(diff.recreate, [ ("updtr", "ALL", [ "interval" ]) ])
+        self.assertEqual(diff.enable, [])
+
+    def test_update_enable_only(self):
+        self.current["prdcr"]["localhost"]["enabled"] = False
+        reqs = [ dict(r) for r in self.agg ]
+        for r in reqs:
+            if r["request"] == "create" and r["schema"] == "prdcr":
+                del r["enabled"]
+        reqs.append({ "request": "update", "schema": "prdcr", "enabled": True,
+                      "spec": { "localhost": {} } })
+        diff = ConfigDiff(desired_config(reqs), self.current)
+        self.assertEqual(diff.enable, [ ("prdcr", "localhost", True) ])
+        self.assertEqual(diff.recreate, [])
+
+    def test_update_not_created(self):
+        reqs = self.agg + [ { "request": "update", "schema": "strgp",
+                              "enabled": True, "spec": { "bogus": {} } } ]
+        self.assertRaises(ValueError, desired_config, reqs)
+
+
+if __name__ == "__main__":
+    fmt = "%(asctime)s.%(msecs)d %(levelname)s: %(message)s"
+    datefmt = "%F %T"
+    logging.basicConfig(
+            format = fmt,
+            datefmt = datefmt,
+            level = logging.DEBUG,
+            filename = "ldmsd_reconcile.log",
+            filemode = "w",
+    )
+    log = logging.getLogger(__name__)
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    ch.setFormatter(logging.Formatter(fmt, datefmt))
+    log.addHandler(ch)
+    unittest.main(failfast = True, verbosity = 2)
@@ -1,13 +1,12 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 from __future__ import print_function
-import shlex
-from subprocess import Popen, PIPE
 import shutil
 import sys
 import argparse
 import time
 import os
 from sosdb import Sos
+from ldmsd.ldmsd_pool import LdmsdPool
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Rotate OVIS SOS Storage Containers.")
@@ -48,16 +47,23 @@ if __name__ == "__main__":
     #    The port the ldmsd is listening on for configuration connections
     #    The location of the auth file containing the shared secret
     #
-    p = Popen(["/opt/ovis/bin/ldmsd_controller",
-               "--host", args.cfg_host,
-               "--port", args.cfg_port,
-               "--auth_file", args.cfg_auth_file],
-              stdin=PIPE, stdout=PIPE)
     next_path = args.src_path + "/" + args.next_name
-    (out, err) = p.communicate(input="config name=store_sos path={0}\nquit".format(next_path))
-    if out is not None and len(out) > 0:
+    req = { "request" : "update",
+            "id"      : 1,
+            "schema"  : "plugin",
+            "spec"    : { "store_sos" : { "path" : next_path } } }
+    with LdmsdPool(auth="ovis", auth_opt={"conf": args.cfg_auth_file}) as pool:
+        try:
+            rsp = pool.request(args.cfg_host, args.cfg_port, req, timeout=60)
+        except Exception as e:
+            print("Failure attempting communicate with the ldmsd daemon:")
+            print(e)
+            sys.exit(2)
+    if rsp["status"] == 0:
+        rsp = rsp["result"]["store_sos"]
+    if rsp["status"] != 0:
         print("Failure attempting communicate with the ldmsd daemon:")
-        print(out)
+        print(rsp.get("msg", rsp))
         sys.exit(2)
     print("LDMSD now storing into {0}".format(next_path))
 
@@ -1742,6 +1742,23 @@ ldms_mval_t ldms_metric_get(ldms_set_t s, int i);
  */
 ldms_mval_t ldms_metric_get_addr(ldms_set_t s, int i);
 
+/**
+ * \brief Get the address to which the metric in ldms set \c s is set.
+ *
+ * This is the address that the ldms_metric_set*() functions write to. Unlike
+ * ldms_metric_get_addr(), which returns the metric of the previous set array
+ * entry inside a transaction, it is always in the current set array entry.
+ *
+ * \note the data is little-endian. Call ldms_metric_modify() after modifying
+ * the metric through the returned address.
+ *
+ * \param s The set handle.
+ * \param i The metric ID.
+ * \retval ptr The pointer to the array or scalar in the set.
+ * \retval NULL If \c i is not a valid metric ID.
+ */
+ldms_mval_t ldms_metric_set_addr(ldms_set_t s, int i);
+
 /**
  * \brief Get the address of the array metric in ldms set \c s.
  *
@@ -873,6 +873,7 @@ void ldmsd_ev_init(void)
 	smplr_stop_type = ev_type_new("smplr:stop", sizeof(struct stop_data));
 	cfgobj_enabled_type = ev_type_new("cfg:enabled", sizeof(struct start_data));
 	cfgobj_disabled_type = ev_type_new("cfg:disabled", sizeof(struct stop_data));
+	watch_flush_type = ev_type_new("watch:flush", sizeof(struct watch_data));
 
 	producer = ev_worker_new("producer", default_actor);
 	updater = ev_worker_new("updater", default_actor);
@@ -890,6 +891,7 @@ void ldmsd_ev_init(void)
 	ev_dispatch(producer, updtr_stop_type, updtr_stop_actor);
 	ev_dispatch(cfg, cfgobj_enabled_type, cfgobj_enabled_actor);
 	ev_dispatch(cfg, cfgobj_disabled_type, cfgobj_disabled_actor);
+	ev_dispatch(cfg, watch_flush_type, watch_flush_actor);
 
 }
 
@@ -550,6 +550,12 @@ typedef struct ldmsd_updtr {
 	 */
 	uint8_t is_auto_task;
 
+	/*
+	 * The number of scheduled set updates skipped because the previous
+	 * lookup or update of the set had not completed.
+	 */
+	uint64_t sched_miss;
+
 	ev_t update_ev;
 	ev_t start_ev;
 	ev_t stop_ev;
@@ -626,6 +632,10 @@ struct ldmsd_strgp {
 	ev_t start_ev;
 	ev_t stop_ev;
 
+	/** The number of failed stores and the error of the last one */
+	uint64_t store_errors;
+	int last_store_error;
+
 	/** Update function */
 	strgp_update_fn_t update_fn;
 };
@@ -844,6 +854,8 @@ int ldmsd_cfgobj_refcount(ldmsd_cfgobj_t obj);
 ldmsd_cfgobj_t ldmsd_cfgobj_find(const char *name, ldmsd_cfgobj_type_t type);
 void ldmsd_cfgobj_del(const char *name, ldmsd_cfgobj_type_t type);
 ldmsd_cfgobj_t ldmsd_cfgobj_first(ldmsd_cfgobj_type_t type);
+ldmsd_cfgobj_t ldmsd_cfgobj_first_after(ldmsd_cfgobj_type_t type,
+					const char *name);
 ldmsd_cfgobj_t ldmsd_cfgobj_first_re(ldmsd_cfgobj_type_t type, regex_t regex);
 ldmsd_cfgobj_t ldmsd_cfgobj_next_re(ldmsd_cfgobj_t obj, regex_t regex);
 ldmsd_cfgobj_t ldmsd_cfgobj_next(ldmsd_cfgobj_t obj);
@@ -1308,6 +1320,10 @@ struct stop_data {
 	void *entity;
 };
 
+struct watch_data {
+	struct ldmsd_watcher *watcher;
+};
+
 typedef struct ldmsd_req_ctxt *ldmsd_req_ctxt_t;
 struct msg_ctxt_free_data {
 	ldmsd_req_ctxt_t reqc;
@@ -1329,6 +1345,7 @@ ev_type_t strgp_stop_type;
 ev_type_t smplr_stop_type;
 ev_type_t cfgobj_enabled_type;
 ev_type_t cfgobj_disabled_type;
+ev_type_t watch_flush_type;
 
 ev_worker_t producer;
 ev_worker_t updater;
@@ -1353,6 +1370,7 @@ int smplr_start_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t
 int smplr_stop_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t ev);
 int cfgobj_enabled_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t ev);
 int cfgobj_disabled_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t ev);
+int watch_flush_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t ev);
 
 #define ldmsd_prdcr_set_ref_get(_s_, _n_) _ref_get(&((_s_)->ref), (_n_), __func__, __LINE__)
 #define ldmsd_prdcr_set_ref_put(_s_, _n_) _ref_put(&((_s_)->ref), (_n_), __func__, __LINE__)
@@ -56,6 +56,7 @@
 #include <errno.h>
 #include <coll/rbt.h>
 #include "ldmsd.h"
+#include "ldmsd_notify.h"
 
 int cfgobj_cmp(void *a, const void *b)
 {
@@ -378,6 +379,24 @@ ldmsd_cfgobj_t ldmsd_cfgobj_first(ldmsd_cfgobj_type_t type)
 	return NULL;
 }
 
+/**
+ * Return the first configuration object of the given type of which name
+ * comes after \c name
+ *
+ * This function must be called with the cfgobj_type lock held
+ */
+ldmsd_cfgobj_t ldmsd_cfgobj_first_after(ldmsd_cfgobj_type_t type,
+					const char *name)
+{
+	struct rbn *n;
+	n = rbt_find_lub(cfgobj_trees[type], name);
+	if (n && (0 == strcmp(n->key, name)))
+		n = rbn_succ(n);
+	if (n)
+		return ldmsd_cfgobj_get(container_of(n, struct ldmsd_cfgobj, rbn));
+	return NULL;
+}
+
 /**
  * Return the next configuration object of the given type
  *
@@ -448,6 +467,7 @@ json_entity_t ldmsd_cfgobj_delete(ldmsd_cfgobj_t obj)
 	if (obj->enabled)
 		return ldmsd_result_new(EBUSY, 0, NULL);
 	rbt_del(cfgobj_trees[obj->type], &obj->rbn);
+	ldmsd_watch_post_del(obj->type, obj->name);
 	ldmsd_cfgobj_put(obj);
 	return ldmsd_result_new(0, NULL, NULL);
 }
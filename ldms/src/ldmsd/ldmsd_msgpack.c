@@ -0,0 +1,471 @@
+/* -*- c-basic-offset: 8 -*-
+ * Copyright (c) 2020 National Technology & Engineering Solutions
+ * of Sandia, LLC (NTESS). Under the terms of Contract DE-NA0003525 with
+ * NTESS, the U.S. Government retains certain rights in this software.
+ * Copyright (c) 2020 Open Grid Computing, Inc. All rights reserved.
+ *
+ * This software is available to you under a choice of one of two
+ * licenses.  You may choose to be licensed under the terms of the GNU
+ * General Public License (GPL) Version 2, available from the file
+ * COPYING in the main directory of this source tree, or the BSD-type
+ * license below:
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions
+ * are met:
+ *
+ *      Redistributions of source code must retain the above copyright
+ *      notice, this list of conditions and the following disclaimer.
+ *
+ *      Redistributions in binary form must reproduce the above
+ *      copyright notice, this list of conditions and the following
+ *      disclaimer in the documentation and/or other materials provided
+ *      with the distribution.
+ *
+ *      Neither the name of Sandia nor the names of any contributors may
+ *      be used to endorse or promote products derived from this software
+ *      without specific prior written permission.
+ *
+ *      Neither the name of Open Grid Computing nor the names of any
+ *      contributors may be used to endorse or promote products derived
+ *      from this software without specific prior written permission.
+ *
+ *      Modified source versions must be plainly marked as such, and
+ *      must not be misrepresented as being the original software.
+ *
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+/*
+ * MessagePack encoding of the LDMSD configuration messages
+ *
+ * A configuration message is encoded in MessagePack, instead of JSON text,
+ * when its records carry LDMSD_REC_MSGPACK_F. The message is the MessagePack
+ * counterpart of the JSON object: JSON objects are maps with string keys,
+ * lists are arrays, and the scalars are nil, bool, int, float64 and str.
+ */
+
+#include <stdlib.h>
+#include <stdint.h>
+#include <errno.h>
+#include <string.h>
+#include <endian.h>
+#include <json/json_util.h>
+#include "ldmsd_request.h"
+
+#define MSGPACK_MAX_DEPTH 64
+
+static int __reserve(ldmsd_req_buf_t buf, size_t len)
+{
+	size_t new_len;
+	char *p;
+	if (buf->len - buf->off >= len)
+		return 0;
+	new_len = buf->len * 2;
+	while (new_len - buf->off < len)
+		new_len *= 2;
+	/* Unlike ldmsd_req_buf_realloc(), keep \c buf valid on failure. */
+	p = realloc(buf->buf, new_len);
+	if (!p)
+		return ENOMEM;
+	buf->buf = p;
+	buf->len = new_len;
+	return 0;
+}
+
+static int __put(ldmsd_req_buf_t buf, const void *data, size_t len)
+{
+	if (__reserve(buf, len))
+		return ENOMEM;
+	memcpy(&buf->buf[buf->off], data, len);
+	buf->off += len;
+	return 0;
+}
+
+static int __put_hdr(ldmsd_req_buf_t buf, uint8_t fix, uint8_t fix_max,
+		     uint8_t tag16, size_t n)
+{
+	uint8_t b[5];
+	uint16_t u16;
+	uint32_t u32;
+
+	if (n <= fix_max) {
+		b[0] = fix | n;
+		return __put(buf, b, 1);
+	}
+	if (n <= UINT16_MAX) {
+		b[0] = tag16;
+		u16 = htobe16(n);
+		memcpy(&b[1], &u16, 2);
+		return __put(buf, b, 3);
+	}
+	b[0] = tag16 + 1; /* the 32-bit tag follows the 16-bit one */
+	u32 = htobe32(n);
+	memcpy(&b[1], &u32, 4);
+	return __put(buf, b, 5);
+}
+
+static int __put_str(ldmsd_req_buf_t buf, const char *s, size_t len)
+{
+	uint8_t b[2];
+	int rc;
+	if (len <= 31 || len > UINT8_MAX) {
+		rc = __put_hdr(buf, 0xa0, 31, 0xda, len);
+	} else {
+		b[0] = 0xd9;
+		b[1] = len;
+		rc = __put(buf, b, 2);
+	}
+	if (rc)
+		return rc;
+	return __put(buf, s, len);
+}
+
+static int __put_int(ldmsd_req_buf_t buf, int64_t i)
+{
+	uint8_t b[9];
+	uint32_t u32;
+	uint64_t u64;
+
+	if (i >= -32 && i <= 127) {
+		b[0] = (uint8_t)(int8_t)i;
+		return __put(buf, b, 1);
+	}
+	if (i >= INT32_MIN && i <= INT32_MAX) {
+		b[0] = 0xd2;
+		u32 = htobe32((uint32_t)(int32_t)i);
+		memcpy(&b[1], &u32, 4);
+		return __put(buf, b, 5);
+	}
+	b[0] = 0xd3;
+	u64 = htobe64((uint64_t)i);
+	memcpy(&b[1], &u64, 8);
+	return __put(buf, b, 9);
+}
+
+static int __encode(ldmsd_req_buf_t buf, json_entity_t e)
+{
+	int rc;
+	uint8_t b[9];
+	uint64_t u64;
+	json_entity_t i;
+	json_str_t s;
+
+	switch (e->type) {
+	case JSON_NULL_VALUE:
+		b[0] = 0xc0;
+		return __put(buf, b, 1);
+	case JSON_BOOL_VALUE:
+		b[0] = e->value.bool_ ? 0xc3 : 0xc2;
+		return __put(buf, b, 1);
+	case JSON_INT_VALUE:
+		return __put_int(buf, e->value.int_);
+	case JSON_FLOAT_VALUE:
+		b[0] = 0xcb;
+		memcpy(&u64, &e->value.double_, 8);
+		u64 = htobe64(u64);
+		memcpy(&b[1], &u64, 8);
+		return __put(buf, b, 9);
+	case JSON_STRING_VALUE:
+		s = e->value.str_;
+		return __put_str(buf, s->str, s->str_len);
+	case JSON_LIST_VALUE:
+		rc = __put_hdr(buf, 0x90, 15, 0xdc, json_list_len(e));
+		if (rc)
+			return rc;
+		for (i = json_item_first(e); i; i = json_item_next(i)) {
+			rc = __encode(buf, i);
+			if (rc)
+				return rc;
+		}
+		return 0;
+	case JSON_DICT_VALUE:
+		rc = __put_hdr(buf, 0x80, 15, 0xde, json_attr_count(e));
+		if (rc)
+			return rc;
+		for (i = json_attr_first(e); i; i = json_attr_next(i)) {
+			s = json_attr_name(i);
+			rc = __put_str(buf, s->str, s->str_len);
+			if (rc)
+				return rc;
+			rc = __encode(buf, json_attr_value(i));
+			if (rc)
+				return rc;
+		}
+		return 0;
+	default:
+		return EINVAL;
+	}
+}
+
+int ldmsd_msgpack_encode(ldmsd_req_buf_t buf, json_entity_t e)
+{
+	return __encode(buf, e);
+}
+
+struct __decoder {
+	const uint8_t *p;
+	const uint8_t *end;
+};
+
+static inline int __get(struct __decoder *d, void *v, size_t len)
+{
+	if ((size_t)(d->end - d->p) < len)
+		return EINVAL;
+	memcpy(v, d->p, len);
+	d->p += len;
+	return 0;
+}
+
+static int __get_len(struct __decoder *d, int width, size_t *_len)
+{
+	uint8_t u8;
+	uint16_t u16;
+	uint32_t u32;
+	int rc;
+
+	switch (width) {
+	case 1:
+		rc = __get(d, &u8, 1);
+		*_len = u8;
+		break;
+	case 2:
+		rc = __get(d, &u16, 2);
+		*_len = be16toh(u16);
+		break;
+	default:
+		rc = __get(d, &u32, 4);
+		*_len = be32toh(u32);
+		break;
+	}
+	return rc;
+}
+
+static json_entity_t __str_new(struct __decoder *d, size_t len)
+{
+	char sbuf[256];
+	char *s;
+	json_entity_t e;
+
+	if ((size_t)(d->end - d->p) < len) {
+		errno = EINVAL;
+		return NULL;
+	}
+	s = (len < sizeof(sbuf)) ? sbuf : malloc(len + 1);
+	if (!s) {
+		errno = ENOMEM;
+		return NULL;
+	}
+	memcpy(s, d->p, len);
+	s[len] = '\0';
+	d->p += len;
+	e = json_entity_new(JSON_STRING_VALUE, s);
+	if (s != sbuf)
+		free(s);
+	if (!e)
+		errno = ENOMEM;
+	return e;
+}
+
+static json_entity_t __decode(struct __decoder *d, int depth);
+
+static json_entity_t __list_new(struct __decoder *d, size_t n, int depth)
+{
+	json_entity_t l, i;
+
+	l = json_entity_new(JSON_LIST_VALUE);
+	if (!l) {
+		errno = ENOMEM;
+		return NULL;
+	}
+	while (n--) {
+		i = __decode(d, depth + 1);
+		if (!i)
+			goto err;
+		json_item_add(l, i);
+	}
+	return l;
+err:
+	json_entity_free(l);
+	return NULL;
+}
+
+static json_entity_t __dict_new(struct __decoder *d, size_t n, int depth)
+{
+	json_entity_t dict, name = NULL, v, a;
+
+	dict = json_entity_new(JSON_DICT_VALUE);
+	if (!dict) {
+		errno = ENOMEM;
+		return NULL;
+	}
+	while (n--) {
+		name = __decode(d, depth + 1);
+		if (!name)
+			goto err;
+		if (JSON_STRING_VALUE != name->type) {
+			errno = EINVAL;
+			goto err;
+		}
+		v = __decode(d, depth + 1);
+		if (!v)
+			goto err;
+		a = json_entity_new(JSON_ATTR_VALUE, json_value_str(name)->str, v);
+		if (!a) {
+			json_entity_free(v);
+			errno = ENOMEM;
+			goto err;
+		}
+		json_attr_add(dict, a);
+		json_entity_free(name);
+		name = NULL;
+	}
+	return dict;
+err:
+	json_entity_free(name);
+	json_entity_free(dict);
+	return NULL;
+}
+
+static json_entity_t __decode(struct __decoder *d, int depth)
+{
+	uint8_t tag;
+	uint8_t u8;
+	uint16_t u16;
+	uint32_t u32;
+	uint64_t u64;
+	float f;
+	double dbl;
+	size_t len;
+	json_entity_t e;
+
+	if (depth > MSGPACK_MAX_DEPTH || __get(d, &tag, 1))
+		goto einval;
+
+	if (tag <= 0x7f)
+		return json_entity_new(JSON_INT_VALUE, (int64_t)tag);
+	if (tag >= 0xe0)
+		return json_entity_new(JSON_INT_VALUE, (int64_t)(int8_t)tag);
+	if ((tag & 0xe0) == 0xa0)
+		return __str_new(d, tag & 0x1f);
+	if ((tag & 0xf0) == 0x90)
+		return __list_new(d, tag & 0x0f, depth);
+	if ((tag & 0xf0) == 0x80)
+		return __dict_new(d, tag & 0x0f, depth);
+
+	switch (tag) {
+	case 0xc0:
+		e = json_entity_new(JSON_NULL_VALUE);
+		break;
+	case 0xc2:
+	case 0xc3:
+		e = json_entity_new(JSON_BOOL_VALUE, tag == 0xc3);
+		break;
+	case 0xca:
+		if (__get(d, &u32, 4))
+			goto einval;
+		u32 = be32toh(u32);
+		memcpy(&f, &u32, 4);
+		e = json_entity_new(JSON_FLOAT_VALUE, (double)f);
+		break;
+	case 0xcb:
+		if (__get(d, &u64, 8))
+			goto einval;
+		u64 = be64toh(u64);
+		memcpy(&dbl, &u64, 8);
+		e = json_entity_new(JSON_FLOAT_VALUE, dbl);
+		break;
+	case 0xcc:
+		if (__get(d, &u8, 1))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE, (int64_t)u8);
+		break;
+	case 0xcd:
+		if (__get(d, &u16, 2))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE, (int64_t)be16toh(u16));
+		break;
+	case 0xce:
+		if (__get(d, &u32, 4))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE, (int64_t)be32toh(u32));
+		break;
+	case 0xcf:
+	case 0xd3:
+		if (__get(d, &u64, 8))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE, (int64_t)be64toh(u64));
+		break;
+	case 0xd0:
+		if (__get(d, &u8, 1))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE, (int64_t)(int8_t)u8);
+		break;
+	case 0xd1:
+		if (__get(d, &u16, 2))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE,
+				    (int64_t)(int16_t)be16toh(u16));
+		break;
+	case 0xd2:
+		if (__get(d, &u32, 4))
+			goto einval;
+		e = json_entity_new(JSON_INT_VALUE,
+				    (int64_t)(int32_t)be32toh(u32));
+		break;
+	case 0xd9:
+	case 0xda:
+	case 0xdb:
+		if (__get_len(d, 1 << (tag - 0xd9), &len))
+			goto einval;
+		return __str_new(d, len);
+	case 0xdc:
+	case 0xdd:
+		if (__get_len(d, (tag == 0xdc) ? 2 : 4, &len))
+			goto einval;
+		return __list_new(d, len, depth);
+	case 0xde:
+	case 0xdf:
+		if (__get_len(d, (tag == 0xde) ? 2 : 4, &len))
+			goto einval;
+		return __dict_new(d, len, depth);
+	default:
+		/* bin, ext and the other types have no JSON counterpart */
+		goto einval;
+	}
+	if (!e)
+		errno = ENOMEM;
+	return e;
+einval:
+	errno = EINVAL;
+	return NULL;
+}
+
+int ldmsd_msgpack_decode(const char *data, size_t data_len, json_entity_t *_e)
+{
+	struct __decoder d = { (const uint8_t *)data,
+			       (const uint8_t *)data + data_len };
+	json_entity_t e;
+
+	e = __decode(&d, 0);
+	if (!e)
+		return errno;
+	if (d.p != d.end) {
+		/* trailing garbage */
+		json_entity_free(e);
+		return EINVAL;
+	}
+	*_e = e;
+	return 0;
+}
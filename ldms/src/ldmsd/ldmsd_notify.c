@@ -173,3 +173,483 @@ static int __notify_update_hint_handler(ldmsd_req_ctxt_t reqc)
 	ldms_set_put(set);
 	return rc;
 }
+
+/*
+ * Status watchers
+ *
+ * A client subscribes to the status changes of the prdcr, updtr and strgp
+ * cfgobjs with a `watch` request. Each change is recorded in the pending
+ * dictionary of the watchers,
+ *
+ *   { <schema>: { <name>: { <attr>: <latest value>, ... }, ... }, ... }
+ *
+ * so that the changes of an attribute between two flushes coalesce into one.
+ * A created object is posted with all of its status attributes, and a deleted
+ * object is posted as a null <name> value, which replaces its pending changes.
+ * Every interval, the pending changes of a watcher are sent to the client in
+ * a NOTIFY message,
+ *
+ *   { "type": "status", "id": <watch msg_no>, "seq": <n>,
+ *     "changes": <pending dictionary> }
+ *
+ * and nothing is sent if nothing changed, except for an empty message every
+ * WATCH_HEARTBEAT intervals, with which a disconnected client is detected.
+ * The cost of a flush is then proportional to the number of changed objects,
+ * not to the number of cfgobjs.
+ */
+#define WATCH_HEARTBEAT 10
+
+typedef struct ldmsd_watcher {
+	ldmsd_cfg_xprt_t xprt;
+	uint32_t msg_no;
+	int enc_flags;
+	int type_mask;	/* (1 << cfgobj type) of the watched schemas */
+	long interval_us;
+	uint64_t seq;
+	int idle;	/* The number of intervals without changes */
+	int stopped;	/* Freed by the flush actor once set */
+	json_entity_t pending;
+	ev_t flush_ev;
+	LIST_ENTRY(ldmsd_watcher) entry;
+} *ldmsd_watcher_t;
+
+void __msg_key_get(ldmsd_cfg_xprt_t xprt, uint32_t msg_no, ldmsd_msg_key_t key_);
+
+static pthread_mutex_t watch_lock = PTHREAD_MUTEX_INITIALIZER;
+static LIST_HEAD(ldmsd_watcher_list, ldmsd_watcher) watch_list;
+/* The posters skip all work without taking watch_lock if this is 0. */
+static int watch_count;
+
+static int __attr_add(json_entity_t d, const char *name, json_entity_t v)
+{
+	json_entity_t a = json_entity_new(JSON_ATTR_VALUE, name, v);
+	if (!a)
+		return ENOMEM;
+	json_attr_add(d, a);
+	return 0;
+}
+
+static void __watcher_free(ldmsd_watcher_t w)
+{
+	ldmsd_cfg_xprt_ref_put(w->xprt, "watch");
+	if (w->pending)
+		json_entity_free(w->pending);
+	ev_put(w->flush_ev);
+	free(w);
+}
+
+/* Caller must hold watch_lock. */
+static void __watcher_stop(ldmsd_watcher_t w)
+{
+	LIST_REMOVE(w, entry);
+	w->stopped = 1;
+	watch_count--;
+}
+
+static int __watcher_send(ldmsd_watcher_t w, json_entity_t changes)
+{
+	struct ldmsd_msg_key key;
+	json_entity_t msg;
+	ldmsd_req_buf_t buf, enc_buf = NULL;
+	jbuf_t jb = NULL;
+	int rc;
+
+	msg = json_dict_build(NULL,
+			JSON_STRING_VALUE, "type", "status",
+			JSON_INT_VALUE, "id", (uint64_t)w->msg_no,
+			JSON_INT_VALUE, "seq", w->seq++,
+			-1);
+	if (!msg)
+		return ENOMEM;
+	rc = __attr_add(msg, "changes", changes);
+	if (rc) {
+		json_entity_free(changes);
+		goto out;
+	}
+
+	buf = ldmsd_req_buf_alloc(w->xprt->max_msg);
+	if (!buf) {
+		rc = ENOMEM;
+		goto out;
+	}
+	__msg_key_get(w->xprt, w->msg_no, &key);
+	if (w->enc_flags & LDMSD_REC_MSGPACK_F) {
+		enc_buf = ldmsd_req_buf_alloc(w->xprt->max_msg);
+		if (!enc_buf) {
+			rc = ENOMEM;
+			goto free_buf;
+		}
+		enc_buf->off = 0;
+		rc = ldmsd_msgpack_encode(enc_buf, msg);
+		if (rc)
+			goto free_buf;
+		rc = ldmsd_append_msg_buffer(w->xprt, w->xprt->max_msg, &key,
+				(ldmsd_msg_send_fn_t)w->xprt->send_fn, buf,
+				LDMSD_REC_SOM_F | LDMSD_REC_EOM_F | LDMSD_REC_MSGPACK_F,
+				LDMSD_MSG_TYPE_NOTIFY, enc_buf->buf, enc_buf->off);
+	} else {
+		jb = json_entity_dump(NULL, msg);
+		if (!jb) {
+			rc = ENOMEM;
+			goto free_buf;
+		}
+		rc = ldmsd_append_msg_buffer(w->xprt, w->xprt->max_msg, &key,
+				(ldmsd_msg_send_fn_t)w->xprt->send_fn, buf,
+				LDMSD_REC_SOM_F | LDMSD_REC_EOM_F,
+				LDMSD_MSG_TYPE_NOTIFY, jb->buf, jb->cursor);
+		jbuf_free(jb);
+	}
+ free_buf:
+	if (enc_buf)
+		ldmsd_req_buf_free(enc_buf);
+	ldmsd_req_buf_free(buf);
+ out:
+	json_entity_free(msg);
+	return rc;
+}
+
+int watch_flush_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t ev)
+{
+	ldmsd_watcher_t w = EV_DATA(ev, struct watch_data)->watcher;
+	json_entity_t changes, fresh;
+	struct timespec to;
+	int rc;
+
+	pthread_mutex_lock(&watch_lock);
+	if (w->stopped || (EV_FLUSH == status)) {
+		if (!w->stopped)
+			__watcher_stop(w);
+		pthread_mutex_unlock(&watch_lock);
+		goto free;
+	}
+	changes = NULL;
+	if (json_attr_count(w->pending)) {
+		fresh = json_entity_new(JSON_DICT_VALUE);
+		if (fresh) {
+			changes = w->pending;
+			w->pending = fresh;
+		} else {
+			/* Keep the pending changes for the next interval. */
+			ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+		}
+	}
+	pthread_mutex_unlock(&watch_lock);
+
+	if (!changes && (++w->idle >= WATCH_HEARTBEAT)) {
+		changes = json_entity_new(JSON_DICT_VALUE);
+		if (!changes)
+			ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+	}
+	if (changes) {
+		w->idle = 0;
+		rc = __watcher_send(w, changes);
+		if (rc) {
+			/* The client is most likely gone. */
+			__DLOG("DEBUG: watcher %" PRIu32 " send error %d\n",
+							w->msg_no, rc);
+			pthread_mutex_lock(&watch_lock);
+			if (!w->stopped)
+				__watcher_stop(w);
+			pthread_mutex_unlock(&watch_lock);
+			goto free;
+		}
+	}
+	ev_sched_to(&to, w->interval_us / 1000000,
+			(w->interval_us % 1000000) * 1000);
+	if (0 == ev_post(cfg, cfg, w->flush_ev, &to))
+		return 0;
+	pthread_mutex_lock(&watch_lock);
+	if (!w->stopped)
+		__watcher_stop(w);
+	pthread_mutex_unlock(&watch_lock);
+ free:
+	__watcher_free(w);
+	return 0;
+}
+
+/*
+ * Record the value \c v of \c attr of an object in the pending changes of
+ * \c w. \c v is consumed, also on error. Caller must hold watch_lock.
+ */
+static int __watcher_set(ldmsd_watcher_t w, const char *schema,
+			const char *name, const char *attr, json_entity_t v)
+{
+	json_entity_t d, o;
+
+	if (!v)
+		return ENOMEM;
+	d = json_value_find(w->pending, (char *)schema);
+	if (!d) {
+		d = json_entity_new(JSON_DICT_VALUE);
+		if (!d || __attr_add(w->pending, schema, d))
+			goto err;
+	}
+	o = json_value_find(d, (char *)name);
+	if (!o || (JSON_DICT_VALUE != o->type)) {
+		/* New, or deleted and created again */
+		o = json_entity_new(JSON_DICT_VALUE);
+		if (!o || __attr_add(d, name, o))
+			goto err;
+	}
+	if (__attr_add(o, attr, v)) {
+		v = NULL;
+		goto err;
+	}
+	return 0;
+ err:
+	/* The dictionaries added before the error are left empty. */
+	json_entity_free(v);
+	return ENOMEM;
+}
+
+/*
+ * Record the removal of an object in the pending changes of \c w, replacing
+ * the pending changes of the object. Caller must hold watch_lock.
+ */
+static int __watcher_remove(ldmsd_watcher_t w, const char *schema,
+						const char *name)
+{
+	json_entity_t d, v;
+
+	d = json_value_find(w->pending, (char *)schema);
+	if (!d) {
+		d = json_entity_new(JSON_DICT_VALUE);
+		if (!d || __attr_add(w->pending, schema, d))
+			return ENOMEM;
+	}
+	v = json_entity_new(JSON_NULL_VALUE);
+	if (!v || __attr_add(d, name, v)) {
+		if (v)
+			json_entity_free(v);
+		return ENOMEM;
+	}
+	return 0;
+}
+
+/*
+ * Record all status attributes of \c obj in the pending changes of \c w.
+ * Caller must hold the object lock and watch_lock.
+ */
+static int __watcher_obj_set(ldmsd_watcher_t w, ldmsd_cfgobj_t obj)
+{
+	ldmsd_prdcr_t prdcr;
+	ldmsd_updtr_t updtr;
+	ldmsd_strgp_t strgp;
+	const char *name = obj->name;
+	int rc = 0;
+
+	switch (obj->type) {
+	case LDMSD_CFGOBJ_PRDCR:
+		prdcr = (ldmsd_prdcr_t)obj;
+		rc = __watcher_set(w, "prdcr", name, "state",
+			json_entity_new(JSON_STRING_VALUE,
+			ldmsd_prdcr_state2str(prdcr->conn_state)));
+		break;
+	case LDMSD_CFGOBJ_UPDTR:
+		updtr = (ldmsd_updtr_t)obj;
+		rc = __watcher_set(w, "updtr", name, "state",
+			json_entity_new(JSON_STRING_VALUE,
+			ldmsd_updtr_state_str(updtr->state)));
+		rc = rc?rc:__watcher_set(w, "updtr", name, "sched_miss",
+			json_entity_new(JSON_INT_VALUE, updtr->sched_miss));
+		break;
+	case LDMSD_CFGOBJ_STRGP:
+		strgp = (ldmsd_strgp_t)obj;
+		rc = __watcher_set(w, "strgp", name, "state",
+			json_entity_new(JSON_STRING_VALUE,
+			ldmsd_strgp_state_str(strgp->state)));
+		rc = rc?rc:__watcher_set(w, "strgp", name, "store_errors",
+			json_entity_new(JSON_INT_VALUE, strgp->store_errors));
+		rc = rc?rc:__watcher_set(w, "strgp", name, "last_store_error",
+			json_entity_new(JSON_INT_VALUE,
+					(uint64_t)strgp->last_store_error));
+		break;
+	default:
+		break;
+	}
+	return rc;
+}
+
+static void __watch_post(ldmsd_cfgobj_type_t type, const char *name,
+				const char *attr, enum json_value_e vtype, ...)
+{
+	ldmsd_watcher_t w;
+	json_entity_t v;
+	const char *schema = ldmsd_cfgobj_type2str(type);
+	va_list ap;
+
+	pthread_mutex_lock(&watch_lock);
+	LIST_FOREACH(w, &watch_list, entry) {
+		if (!(w->type_mask & (1 << type)))
+			continue;
+		va_start(ap, vtype);
+		if (JSON_STRING_VALUE == vtype)
+			v = json_entity_new(vtype, va_arg(ap, char *));
+		else
+			v = json_entity_new(vtype, va_arg(ap, int64_t));
+		va_end(ap);
+		if (__watcher_set(w, schema, name, attr, v))
+			goto oom;
+	}
+	pthread_mutex_unlock(&watch_lock);
+	return;
+ oom:
+	pthread_mutex_unlock(&watch_lock);
+	ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+}
+
+/*
+ * Record the current status of all watched objects in the pending changes
+ * of the new watcher \c w, so that its first message is a full snapshot.
+ * The objects are locked as the posters hold them locked, so a change made
+ * after \c w was listed is either in the snapshot or posted afterward.
+ */
+static int __watcher_snapshot(ldmsd_watcher_t w)
+{
+	ldmsd_cfgobj_t obj;
+	int type, rc = 0;
+
+	for (type = LDMSD_CFGOBJ_PRDCR; type <= LDMSD_CFGOBJ_STRGP; type++) {
+		if (!(w->type_mask & (1 << type)))
+			continue;
+		ldmsd_cfg_lock(type);
+		for (obj = ldmsd_cfgobj_first(type); obj && !rc;
+					obj = ldmsd_cfgobj_next(obj)) {
+			ldmsd_cfgobj_lock(obj);
+			pthread_mutex_lock(&watch_lock);
+			rc = __watcher_obj_set(w, obj);
+			pthread_mutex_unlock(&watch_lock);
+			ldmsd_cfgobj_unlock(obj);
+		}
+		if (obj)
+			ldmsd_cfgobj_put(obj);
+		ldmsd_cfg_unlock(type);
+		if (rc)
+			break;
+	}
+	return rc;
+}
+
+int ldmsd_watch_add(ldmsd_cfg_xprt_t xprt, uint32_t msg_no, int enc_flags,
+					int type_mask, long interval_us)
+{
+	ldmsd_watcher_t w;
+	struct timespec to;
+	int rc;
+
+	pthread_mutex_lock(&watch_lock);
+	LIST_FOREACH(w, &watch_list, entry) {
+		if (w->xprt->ldms.ldms == xprt->ldms.ldms) {
+			__watcher_stop(w);
+			break;
+		}
+	}
+	pthread_mutex_unlock(&watch_lock);
+	if (!type_mask)
+		return 0;
+
+	w = calloc(1, sizeof(*w));
+	if (!w)
+		return ENOMEM;
+	w->pending = json_entity_new(JSON_DICT_VALUE);
+	if (!w->pending)
+		goto enomem;
+	w->flush_ev = ev_new(watch_flush_type);
+	if (!w->flush_ev)
+		goto enomem;
+	EV_DATA(w->flush_ev, struct watch_data)->watcher = w;
+	ldmsd_cfg_xprt_ref_get(xprt, "watch");
+	w->xprt = xprt;
+	w->msg_no = msg_no;
+	w->enc_flags = enc_flags;
+	w->type_mask = type_mask;
+	w->interval_us = interval_us;
+
+	pthread_mutex_lock(&watch_lock);
+	LIST_INSERT_HEAD(&watch_list, w, entry);
+	watch_count++;
+	pthread_mutex_unlock(&watch_lock);
+	rc = __watcher_snapshot(w);
+	if (rc)
+		goto err;
+	/* Send the snapshot right away. */
+	ev_sched_to(&to, 0, 0);
+	if (ev_post(cfg, cfg, w->flush_ev, &to)) {
+		rc = EBUSY;
+		goto err;
+	}
+	return 0;
+
+ err:
+	pthread_mutex_lock(&watch_lock);
+	__watcher_stop(w);
+	pthread_mutex_unlock(&watch_lock);
+	__watcher_free(w);
+	return rc;
+
+ enomem:
+	if (w->pending)
+		json_entity_free(w->pending);
+	free(w);
+	return ENOMEM;
+}
+
+void ldmsd_watch_post_str(ldmsd_cfgobj_type_t type, const char *name,
+				const char *attr, const char *value)
+{
+	if (!watch_count)
+		return;
+	__watch_post(type, name, attr, JSON_STRING_VALUE, value);
+}
+
+void ldmsd_watch_post_int(ldmsd_cfgobj_type_t type, const char *name,
+				const char *attr, int64_t value)
+{
+	if (!watch_count)
+		return;
+	__watch_post(type, name, attr, JSON_INT_VALUE, value);
+}
+
+void ldmsd_watch_post_new(ldmsd_cfgobj_t obj)
+{
+	ldmsd_watcher_t w;
+
+	if (!watch_count)
+		return;
+	ldmsd_cfgobj_lock(obj);
+	pthread_mutex_lock(&watch_lock);
+	LIST_FOREACH(w, &watch_list, entry) {
+		if (!(w->type_mask & (1 << obj->type)))
+			continue;
+		if (__watcher_obj_set(w, obj))
+			goto oom;
+	}
+	pthread_mutex_unlock(&watch_lock);
+	ldmsd_cfgobj_unlock(obj);
+	return;
+ oom:
+	pthread_mutex_unlock(&watch_lock);
+	ldmsd_cfgobj_unlock(obj);
+	ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+}
+
+void ldmsd_watch_post_del(ldmsd_cfgobj_type_t type, const char *name)
+{
+	ldmsd_watcher_t w;
+	const char *schema = ldmsd_cfgobj_type2str(type);
+
+	if (!watch_count)
+		return;
+	pthread_mutex_lock(&watch_lock);
+	LIST_FOREACH(w, &watch_list, entry) {
+		if (!(w->type_mask & (1 << type)))
+			continue;
+		if (__watcher_remove(w, schema, name))
+			goto oom;
+	}
+	pthread_mutex_unlock(&watch_lock);
+	return;
+ oom:
+	pthread_mutex_unlock(&watch_lock);
+	ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+}
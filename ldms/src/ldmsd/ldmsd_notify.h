@@ -55,6 +55,7 @@
 #define __LDMSD_NOTIFY_H__
 
 #include "ldmsd.h"
+#include "ldmsd_request.h"
 
 typedef struct notify_handle_entry_s {
 	const char *type; /* notification type */
@@ -64,4 +65,42 @@ typedef struct notify_handle_entry_s {
 
 notify_handle_entry_t ldmsd_notify_handler_find(const char *notify_type);
 
+/**
+ * \brief Add a status watcher to the connection of \c xprt
+ *
+ * The status changes of the cfgobjs of the types in \c type_mask are sent to
+ * the peer in NOTIFY messages numbered \c msg_no every \c interval_us
+ * microseconds. An existing watcher of the connection is replaced, and it is
+ * removed if \c type_mask is 0.
+ *
+ * \param xprt        The LDMS configuration transport of the peer
+ * \param msg_no      The message number of the `watch` request
+ * \param enc_flags   The encoding flags (LDMSD_REC_ENC_MASK) of the messages
+ * \param type_mask   The bitwise-or of (1 << LDMSD_CFGOBJ_*)
+ * \param interval_us The flush interval in microseconds
+ *
+ * \return 0 on success. ENOMEM or EBUSY otherwise.
+ */
+int ldmsd_watch_add(ldmsd_cfg_xprt_t xprt, uint32_t msg_no, int enc_flags,
+					int type_mask, long interval_us);
+/**
+ * \brief Post a status change of a cfgobj to the watchers
+ *
+ * Cheap if no one watches.
+ */
+void ldmsd_watch_post_str(ldmsd_cfgobj_type_t type, const char *name,
+				const char *attr, const char *value);
+void ldmsd_watch_post_int(ldmsd_cfgobj_type_t type, const char *name,
+				const char *attr, int64_t value);
+/**
+ * \brief Post all status attributes of the new cfgobj \c obj to the watchers
+ *
+ * The caller must not hold the lock of \c obj.
+ */
+void ldmsd_watch_post_new(ldmsd_cfgobj_t obj);
+/**
+ * \brief Post the removal of the cfgobj \c name of \c type to the watchers
+ */
+void ldmsd_watch_post_del(ldmsd_cfgobj_type_t type, const char *name);
+
 #endif
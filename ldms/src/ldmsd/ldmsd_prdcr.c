@@ -63,6 +63,7 @@
 #include "ldmsd.h"
 #include "ldms_xprt.h"
 #include "ldmsd_request.h"
+#include "ldmsd_notify.h"
 #include "config.h"
 
 int prdcr_resolve(const char *hostname, unsigned short port_no,
@@ -429,6 +430,14 @@ err:
 	return rc;
 }
 
+/* Caller must hold the producer lock. */
+static void __prdcr_state_set(ldmsd_prdcr_t prdcr, enum ldmsd_prdcr_state state)
+{
+	prdcr->conn_state = state;
+	ldmsd_watch_post_str(LDMSD_CFGOBJ_PRDCR, prdcr->obj.name, "state",
+					ldmsd_prdcr_state2str(state));
+}
+
 static void prdcr_connect_cb(ldms_t x, ldms_xprt_event_t e, void *cb_arg)
 {
 	struct timespec to;
@@ -439,7 +448,7 @@ static void prdcr_connect_cb(ldms_t x, ldms_xprt_event_t e, void *cb_arg)
 		ldmsd_log(LDMSD_LINFO, "Producer %s is connected (%s %s:%d)\n",
 				prdcr->obj.name, prdcr->xprt_name,
 				prdcr->host_name, (int)prdcr->port_no);
-		prdcr->conn_state = LDMSD_PRDCR_STATE_CONNECTED;
+		__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_CONNECTED);
 		if (__prdcr_subscribe(prdcr)) {
 			ldmsd_log(LDMSD_LERROR, "Could not subscribe to stream data on producer %s\n",
 				  prdcr->obj.name);
@@ -481,12 +490,12 @@ reset_prdcr:
 	prdcr->xprt = NULL;
 	switch (prdcr->conn_state) {
 	case LDMSD_PRDCR_STATE_STOPPING:
-		prdcr->conn_state = LDMSD_PRDCR_STATE_STOPPED;
+		__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_STOPPED);
 		break;
 	case LDMSD_PRDCR_STATE_DISCONNECTED:
 	case LDMSD_PRDCR_STATE_CONNECTING:
 	case LDMSD_PRDCR_STATE_CONNECTED:
-		prdcr->conn_state = LDMSD_PRDCR_STATE_DISCONNECTED;
+		__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_DISCONNECTED);
 		ev_sched_to(&to, prdcr->conn_intrvl_us / 1000000, 0);
 		ev_post(producer, producer, prdcr->connect_ev, &to);
 		break;
@@ -509,7 +518,7 @@ static void prdcr_connect(ldmsd_prdcr_t prdcr)
 		 * its reference got taken when the producer was created.
 		 */
 		auth_dom = ldmsd_auth_find(prdcr->conn_auth);
-		prdcr->conn_state = LDMSD_PRDCR_STATE_CONNECTING;
+		__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_CONNECTING);
 		prdcr->xprt = ldms_xprt_new_with_auth(prdcr->xprt_name,
 						      ldmsd_linfo,
 						      auth_dom->plugin,
@@ -544,7 +553,7 @@ static void prdcr_connect(ldmsd_prdcr_t prdcr)
 	return;
 
  error:
-	prdcr->conn_state = LDMSD_PRDCR_STATE_DISCONNECTED;
+	__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_DISCONNECTED);
 	ev_sched_to(&to, prdcr->conn_intrvl_us / 1000000, 0);
 	ev_post(producer, producer, prdcr->connect_ev, &to);
 	return;
@@ -721,7 +730,7 @@ static int ldmsd_prdcr_enable(ldmsd_cfgobj_t obj)
 	if (prdcr->conn_state != LDMSD_PRDCR_STATE_STOPPED)
 		return EBUSY;
 
-	prdcr->conn_state = LDMSD_PRDCR_STATE_DISCONNECTED;
+	__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_DISCONNECTED);
 
 	prdcr->obj.perm |= LDMSD_PERM_DSTART; /* TODO: Remove this? */
 
@@ -747,13 +756,13 @@ static int ldmsd_prdcr_disable(ldmsd_cfgobj_t obj)
 	if (prdcr->type == LDMSD_PRDCR_TYPE_LOCAL)
 		prdcr_reset_sets(prdcr);
 	prdcr->obj.perm &= ~LDMSD_PERM_DSTART;
-	prdcr->conn_state = LDMSD_PRDCR_STATE_STOPPING;
+	__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_STOPPING);
 	if (prdcr->xprt)
 		ldms_xprt_close(prdcr->xprt);
 	ldmsd_prdcr_unlock(prdcr);
 	ldmsd_prdcr_lock(prdcr);
 	if (!prdcr->xprt)
-		prdcr->conn_state = LDMSD_PRDCR_STATE_STOPPED;
+		__prdcr_state_set(prdcr, LDMSD_PRDCR_STATE_STOPPED);
 	ev_post(producer, updater, prdcr->stop_ev, NULL);
 out:
 	ldmsd_prdcr_unlock(prdcr);
@@ -1303,6 +1312,7 @@ json_entity_t ldmsd_prdcr_create(const char *name, short enabled, json_entity_t
 	EV_DATA(prdcr->stop_ev, struct stop_data)->entity = prdcr;
 
 	ldmsd_prdcr_unlock(prdcr);
+	ldmsd_watch_post_new(&prdcr->obj);
 
 	return ldmsd_result_new(0, NULL, NULL);
 oom:
@@ -168,6 +168,8 @@ struct request_handler_entry {
 		   * The rest is reserved for ldmsd_request use. */
 };
 
+static json_entity_t
+ldmsd_batch_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
 static json_entity_t
 ldmsd_cfgobj_create_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
 static json_entity_t
@@ -183,13 +185,19 @@ stream_subscribe_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
 static json_entity_t
 version_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
 static json_entity_t
+encoding_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
+static json_entity_t
 set_route_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
 static json_entity_t
 test_protocol_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
+static json_entity_t
+watch_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt);
 
 static struct request_handler_entry request_handler_tbl[] = {
+		{ "batch",		ldmsd_batch_handler,		XUG },
 		{ "create",		ldmsd_cfgobj_create_handler,	XUG },
 		{ "delete",		ldmsd_cfgobj_delete_handler,	XUG },
+		{ "encoding",		encoding_handler,		XALL },
 		{ "export",		ldmsd_cfgobj_export_handler,	XUG },
 		{ "query",		ldmsd_cfgobj_query_handler,	XALL },
 		{ "set_route",		set_route_handler,		XALL },
@@ -197,6 +205,7 @@ static struct request_handler_entry request_handler_tbl[] = {
 		{ "test_protocol",	test_protocol_handler,		XUG },
 		{ "update",		ldmsd_cfgobj_update_handler,	XUG },
 		{ "version",		version_handler,		XALL },
+		{ "watch",		watch_handler,			XALL },
 };
 
 int request_handler_entry_cmp(const void *a, const void *b)
@@ -329,21 +338,41 @@ static int ldmsd_reply_result_add(json_entity_t reply, const char *key, json_ent
 int ldmsd_reply_send(ldmsd_req_ctxt_t reqc, json_entity_t reply)
 {
 	jbuf_t jb;
+	ldmsd_req_buf_t buf;
 	int rc;
 
-	if (LDMSD_CFG_XPRT_LDMS == reqc->xprt->type) {
-		jb = json_entity_dump(NULL, reply);
-		if (!jb) {
-			ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
-			return ENOMEM;
+	if ((LDMSD_CFG_XPRT_LDMS == reqc->xprt->type) &&
+			(reqc->enc_flags & LDMSD_REC_MSGPACK_F)) {
+		buf = ldmsd_req_buf_alloc(reqc->xprt->max_msg);
+		if (!buf)
+			goto oom;
+		buf->off = 0;
+		rc = ldmsd_msgpack_encode(buf, reply);
+		if (rc) {
+			ldmsd_req_buf_free(buf);
+			if (ENOMEM == rc)
+				goto oom;
+			return rc;
 		}
+		rc = ldmsd_append_response(reqc, LDMSD_REC_SOM_F |
+					LDMSD_REC_EOM_F | LDMSD_REC_MSGPACK_F,
+					buf->buf, buf->off);
+		ldmsd_req_buf_free(buf);
+	} else if (LDMSD_CFG_XPRT_LDMS == reqc->xprt->type) {
+		jb = json_entity_dump(NULL, reply);
+		if (!jb)
+			goto oom;
 		rc = ldmsd_append_response(reqc,
 					LDMSD_REC_SOM_F | LDMSD_REC_EOM_F,
 					jb->buf, jb->cursor);
+		jbuf_free(jb);
 	} else {
 		rc = reqc->xprt->send_fn((void *)reqc->xprt, (char *)reply, 0);
 	}
 	return rc;
+oom:
+	ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+	return ENOMEM;
 }
 
 int ldmsd_request_send(ldms_t ldms, json_entity_t req_obj,
@@ -744,6 +773,8 @@ ldmsd_req_ctxt_t ldmsd_handle_record(ldmsd_rec_hdr_t rec, ldmsd_cfg_xprt_t xprt)
 		if (!reqc->recv_buf)
 			goto oom;
 	}
+	if (rec->flags & LDMSD_REC_SOM_F)
+		reqc->enc_flags = rec->flags & LDMSD_REC_ENC_MASK;
 	memcpy(&reqc->recv_buf->buf[reqc->recv_buf->off], (char *)(rec + 1), data_len);
 	reqc->recv_buf->off += data_len;
 
@@ -768,6 +799,41 @@ err:
 	return NULL;
 }
 
+/*
+ * Decode the received message into reqc->json according to its encoding.
+ */
+static int __msg_decode(ldmsd_req_ctxt_t reqc)
+{
+	int rc;
+	json_parser_t parser;
+
+	if (reqc->enc_flags & LDMSD_REC_MSGPACK_F) {
+		rc = ldmsd_msgpack_decode(reqc->recv_buf->buf,
+				reqc->recv_buf->off, &reqc->json);
+		if (rc) {
+			ldmsd_log(LDMSD_LERROR, "Failed to decode a MessagePack message\n");
+			ldmsd_error_send(reqc->xprt, reqc->key.msg_no, reqc->send_buf,
+					rc, "Failed to decode a MessagePack message");
+		}
+		return rc;
+	}
+
+	parser = json_parser_new(0);
+	if (!parser) {
+		ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+		return ENOMEM;
+	}
+	rc = json_parse_buffer(parser, reqc->recv_buf->buf,
+			reqc->recv_buf->off, &reqc->json);
+	json_parser_free(parser);
+	if (rc) {
+		ldmsd_log(LDMSD_LCRITICAL, "Failed to parse a JSON object string\n");
+		ldmsd_error_send(reqc->xprt, reqc->key.msg_no, reqc->send_buf,
+				rc, "Failed to parse a JSON object string");
+	}
+	return rc;
+}
+
 json_entity_t __process_msg_requests(ldmsd_req_ctxt_t reqc,
 					struct ldmsd_sec_ctxt *sctxt)
 {
@@ -822,7 +888,6 @@ oom:
 
 int ldmsd_process_msg_request(ldmsd_req_ctxt_t reqc)
 {
-	json_parser_t parser;
 	int rc;
 	json_entity_t reply;
 	struct ldmsd_sec_ctxt sctxt;
@@ -830,21 +895,9 @@ int ldmsd_process_msg_request(ldmsd_req_ctxt_t reqc)
 	ldmsd_req_ctxt_sec_get(reqc, &sctxt);
 
 	if (!reqc->json) {
-		parser = json_parser_new(0);
-		if (!parser) {
-			ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
-			return ENOMEM;
-		}
-
-		rc = json_parse_buffer(parser, reqc->recv_buf->buf,
-				reqc->recv_buf->off, &reqc->json);
-		json_parser_free(parser);
-		if (rc) {
-			ldmsd_log(LDMSD_LCRITICAL, "Failed to parse a JSON object string\n");
-			ldmsd_error_send(reqc->xprt, reqc->key.msg_no, reqc->send_buf,
-					rc, "Failed to parse a JSON object string");
+		rc = __msg_decode(reqc);
+		if (rc)
 			return rc;
-		}
 	}
 
 	reply = __process_msg_requests(reqc, &sctxt);
@@ -867,27 +920,14 @@ int ldmsd_process_msg_request(ldmsd_req_ctxt_t reqc)
 int ldmsd_process_msg_response(ldmsd_req_ctxt_t reqc)
 {
 	int rc;
-	json_parser_t parser;
 	json_entity_t reply;
 	struct ldmsd_sec_ctxt sctxt;
 
 	ldmsd_req_ctxt_sec_get(reqc, &sctxt);
 
-	parser = json_parser_new(0);
-	if (!parser) {
-		ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
-		return ENOMEM;
-	}
-
-	rc = json_parse_buffer(parser, reqc->recv_buf->buf,
-			reqc->recv_buf->off, &reqc->json);
-	json_parser_free(parser);
-	if (rc) {
-		ldmsd_log(LDMSD_LCRITICAL, "Failed to parse a JSON object string\n");
-		ldmsd_error_send(reqc->xprt, reqc->key.msg_no, reqc->send_buf, rc,
-					"Failed to parse a JSON object string");
+	rc = __msg_decode(reqc);
+	if (rc)
 		return rc;
-	}
 
 	if (reqc->resp_handler) {
 		rc = reqc->resp_handler(reqc, reqc->resp_args);
@@ -911,6 +951,53 @@ int ldmsd_process_msg_response(ldmsd_req_ctxt_t reqc)
 	return rc;
 }
 
+static int __stream_deliver_batch(const char *stream_name,
+				  enum ldmsd_stream_type_e stream_type,
+				  char *data, size_t data_len)
+{
+	uint32_t len;
+	int rc = 0;
+	json_entity_t entity;
+	json_parser_t p = NULL;
+
+	if (LDMSD_STREAM_JSON == stream_type) {
+		p = json_parser_new(0);
+		if (!p) {
+			ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+			return ENOMEM;
+		}
+	}
+	while (data_len >= sizeof(len)) {
+		memcpy(&len, data, sizeof(len));
+		len = ntohl(len);
+		data += sizeof(len);
+		data_len -= sizeof(len);
+		if (len > data_len) {
+			ldmsd_log(LDMSD_LERROR, "Truncated event in a batch of "
+					"the stream '%s'.\n", stream_name);
+			rc = EINVAL;
+			break;
+		}
+		entity = NULL;
+		if (p && json_parse_buffer(p, data, len, &entity)) {
+			/* Skip the bad event only */
+			ldmsd_log(LDMSD_LERROR, "Failed to parse a JSON event "
+					"of the stream '%s'.\n", stream_name);
+			rc = EINVAL;
+		} else {
+			ldmsd_stream_deliver(stream_name, stream_type,
+						data, len, entity);
+		}
+		if (entity)
+			json_entity_free(entity);
+		data += len;
+		data_len -= len;
+	}
+	if (p)
+		json_parser_free(p);
+	return rc;
+}
+
 int ldmsd_process_msg_stream(ldmsd_req_ctxt_t reqc)
 {
 	size_t offset = 0;
@@ -924,6 +1011,12 @@ int ldmsd_process_msg_stream(ldmsd_req_ctxt_t reqc)
 	__ldmsd_stream_extract_hdr(reqc->recv_buf->buf, &stream_name,
 					&stream_type, &data, &offset);
 
+	if (stream_type & LDMSD_STREAM_F_BATCH) {
+		return __stream_deliver_batch(stream_name,
+				stream_type & LDMSD_STREAM_TYPE_MASK,
+				data, reqc->recv_buf->off - offset);
+	}
+
 	if (LDMSD_STREAM_JSON == stream_type) {
 		p = json_parser_new(0);
 		if (!p) {
@@ -952,7 +1045,6 @@ out:
 
 int ldmsd_process_msg_notify(ldmsd_req_ctxt_t reqc)
 {
-	json_parser_t parser;
 	int rc;
 	struct ldmsd_sec_ctxt sctxt;
 	json_entity_t jent;
@@ -960,21 +1052,9 @@ int ldmsd_process_msg_notify(ldmsd_req_ctxt_t reqc)
 
 	ldmsd_req_ctxt_sec_get(reqc, &sctxt);
 
-	parser = json_parser_new(0);
-	if (!parser) {
-		ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
-		return ENOMEM;
-	}
-
-	rc = json_parse_buffer( parser, reqc->recv_buf->buf,
-				reqc->recv_buf->off, &reqc->json );
-	json_parser_free(parser);
-	if (rc) {
-		ldmsd_log(LDMSD_LCRITICAL, "Failed to parse a JSON object string\n");
-		ldmsd_error_send(reqc->xprt, reqc->key.msg_no, reqc->send_buf, rc,
-				"Failed to parse a JSON object string");
+	rc = __msg_decode(reqc);
+	if (rc)
 		return rc;
-	}
 
 	jent = json_value_find(reqc->json, "type");
 	if (!jent) {
@@ -1327,16 +1407,150 @@ err:
 	return NULL;
 }
 
+/*
+ * The requests allowed in a batch request
+ */
+static struct request_handler_entry batch_handler_tbl[] = {
+		{ "create",		ldmsd_cfgobj_create_handler,	XUG },
+		{ "delete",		ldmsd_cfgobj_delete_handler,	XUG },
+		{ "update",		ldmsd_cfgobj_update_handler,	XUG },
+};
+
+/*
+ * Process a batch of cfgobj create, update and delete requests
+ * carried by one request message, e.g.
+ *
+ * { "request" : "batch",
+ *   "id"      : <msg_no>,
+ *   "requests": [ { "request": "create", "schema": "prdcr", ... },
+ *                 { "request": "update", "schema": "updtr", ... },
+ *                 ...
+ *               ]
+ * }
+ *
+ * The requests are processed in order by their request handlers. The reply
+ * 'result' is a list of the replies of the requests in the same order, each
+ * of which has its own 'status'. A failed request does not stop the batch,
+ * but running out of memory does: NULL is returned with errno ENOMEM.
+ */
+static json_entity_t
+ldmsd_batch_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
+{
+	int rc;
+	int msg_no = reqc->key.msg_no;
+	json_entity_t batch, reqs, item, req_type, schema;
+	json_entity_t results = NULL, item_reply, reply;
+	struct request_handler_entry *handler;
+	char *type_s;
+	ldmsd_req_buf_t buf;
+
+	buf = ldmsd_req_buf_alloc(1024);
+	if (!buf)
+		goto oom;
+
+	reqs = json_value_find(reqc->json, "requests");
+	if (!reqs || (JSON_LIST_VALUE != json_entity_type(reqs))) {
+		reply = ldmsd_reply_new("batch", msg_no, EINVAL,
+				"The 'requests' attribute is missing or "
+				"not a JSON list.", NULL);
+		if (!reply)
+			goto oom;
+		goto out;
+	}
+
+	results = json_entity_new(JSON_LIST_VALUE);
+	if (!results)
+		goto oom;
+
+	batch = reqc->json;
+	for (item = json_item_first(reqs); item; item = json_item_next(item)) {
+		ldmsd_req_buf_reset(buf);
+		type_s = "error";
+		if (JSON_DICT_VALUE != json_entity_type(item)) {
+			rc = ldmsd_req_buf_append(buf, "A batch item is not "
+							"a JSON dict.");
+			goto item_err;
+		}
+		req_type = json_value_find(item, "request");
+		if (!req_type || (JSON_STRING_VALUE != json_entity_type(req_type))) {
+			rc = ldmsd_req_buf_append(buf, "The 'request' attribute "
+					"is missing or not a JSON string.");
+			goto item_err;
+		}
+		type_s = json_value_str(req_type)->str;
+		handler = bsearch(&type_s, batch_handler_tbl,
+				ARRAY_SIZE(batch_handler_tbl),
+				sizeof(*handler), request_handler_entry_cmp);
+		if (!handler) {
+			rc = ldmsd_req_buf_append(buf, "Request '%s' not supported "
+							"in a batch.", type_s);
+			goto item_err;
+		}
+		schema = json_value_find(item, "schema");
+		if (!schema || (JSON_STRING_VALUE != json_entity_type(schema)) ||
+			(ldmsd_cfgobj_type_str2enum(json_value_str(schema)->str) < 0)) {
+			rc = ldmsd_req_buf_append(buf, "The 'schema' attribute "
+					"is missing or not a cfgobj schema.");
+			goto item_err;
+		}
+
+		/* The request handlers take the request from reqc->json. */
+		reqc->json = item;
+		item_reply = handler->handler(reqc, sctxt);
+		reqc->json = batch;
+		/*
+		 * As in __process_msg_requests(), a handler returns NULL only
+		 * if it is out of memory. The errors of the request are in the
+		 * status of its reply.
+		 */
+		if (!item_reply)
+			goto oom;
+		json_item_add(results, item_reply);
+		continue;
+	item_err:
+		if (rc < 0)
+			goto oom;
+		item_reply = ldmsd_reply_new(type_s, msg_no, EINVAL, buf->buf, NULL);
+		if (!item_reply)
+			goto oom;
+		json_item_add(results, item_reply);
+	}
+
+	reply = ldmsd_reply_new("batch", msg_no, 0, NULL, results);
+	if (!reply)
+		goto oom;
+out:
+	ldmsd_req_buf_free(buf);
+	return reply;
+oom:
+	if (buf)
+		ldmsd_req_buf_free(buf);
+	if (results)
+		json_entity_free(results);
+	errno = ENOMEM;
+	return NULL;
+}
+
+/*
+ * Query cfgobjs of a schema
+ *
+ * The objects are queried either by the names in the 'key' list, or all
+ * objects of the schema in name order. In the latter case, the result can be
+ * paged by 'limit', the maximum number of objects in a reply, and 'cursor',
+ * the name of the last object of the previous page. If there are more
+ * objects, the reply has 'cursor' to be given in the query of the next page.
+ */
 static json_entity_t
 ldmsd_cfgobj_query_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
 {
 	int rc;
 	int msg_no = reqc->key.msg_no;
 	ldmsd_cfgobj_t obj;
-	json_entity_t schema, key, item, reply, result;
+	json_entity_t schema, key, item, reply, result, limit, cursor;
 	char *schema_s, *name_s, *regex_s;
 	schema_s = name_s = regex_s = NULL;
 	enum ldmsd_cfgobj_type type;
+	int64_t count, max_count = 0;
 
 	schema = json_value_find(reqc->json, "schema");
 	if (!schema) {
@@ -1348,13 +1562,42 @@ ldmsd_cfgobj_query_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
 	}
 	schema_s = json_value_str(schema)->str;
 	type = ldmsd_cfgobj_type_str2enum(schema_s);
+	if (type < 0) {
+		reply = ldmsd_reply_new("query", msg_no, ENOTSUP,
+				"'schema' not supported.", NULL);
+		if (!reply)
+			goto oom;
+		return reply;
+	}
 	key = json_value_find(reqc->json, "key");
+	limit = json_value_find(reqc->json, "limit");
+	if (limit) {
+		if (JSON_INT_VALUE != json_entity_type(limit)) {
+			reply = ldmsd_reply_new("query", msg_no, EINVAL,
+					"'limit' is not an integer.", NULL);
+			if (!reply)
+				goto oom;
+			return reply;
+		}
+		max_count = json_value_int(limit);
+	}
+	cursor = json_value_find(reqc->json, "cursor");
+	if (cursor && (JSON_STRING_VALUE != json_entity_type(cursor))) {
+		reply = ldmsd_reply_new("query", msg_no, EINVAL,
+				"'cursor' is not a string.", NULL);
+		if (!reply)
+			goto oom;
+		return reply;
+	}
 
 	reply = ldmsd_reply_new("query", msg_no, 0, NULL, NULL);
 	if (!reply)
 		goto oom;
-	ldmsd_cfg_lock(type);
 	if (key) {
+		/*
+		 * ldmsd_cfgobj_find() takes the cfg lock. The find reference
+		 * keeps the object while it is being queried.
+		 */
 		for (item = json_item_first(key); item; item = json_item_next(item)) {
 			name_s = json_value_str(item)->str;
 			obj = ldmsd_cfgobj_find(name_s, type);
@@ -1362,31 +1605,47 @@ ldmsd_cfgobj_query_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
 				result = ldmsd_result_new(ENOENT, NULL, NULL);
 			} else {
 				result = obj->query(obj);
+				ldmsd_cfgobj_put(obj); /* Put the find reference */
 			}
-			if (!result) {
-				ldmsd_cfg_unlock(type);
+			if (!result)
 				goto oom;
-			}
 			rc = ldmsd_reply_result_add(reply, name_s, result);
-			if (rc) {
-				ldmsd_cfg_unlock(type);
+			if (rc)
 				goto oom;
-			}
 		}
-	} else {
-		for (obj = ldmsd_cfgobj_first(type); obj;
-				obj = ldmsd_cfgobj_next(obj)) {
-			result = obj->query(obj);
-			if (!result) {
-				ldmsd_cfg_unlock(type);
-				goto oom;
-			}
-			rc = ldmsd_reply_result_add(reply, obj->name, result);
-			if (rc) {
+		return reply;
+	}
+
+	ldmsd_cfg_lock(type);
+	if (cursor)
+		obj = ldmsd_cfgobj_first_after(type, json_value_str(cursor)->str);
+	else
+		obj = ldmsd_cfgobj_first(type);
+	for (count = 0; obj; obj = ldmsd_cfgobj_next(obj), count++) {
+		if (max_count > 0 && count == max_count) {
+			/* There are more objects; reply the cursor. */
+			item = json_dict_build(reply, JSON_STRING_VALUE,
+						"cursor", name_s, -1);
+			ldmsd_cfgobj_put(obj);
+			if (!item) {
 				ldmsd_cfg_unlock(type);
 				goto oom;
 			}
+			break;
+		}
+		result = obj->query(obj);
+		if (!result) {
+			ldmsd_cfgobj_put(obj);
+			ldmsd_cfg_unlock(type);
+			goto oom;
 		}
+		rc = ldmsd_reply_result_add(reply, obj->name, result);
+		if (rc) {
+			ldmsd_cfgobj_put(obj);
+			ldmsd_cfg_unlock(type);
+			goto oom;
+		}
+		name_s = obj->name;
 	}
 	ldmsd_cfg_unlock(type);
 	return reply;
@@ -1437,27 +1696,25 @@ ldmsd_cfgobj_export_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
 	if (!reply)
 		goto oom;
 
-	ldmsd_cfg_lock(cfgobj_type);
 	if (key) {
+		/* ldmsd_cfgobj_find() takes the cfg lock. */
 		for (item = json_item_first(key); item; item = json_item_next(item)) {
-			name_s = json_value_str(key)->str;
+			name_s = json_value_str(item)->str;
 			obj = ldmsd_cfgobj_find(name_s, cfgobj_type);
 			if (!obj) {
 				result = ldmsd_result_new(ENOENT, NULL, NULL);
 			} else {
 				result = obj->export(obj);
+				ldmsd_cfgobj_put(obj); /* Put the find reference */
 			}
-			if (!result) {
-				ldmsd_cfg_unlock(cfgobj_type);
+			if (!result)
 				goto oom;
-			}
-			rc = ldmsd_reply_result_add(reply, obj->name, result);
-			if (rc) {
-				ldmsd_cfg_unlock(cfgobj_type);
+			rc = ldmsd_reply_result_add(reply, name_s, result);
+			if (rc)
 				goto oom;
-			}
 		}
 	} else {
+		ldmsd_cfg_lock(cfgobj_type);
 		for (obj = ldmsd_cfgobj_first(cfgobj_type); obj; obj = ldmsd_cfgobj_next(obj)) {
 			result = obj->export(obj);
 			if (!result) {
@@ -1470,8 +1727,8 @@ ldmsd_cfgobj_export_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
 				goto oom;
 			}
 		}
+		ldmsd_cfg_unlock(cfgobj_type);
 	}
-	ldmsd_cfg_unlock(cfgobj_type);
 	ldmsd_req_buf_free(buf);
 	return reply;
 oom:
@@ -1601,6 +1858,130 @@ oom:
 	return NULL;
 }
 
+/*
+ * Report the message encodings understood by this LDMSD
+ *
+ * A client may send the subsequent messages in any reported encoding,
+ * flagging their records accordingly (e.g. LDMSD_REC_MSGPACK_F). The
+ * reply of a message is encoded as the message is.
+ */
+static json_entity_t
+encoding_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
+{
+	int msg_no = reqc->key.msg_no;
+	json_entity_t reply, result = NULL, l, i;
+	const char *encodings[] = { "json", "msgpack" };
+	int k;
+
+	result = json_dict_build(NULL, JSON_LIST_VALUE, "encodings", -2, -1);
+	if (!result)
+		goto oom;
+	l = json_value_find(result, "encodings");
+	for (k = 0; k < ARRAY_SIZE(encodings); k++) {
+		i = json_entity_new(JSON_STRING_VALUE, encodings[k]);
+		if (!i)
+			goto oom;
+		json_item_add(l, i);
+	}
+
+	reply = ldmsd_reply_new("encoding", msg_no, 0, NULL, result);
+	if (!reply)
+		goto oom;
+	return reply;
+
+oom:
+	ldmsd_log(LDMSD_LCRITICAL, "Out of memory\n");
+	errno = ENOMEM;
+	if (result)
+		json_entity_free(result);
+	return NULL;
+}
+
+/* The minimum and the default flush intervals of the watchers */
+#define LDMSD_WATCH_INTERVAL_MIN 100000
+#define LDMSD_WATCH_INTERVAL_DEFAULT 1000000
+
+/*
+ * Subscribe to the status changes of the prdcr, updtr and strgp cfgobjs.
+ *
+ * { "request"  : "watch",
+ *   "id"       : <msg_no>,
+ *   "schema"   : [ "prdcr", "updtr", "strgp" ],
+ *   "interval" : <microseconds>
+ * }
+ *
+ * The changes are sent as NOTIFY messages with the message number of the
+ * request (see ldmsd_watch_add()). An empty "schema" list unsubscribes.
+ */
+static json_entity_t
+watch_handler(ldmsd_req_ctxt_t reqc, struct ldmsd_sec_ctxt *sctxt)
+{
+	int msg_no = reqc->key.msg_no;
+	json_entity_t reply, schema, item, interval;
+	int type, type_mask = 0;
+	long interval_us = LDMSD_WATCH_INTERVAL_DEFAULT;
+	char *s;
+	int rc;
+
+	if (LDMSD_CFG_XPRT_LDMS != reqc->xprt->type) {
+		return ldmsd_reply_new("watch", msg_no, ENOTSUP,
+				"'watch' is supported only on "
+				"network connections.", NULL);
+	}
+
+	schema = json_value_find(reqc->json, "schema");
+	if (!schema || (JSON_LIST_VALUE != json_entity_type(schema))) {
+		return ldmsd_reply_new("watch", msg_no, EINVAL,
+				"watch: 'schema' must be a list.", NULL);
+	}
+	for (item = json_item_first(schema); item; item = json_item_next(item)) {
+		if (JSON_STRING_VALUE != json_entity_type(item))
+			goto bad_schema;
+		s = json_value_str(item)->str;
+		type = ldmsd_cfgobj_type_str2enum(s);
+		switch (type) {
+		case LDMSD_CFGOBJ_PRDCR:
+		case LDMSD_CFGOBJ_UPDTR:
+		case LDMSD_CFGOBJ_STRGP:
+			type_mask |= 1 << type;
+			break;
+		default:
+			goto bad_schema;
+		}
+	}
+
+	interval = json_value_find(reqc->json, "interval");
+	if (interval) {
+		if (JSON_INT_VALUE != json_entity_type(interval)) {
+			return ldmsd_reply_new("watch", msg_no, EINVAL,
+					"watch: 'interval' must be an integer.",
+					NULL);
+		}
+		interval_us = json_value_int(interval);
+		if (interval_us < LDMSD_WATCH_INTERVAL_MIN)
+			interval_us = LDMSD_WATCH_INTERVAL_MIN;
+	}
+
+	rc = ldmsd_watch_add(reqc->xprt, msg_no, reqc->enc_flags,
+						type_mask, interval_us);
+	if (rc) {
+		reply = ldmsd_reply_new("watch", msg_no, rc,
+				"watch: Failed to add the watcher.", NULL);
+	} else {
+		reply = ldmsd_reply_new("watch", msg_no, 0, NULL,
+				json_dict_build(NULL,
+					JSON_INT_VALUE, "interval",
+						(uint64_t)interval_us,
+					-1));
+	}
+	return reply;
+
+bad_schema:
+	return ldmsd_reply_new("watch", msg_no, EINVAL,
+			"watch: The elements of 'schema' must be "
+			"'prdcr', 'updtr' or 'strgp'.", NULL);
+}
+
 struct set_route_ctxt {
 	ldmsd_req_ctxt_t original_reqc;
 	json_entity_t info;
@@ -60,6 +60,8 @@ extern int ldmsd_req_debug;
 
 #define LDMSD_REC_SOM_F	1 /* start of message */
 #define LDMSD_REC_EOM_F	2 /* end of message */
+#define LDMSD_REC_MSGPACK_F 4 /* the message is MessagePack-encoded */
+#define LDMSD_REC_ENC_MASK LDMSD_REC_MSGPACK_F
 
 #define LDMSD_MSG_TYPE_REQ  1
 #define LDMSD_MSG_TYPE_RESP 2
@@ -200,6 +202,12 @@ typedef struct ldmsd_req_ctxt {
 	/* Buffer to aggregate a JSON string received from single or multiple record(s) */
 	ldmsd_req_buf_t recv_buf;
 
+	/*
+	 * The encoding flags (LDMSD_REC_ENC_MASK) of the received message.
+	 * The reply is encoded in the same way.
+	 */
+	int enc_flags;
+
 	/* Buffer to construct a request record to be sent */
 	ldmsd_req_buf_t send_buf;
 
@@ -250,6 +258,24 @@ void ldmsd_req_buf_free(ldmsd_req_buf_t buf);
 __attribute__((format(printf, 2, 3)))
 size_t ldmsd_req_buf_append(ldmsd_req_buf_t buf, const char *fmt, ...);
 
+/**
+ * \brief Append the MessagePack encoding of \c e to \c buf
+ *
+ * \return 0 on success. ENOMEM if \c buf cannot be extended, or EINVAL if
+ *         \c e contains an invalid entity.
+ */
+int ldmsd_msgpack_encode(ldmsd_req_buf_t buf, json_entity_t e);
+/**
+ * \brief Decode a MessagePack-encoded message into a JSON entity
+ *
+ * \param data The encoded message
+ * \param data_len The length of \c data
+ * \param _e The decoded JSON entity is returned here.
+ *
+ * \return 0 on success. EINVAL if \c data is not a valid message.
+ */
+int ldmsd_msgpack_decode(const char *data, size_t data_len, json_entity_t *_e);
+
 /**
  * \brief Advise the peer our configuration record length
  *
@@ -113,7 +113,9 @@ int ldmsd_append_msg_buffer(void *xprt, size_t max_msg, struct ldmsd_msg_key *ke
 			 * exhausted data_len, set the EOM_F bit.
 			 * If we've exhausted the reply buffer, unset the EOM_F bit.
 			 */
-			flags = msg_flags & ((!remaining && data_len)?(~LDMSD_REC_EOM_F):LDMSD_REC_EOM_F);
+			flags = msg_flags & LDMSD_REC_ENC_MASK;
+			if (!data_len)
+				flags |= msg_flags & LDMSD_REC_EOM_F;
 			flags |= (buf->num_rec == 0?LDMSD_REC_SOM_F:0);
 			/* Record is full, send it on it's way */
 			req_buff->type = msg_type;
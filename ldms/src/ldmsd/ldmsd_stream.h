@@ -21,6 +21,15 @@ typedef enum ldmsd_stream_type_e {
 	LDMSD_STREAM_JSON
 } ldmsd_stream_type_t;
 
+/*
+ * A stream message with LDMSD_STREAM_F_BATCH in its stream type carries many
+ * events of the type (stream type & LDMSD_STREAM_TYPE_MASK). Each event is
+ * prefixed with its length, a uint32_t in network byte order. LDMSD delivers
+ * the events to the subscribers one by one.
+ */
+#define LDMSD_STREAM_F_BATCH	0x100
+#define LDMSD_STREAM_TYPE_MASK	0xff
+
 enum ldmsd_stream_type_e ldmsd_stream_type_str2enum(const char *type);
 const char *ldmsd_stream_type_enum2str(enum ldmsd_stream_type_e type);
 /*
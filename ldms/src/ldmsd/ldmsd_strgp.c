@@ -60,6 +60,7 @@
 #include "ldmsd.h"
 #include "ldmsd_plugin.h"
 #include "ldmsd_request.h"
+#include "ldmsd_notify.h"
 #include "ldmsd_store.h"
 #include "ldms_xprt.h"
 #include "config.h"
@@ -106,11 +107,30 @@ void ldmsd_strgp___del(ldmsd_cfgobj_t obj)
 	ldmsd_cfgobj___del(obj);
 }
 
+/* Caller must hold the strgp lock. */
+static void __strgp_state_set(ldmsd_strgp_t strgp, enum ldmsd_strgp_state state)
+{
+	strgp->state = state;
+	ldmsd_watch_post_str(LDMSD_CFGOBJ_STRGP, strgp->obj.name, "state",
+					ldmsd_strgp_state_str(state));
+}
+
 static void strgp_update_fn(ldmsd_strgp_t strgp, ldmsd_prdcr_set_t prd_set)
 {
+	int rc;
+	uint64_t cnt;
+
 	if (strgp->state != LDMSD_STRGP_STATE_OPENED)
 		return;
-	ldmsd_store_store(strgp->inst, prd_set->set, strgp);
+	rc = ldmsd_store_store(strgp->inst, prd_set->set, strgp);
+	if (!rc)
+		return;
+	cnt = __sync_add_and_fetch(&strgp->store_errors, 1);
+	strgp->last_store_error = rc;
+	ldmsd_watch_post_int(LDMSD_CFGOBJ_STRGP, strgp->obj.name,
+				"store_errors", cnt);
+	ldmsd_watch_post_int(LDMSD_CFGOBJ_STRGP, strgp->obj.name,
+				"last_store_error", rc);
 }
 
 int store_actor(ev_worker_t src, ev_worker_t dst, ev_status_t status, ev_t ev)
@@ -311,7 +331,7 @@ int ldmsd_strgp_update_prdcr_set(ldmsd_strgp_t strgp, ldmsd_prdcr_set_t prd_set)
 		if (rc)
 			break;
 		/* open success */
-		strgp->state = LDMSD_STRGP_STATE_OPENED;
+		__strgp_state_set(strgp, LDMSD_STRGP_STATE_OPENED);
 		/* let through */
 	case LDMSD_STRGP_STATE_OPENED:
 		rc = EEXIST;
@@ -365,7 +385,7 @@ void ldmsd_strgp_close()
 		ldmsd_strgp_lock(strgp);
 		if (strgp->state == LDMSD_STRGP_STATE_OPENED)
 			strgp_close(strgp);
-		strgp->state = LDMSD_STRGP_STATE_STOPPED;
+		__strgp_state_set(strgp, LDMSD_STRGP_STATE_STOPPED);
 		ldmsd_strgp_unlock(strgp);
 		/*
 		 * ref_count shouldn't reach zero
@@ -381,7 +401,7 @@ int ldmsd_strgp_enable(ldmsd_cfgobj_t obj)
 	ldmsd_strgp_t strgp = (ldmsd_strgp_t)obj;
 	if (strgp->state != LDMSD_STRGP_STATE_STOPPED)
 		return EBUSY;
-	strgp->state = LDMSD_STRGP_STATE_RUNNING;
+	__strgp_state_set(strgp, LDMSD_STRGP_STATE_RUNNING);
 	strgp->obj.perm |= LDMSD_PERM_DSTART; /* TODO: remove this? */
 	/* Update all the producers of our changed state */
 	ldmsd_prdcr_strgp_update(strgp);
@@ -395,7 +415,7 @@ int ldmsd_strgp_disable(ldmsd_cfgobj_t obj)
 		return EBUSY;
 	if (strgp->state == LDMSD_STRGP_STATE_OPENED)
 		strgp_close(strgp);
-	strgp->state = LDMSD_STRGP_STATE_STOPPED;
+	__strgp_state_set(strgp, LDMSD_STRGP_STATE_STOPPED);
 	strgp->obj.perm &= ~LDMSD_PERM_DSTART; /* TODO remove this? */
 	ldmsd_prdcr_strgp_update(strgp);
 	return 0;
@@ -700,6 +720,9 @@ json_entity_t ldmsd_strgp_query(ldmsd_cfgobj_t obj)
 		return NULL;
 	query = json_dict_build(query,
 			JSON_STRING_VALUE, "state", ldmsd_strgp_state_str(strgp->state),
+			JSON_INT_VALUE, "store_errors", strgp->store_errors,
+			JSON_INT_VALUE, "last_store_error",
+				(uint64_t)strgp->last_store_error,
 			-1);
 	if (!query)
 		return NULL;
@@ -875,6 +898,7 @@ __strgp_new(const char *name, ldmsd_plugin_inst_t inst, char *schema,
 	EV_DATA(strgp->stop_ev, struct start_data)->entity = strgp;
 
 	ldmsd_strgp_unlock(strgp);
+	ldmsd_watch_post_new(&strgp->obj);
 	return strgp;
 err2:
 	if (start_ev)
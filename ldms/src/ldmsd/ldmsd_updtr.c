@@ -58,6 +58,7 @@
 #include "ldms.h"
 #include "ldmsd.h"
 #include "ldmsd_request.h"
+#include "ldmsd_notify.h"
 #include "ldms_xprt.h"
 #include "config.h"
 
@@ -603,6 +604,22 @@ static int __prdcr_set_lookup(ldmsd_prdcr_set_t prd_set)
 	return rc;
 }
 
+/* Caller must hold the updtr lock. */
+static void __updtr_state_set(ldmsd_updtr_t updtr, enum ldmsd_updtr_state state)
+{
+	updtr->state = state;
+	ldmsd_watch_post_str(LDMSD_CFGOBJ_UPDTR, updtr->obj.name, "state",
+					ldmsd_updtr_state_str(state));
+}
+
+/* Caller must hold the updtr lock. */
+static void __updtr_sched_miss(ldmsd_updtr_t updtr)
+{
+	updtr->sched_miss++;
+	ldmsd_watch_post_int(LDMSD_CFGOBJ_UPDTR, updtr->obj.name,
+				"sched_miss", updtr->sched_miss);
+}
+
 static void __update_prdcr_set(ldmsd_updtr_t updtr, ldmsd_prdcr_set_t prd_set)
 {
 	struct timespec to;
@@ -620,6 +637,7 @@ static void __update_prdcr_set(ldmsd_updtr_t updtr, ldmsd_prdcr_set_t prd_set)
 		ldmsd_log(LDMSD_LDEBUG,
 			  "%s: there is an outstanding lookup %s\n",
 			  __func__, prd_set->inst_name);
+		__updtr_sched_miss(updtr);
 		break;
 	case LDMSD_PRDCR_SET_STATE_READY:
 		prd_set->state = LDMSD_PRDCR_SET_STATE_UPDATING;
@@ -641,6 +659,7 @@ static void __update_prdcr_set(ldmsd_updtr_t updtr, ldmsd_prdcr_set_t prd_set)
 		ldmsd_log(LDMSD_LDEBUG,
 			  "%s: there is an outstanding update %s\n",
 			  __func__, prd_set->inst_name);
+		__updtr_sched_miss(updtr);
 		break;
 	case LDMSD_PRDCR_SET_STATE_ERROR:
 		/* do not reschedule */
@@ -731,6 +750,7 @@ int ldmsd_updtr_del(const char *updtr_name, ldmsd_sec_ctxt_t ctxt)
 	}
 
 	rbt_del(cfgobj_trees[LDMSD_CFGOBJ_UPDTR], &updtr->obj.rbn);
+	ldmsd_watch_post_del(LDMSD_CFGOBJ_UPDTR, updtr->obj.name);
 	ldmsd_updtr_put(updtr); /* tree reference */
 	rc = 0;
 	/* let-through */
@@ -753,7 +773,7 @@ int __ldmsd_updtr_start(ldmsd_updtr_t updtr, ldmsd_sec_ctxt_t ctxt)
 		return rc;
 	if (updtr->state != LDMSD_UPDTR_STATE_STOPPED)
 		return EBUSY;
-	updtr->state = LDMSD_UPDTR_STATE_RUNNING;
+	__updtr_state_set(updtr, LDMSD_UPDTR_STATE_RUNNING);
 	updtr->obj.perm |= LDMSD_PERM_DSTART;
 
 	/*
@@ -893,7 +913,7 @@ static int ldmsd_updtr_enable(ldmsd_cfgobj_t obj)
 	ldmsd_updtr_t updtr = (ldmsd_updtr_t)obj;
 	if (updtr->state != LDMSD_UPDTR_STATE_STOPPED)
 		return EBUSY;
-	updtr->state = LDMSD_UPDTR_STATE_RUNNING;
+	__updtr_state_set(updtr, LDMSD_UPDTR_STATE_RUNNING);
 	updtr->obj.perm |= LDMSD_PERM_DSTART; /* TODO: remove this? */
 
 	/*
@@ -917,7 +937,7 @@ static int ldmsd_updtr_disable(ldmsd_cfgobj_t obj)
 		goto out_1;
 
 	}
-	updtr->state = LDMSD_UPDTR_STATE_STOPPING;
+	__updtr_state_set(updtr, LDMSD_UPDTR_STATE_STOPPING);
 	updtr->obj.perm &= ~LDMSD_PERM_DSTART; /* TODO: remove this? */
 	if (updtr->push_flags)
 		cancel_push(updtr);
@@ -928,7 +948,7 @@ static int ldmsd_updtr_disable(ldmsd_cfgobj_t obj)
 
 	ldmsd_updtr_lock(updtr);
 	/* tasks stopped */
-	updtr->state = LDMSD_UPDTR_STATE_STOPPED;
+	__updtr_state_set(updtr, LDMSD_UPDTR_STATE_STOPPED);
 	/* let-through */
 
 	ev_post(updater, producer, updtr->stop_ev, NULL);
@@ -1371,6 +1391,7 @@ json_entity_t ldmsd_updtr_query(ldmsd_cfgobj_t obj)
 	query = json_dict_build(query,
 			JSON_INT_VALUE, "offset_skew_value", updtr->sched.offset_skew,
 			JSON_STRING_VALUE, "state", ldmsd_updtr_state_str(updtr->state),
+			JSON_INT_VALUE, "sched_miss", updtr->sched_miss,
 			-1);
 	if (!query)
 		goto oom;
@@ -1546,6 +1567,7 @@ __updtr_new(const char *name, long interval_us, long offset_us,
 	rbt_init(&updtr->prdcr_tree, prdcr_ref_cmp);
 
 	ldmsd_cfgobj_unlock(&updtr->obj);
+	ldmsd_watch_post_new(&updtr->obj);
 	return updtr;
 
 oom:
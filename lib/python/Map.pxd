@@ -7,12 +7,19 @@ cdef extern from "coll/map.h":
         pass
     ctypedef map_s *map_t
 
+    cdef struct map_load_stats:
+        size_t added
+        size_t duplicates
+        size_t rejected
+
     char **map_list_get(const char *path)
     void map_list_free(char *map_list[])
     int map_container_new(const char *path)
     int map_new(const char *path, const char *name)
     int map_close(map_t map_s)
     map_t map_open(char *path, char *map_name)
+    map_t map_open_cached(char *path, char *map_name)
+    int map_cache_reload(map_t map_s)
     int map_entry_new(map_t map_s, char *obj_cols)
     uint64_t map_transform(map_t map_s, uint64_t match_val, uint64_t *result)
     uint64_t map_inverse(map_t map_s, uint64_t match_val, uint64_t *result)
@@ -24,3 +31,11 @@ cdef extern from "coll/map.h":
     int map_transform_le(map_t map, uint64_t src, uint64_t *dst)
     int map_inverse_ge(map_t map, uint64_t dst, uint64_t *src)
     int map_inverse_le(map_t map, uint64_t dst, uint64_t *src)
+    int map_transform_many(map_t map, const uint64_t *src, uint64_t *dst,
+                           uint8_t *found, size_t n) nogil
+    int map_inverse_many(map_t map, const uint64_t *dst, uint64_t *src,
+                         uint8_t *found, size_t n) nogil
+    int map_entries_load(map_t map, const uint64_t *src, const uint64_t *tgt,
+                         size_t n, map_load_stats *stats) nogil
+    int map_entries_load_csv(map_t map, const char *path,
+                             map_load_stats *stats) nogil
@@ -3,23 +3,44 @@ import cython
 from cpython cimport PyObject, Py_INCREF
 import struct
 import datetime as dt
+import time
+from array import array
 cimport Map
 
+def _numpy_of(values):
+    """The numpy module if `values` is a NumPy array, or None"""
+    if type(values).__module__ != "numpy":
+        return None
+    import numpy
+    return numpy
+
 cdef class lMap:
     cdef map_t map_s
     cdef char *path
     cdef char *name
 
-    def __init__(self, path, name):
+    # With cache=True the map entries are loaded into memory and the lookups
+    # are answered from memory; new_entry() writes through to the container.
+    # Call reload() to see entries added by other processes.
+    def __init__(self, path, name, cache=False):
         self.map_s = NULL
         self.path = path
         self.name = name
         #self.open(path, name)
         try:
-            self.map_s = map_open(self.path, self.name)
+            if cache:
+                self.map_s = map_open_cached(self.path, self.name)
+            else:
+                self.map_s = map_open(self.path, self.name)
         except:
             raise ValueError("Map does not exist at path {0}".format(self.path))
 
+    # Reload the entries of a cached map from the container
+    def reload(self):
+        cdef int rc = map_cache_reload(self.map_s)
+        if rc:
+            raise RuntimeError("map_cache_reload() error, rc: {0}".format(rc))
+
     # Return target value given source value
     def transform(self, match_val):
         cdef uint64_t result
@@ -92,12 +113,108 @@ cdef class lMap:
             raise RuntimeError("map_inverse_le() error, rc: {0}".format(rc))
         return ret
 
+    cdef _xform_many(self, values, int inverse):
+        cdef const uint64_t[:] src
+        cdef uint64_t[:] dst
+        cdef uint8_t[:] found
+        cdef Py_ssize_t n
+        cdef int rc = 0
+        np = _numpy_of(values)
+        if np is not None:
+            values = np.ascontiguousarray(values, dtype=np.uint64)
+            result = np.empty(len(values), dtype=np.uint64)
+            mask = np.empty(len(values), dtype=np.uint8)
+        else:
+            if not isinstance(values, array) or values.typecode != 'Q':
+                values = array('Q', values)
+            result = array('Q', [0]) * len(values)
+            mask = array('B', [0]) * len(values)
+        src = values
+        dst = result
+        found = mask
+        n = src.shape[0]
+        if n:
+            with nogil:
+                if inverse:
+                    rc = map_inverse_many(self.map_s, &src[0], &dst[0],
+                                          &found[0], n)
+                else:
+                    rc = map_transform_many(self.map_s, &src[0], &dst[0],
+                                            &found[0], n)
+        if rc:
+            raise RuntimeError("map_{0}_many() error, rc: {1}" \
+                    .format("inverse" if inverse else "transform", rc))
+        if np is not None:
+            mask = mask.view(np.bool_)
+        return result, mask
+
+    # Return (targets, found) given a sequence of source values. `targets`
+    # and the `found` mask are NumPy arrays if `values` is a NumPy array, or
+    # array('Q') and array('B') otherwise. A value without an entry has
+    # found[i] False and targets[i] 0.
+    def transform_many(self, values):
+        return self._xform_many(values, 0)
+
+    # Return (sources, found) given a sequence of target values
+    def inverse_many(self, values):
+        return self._xform_many(values, 1)
+
     def new_entry(self, obj_cols):
         rc = map_entry_new(self.map_s, obj_cols)
         if rc != 0:
             raise ValueError("New object failed to be added to map with error {0}".format(rc))
         return rc
 
+    # Add many entries at once, either from a CSV file of "source,target"
+    # lines (load(path)) or from two sequences of ints (load(sources,
+    # targets)). Zero values and sources already mapped to another target
+    # are rejected, duplicate entries are skipped, and the container is
+    # committed once. Return the counts and the throughput of the load.
+    def load(self, source, target=None):
+        cdef const uint64_t[:] src
+        cdef const uint64_t[:] tgt
+        cdef map_load_stats stats
+        cdef const char *path
+        cdef size_t n
+        cdef int rc
+        t0 = time.time()
+        if target is None:
+            if isinstance(source, str):
+                source = source.encode()
+            path = source
+            with nogil:
+                rc = map_entries_load_csv(self.map_s, path, &stats)
+        else:
+            if len(source) != len(target):
+                raise ValueError("source and target lengths differ")
+            np = _numpy_of(source) or _numpy_of(target)
+            if np is not None:
+                source = np.ascontiguousarray(source, dtype=np.uint64)
+                target = np.ascontiguousarray(target, dtype=np.uint64)
+            else:
+                if not isinstance(source, array) or source.typecode != 'Q':
+                    source = array('Q', source)
+                if not isinstance(target, array) or target.typecode != 'Q':
+                    target = array('Q', target)
+            n = len(source)
+            if n == 0:
+                source = target = array('Q', [0])
+            src = source
+            tgt = target
+            with nogil:
+                rc = map_entries_load(self.map_s, &src[0], &tgt[0], n,
+                                      &stats)
+        elapsed = time.time() - t0
+        if rc:
+            raise RuntimeError("map entries load error, rc: {0}, {1} "
+                               "entries added".format(rc, stats.added))
+        total = stats.added + stats.duplicates + stats.rejected
+        return { "added" : stats.added,
+                 "duplicates" : stats.duplicates,
+                 "rejected" : stats.rejected,
+                 "seconds" : elapsed,
+                 "entries_per_sec" : total / elapsed if elapsed else 0.0 }
+
     def close(self):
         rc = map_close(self.map_s)
         return rc
@@ -9,6 +9,7 @@
 #include <errno.h>
 #include <assert.h>
 #include <getopt.h>
+#include <ctype.h>
 #include "map.h"
 #include "map_priv.h"
 
@@ -143,6 +144,223 @@ err0:
 	return rc;
 }
 
+static int __pair_cmp(const void *_a, const void *_b)
+{
+	const struct map_pair *a = _a, *b = _b;
+	if (a->key < b->key)
+		return -1;
+	if (a->key > b->key)
+		return 1;
+	return 0;
+}
+
+/* The index of the first pair with key >= \c key */
+static size_t __pair_lower(struct map_pair *p, size_t n, uint64_t key)
+{
+	size_t lo = 0, hi = n, mid;
+	while (lo < hi) {
+		mid = lo + (hi - lo) / 2;
+		if (p[mid].key < key)
+			lo = mid + 1;
+		else
+			hi = mid;
+	}
+	return lo;
+}
+
+/* The index of the first pair with key > \c key */
+static size_t __pair_upper(struct map_pair *p, size_t n, uint64_t key)
+{
+	size_t lo = 0, hi = n, mid;
+	while (lo < hi) {
+		mid = lo + (hi - lo) / 2;
+		if (p[mid].key <= key)
+			lo = mid + 1;
+		else
+			hi = mid;
+	}
+	return lo;
+}
+
+static int __cache_reserve(struct map_cache *c, size_t count)
+{
+	struct map_pair *p;
+	size_t alloc;
+
+	if (count <= c->alloc)
+		return 0;
+	alloc = c->alloc?c->alloc:1024;
+	while (alloc < count)
+		alloc *= 2;
+	p = realloc(c->fwd, alloc * sizeof(*p));
+	if (!p)
+		return ENOMEM;
+	c->fwd = p;
+	p = realloc(c->inv, alloc * sizeof(*p));
+	if (!p)
+		return ENOMEM;
+	c->inv = p;
+	c->alloc = alloc;
+	return 0;
+}
+
+static void __cache_free(struct map_cache *c)
+{
+	pthread_rwlock_destroy(&c->lock);
+	free(c->fwd);
+	free(c->inv);
+	free(c);
+}
+
+/* Load the entries of the map into the arrays of \c c (unlocked) */
+static int __cache_load(map_t map_s, struct map_cache *c)
+{
+	sos_iter_t iter;
+	sos_obj_t obj;
+	sos_value_data_t data;
+	size_t i;
+	int rc;
+
+	iter = sos_attr_iter_new(map_s->src_attr);
+	if (!iter)
+		return errno?errno:ENOMEM;
+	c->count = 0;
+	for (rc = sos_iter_begin(iter); !rc; rc = sos_iter_next(iter)) {
+		obj = sos_iter_obj(iter);
+		if (!obj) {
+			rc = errno?errno:ENOENT;
+			goto out;
+		}
+		rc = __cache_reserve(c, c->count + 1);
+		if (rc) {
+			sos_obj_put(obj);
+			goto out;
+		}
+		data = sos_obj_attr_data(obj, map_s->src_attr, NULL);
+		c->fwd[c->count].key = data->prim.uint64_;
+		data = sos_obj_attr_data(obj, map_s->tgt_attr, NULL);
+		c->fwd[c->count].val = data->prim.uint64_;
+		sos_obj_put(obj);
+		c->count++;
+	}
+	for (i = 0; i < c->count; i++) {
+		c->inv[i].key = c->fwd[i].val;
+		c->inv[i].val = c->fwd[i].key;
+	}
+	qsort(c->fwd, c->count, sizeof(*c->fwd), __pair_cmp);
+	qsort(c->inv, c->count, sizeof(*c->inv), __pair_cmp);
+	rc = 0;
+ out:
+	sos_iter_free(iter);
+	return rc;
+}
+
+static int __cache_insert(struct map_cache *c, uint64_t src, uint64_t tgt)
+{
+	size_t i;
+	int rc;
+
+	pthread_rwlock_wrlock(&c->lock);
+	rc = __cache_reserve(c, c->count + 1);
+	if (rc)
+		goto out;
+	i = __pair_upper(c->fwd, c->count, src);
+	memmove(&c->fwd[i+1], &c->fwd[i], (c->count - i) * sizeof(*c->fwd));
+	c->fwd[i].key = src;
+	c->fwd[i].val = tgt;
+	i = __pair_upper(c->inv, c->count, tgt);
+	memmove(&c->inv[i+1], &c->inv[i], (c->count - i) * sizeof(*c->inv));
+	c->inv[i].key = tgt;
+	c->inv[i].val = src;
+	c->count++;
+ out:
+	pthread_rwlock_unlock(&c->lock);
+	return rc;
+}
+
+enum __cache_op {
+	CACHE_EQ,
+	CACHE_GE,
+	CACHE_LE,
+};
+
+static size_t __cache_lookup(struct map_pair *p, size_t n,
+			     enum __cache_op op, uint64_t key)
+{
+	size_t i;
+
+	switch (op) {
+	case CACHE_EQ:
+		i = __pair_lower(p, n, key);
+		if (i < n && p[i].key != key)
+			i = n;
+		break;
+	case CACHE_GE:
+		i = __pair_lower(p, n, key);
+		break;
+	case CACHE_LE:
+		i = __pair_upper(p, n, key);
+		i = i?i-1:n;
+		break;
+	default:
+		i = n;
+	}
+	return i;
+}
+
+static int __cache_find(struct map_cache *c, int inverse, enum __cache_op op,
+			uint64_t key, uint64_t *val)
+{
+	struct map_pair *p;
+	size_t i;
+	int rc = ENOENT;
+
+	pthread_rwlock_rdlock(&c->lock);
+	p = inverse?c->inv:c->fwd;
+	i = __cache_lookup(p, c->count, op, key);
+	if (i < c->count) {
+		*val = p[i].val;
+		rc = 0;
+	}
+	pthread_rwlock_unlock(&c->lock);
+	return rc;
+}
+
+static int __cache_find_many(struct map_cache *c, int inverse,
+			     const uint64_t *in, uint64_t *out,
+			     uint8_t *found, size_t n)
+{
+	struct map_pair *p;
+	size_t i, j;
+
+	pthread_rwlock_rdlock(&c->lock);
+	p = inverse?c->inv:c->fwd;
+	for (j = 0; j < n; j++) {
+		i = __cache_lookup(p, c->count, CACHE_EQ, in[j]);
+		found[j] = (i < c->count);
+		out[j] = found[j]?p[i].val:0;
+	}
+	pthread_rwlock_unlock(&c->lock);
+	return 0;
+}
+
+/* The min/max key of the source (or target if \c inverse) values */
+static int __cache_end(struct map_cache *c, int inverse, int is_max,
+		       uint64_t *ret)
+{
+	struct map_pair *p;
+	int rc = ENOENT;
+
+	pthread_rwlock_rdlock(&c->lock);
+	p = inverse?c->inv:c->fwd;
+	if (c->count) {
+		*ret = is_max?p[c->count-1].key:p[0].key;
+		rc = 0;
+	}
+	pthread_rwlock_unlock(&c->lock);
+	return rc;
+}
+
 map_t map_open(char *path, char *map_name)
 {
 	map_t map_s;
@@ -177,8 +395,71 @@ err0:
 	return NULL;
 }
 
+map_t map_open_cached(char *path, char *map_name)
+{
+	struct map_cache *c;
+	map_t map_s;
+	int rc;
+
+	map_s = map_open(path, map_name);
+	if (!map_s)
+		goto err0;
+	c = calloc(1, sizeof(*c));
+	if (!c)
+		goto err1;
+	pthread_rwlock_init(&c->lock, NULL);
+	rc = __cache_load(map_s, c);
+	if (rc) {
+		errno = rc;
+		goto err2;
+	}
+	map_s->cache = c;
+	return map_s;
+err2:
+	__cache_free(c);
+err1:
+	map_close(map_s);
+err0:
+	return NULL;
+}
+
+int map_cache_reload(map_t map_s)
+{
+	struct map_cache *c = map_s->cache;
+	struct map_cache fresh = { .count = 0 };
+	struct map_pair *fwd, *inv;
+	size_t count, alloc;
+	int rc;
+
+	if (!c)
+		return EINVAL;
+	rc = __cache_load(map_s, &fresh);
+	if (rc)
+		goto out;
+	pthread_rwlock_wrlock(&c->lock);
+	fwd = c->fwd;
+	inv = c->inv;
+	count = c->count;
+	alloc = c->alloc;
+	c->fwd = fresh.fwd;
+	c->inv = fresh.inv;
+	c->count = fresh.count;
+	c->alloc = fresh.alloc;
+	fresh.fwd = fwd;
+	fresh.inv = inv;
+	fresh.count = count;
+	fresh.alloc = alloc;
+	pthread_rwlock_unlock(&c->lock);
+ out:
+	free(fresh.fwd);
+	free(fresh.inv);
+	return rc;
+}
+
 int map_close(map_t map_s)
 {
+	if (map_s->cache)
+		__cache_free(map_s->cache);
 	sos_container_close(map_s->sos, SOS_COMMIT_ASYNC);
 	free(map_s);
 	return 0;
@@ -221,6 +502,8 @@ int map_entry_new(map_t map_s, char *obj_cols)
 	i_data->prim.uint64_ = y;
 	sos_obj_index(obj);
 	sos_obj_put(obj);
+	if (map_s->cache)
+		return __cache_insert(map_s->cache, x, y);
 	return 0;
 err1:
 	sos_obj_put(obj);
@@ -236,6 +519,9 @@ int map_transform(map_t map_s, uint64_t match_val, uint64_t *transformed_val)
 	sos_obj_t match_obj;
 	SOS_KEY(trans_key);
 
+	if (map_s->cache)
+		return __cache_find(map_s->cache, 0, CACHE_EQ, match_val,
+				    transformed_val);
 	if (!sos_key_for_attr(trans_key, map_s->src_attr, match_val))
 		return errno;
 	rc = sos_iter_find(map_s->src_iter, trans_key);
@@ -255,6 +541,9 @@ int map_inverse(map_t map_s, uint64_t match_val, uint64_t *inversed_val)
 	sos_obj_t match_obj;
 	SOS_KEY(inv_key);
 
+	if (map_s->cache)
+		return __cache_find(map_s->cache, 1, CACHE_EQ, match_val,
+				    inversed_val);
 	if (!sos_key_for_attr(inv_key, map_s->tgt_attr, match_val))
 		return errno;
 	rc = sos_iter_find(map_s->tgt_iter, inv_key);
@@ -286,21 +575,29 @@ int __attr_find(uint64_t *ret, sos_attr_t attr, sos_obj_t (*find)(sos_index_t))
 
 int map_transform_min(map_t map, uint64_t *ret)
 {
+	if (map->cache)
+		return __cache_end(map->cache, 1, 0, ret);
 	return __attr_find(ret, map->tgt_attr, sos_index_find_min);
 }
 
 int map_transform_max(map_t map, uint64_t *ret)
 {
+	if (map->cache)
+		return __cache_end(map->cache, 1, 1, ret);
 	return __attr_find(ret, map->tgt_attr, sos_index_find_max);
 }
 
 int map_inverse_min(map_t map, uint64_t *ret)
 {
+	if (map->cache)
+		return __cache_end(map->cache, 0, 0, ret);
 	return __attr_find(ret, map->src_attr, sos_index_find_min);
 }
 
 int map_inverse_max(map_t map, uint64_t *ret)
 {
+	if (map->cache)
+		return __cache_end(map->cache, 0, 1, ret);
 	return __attr_find(ret, map->src_attr, sos_index_find_max);
 }
 
@@ -326,20 +623,356 @@ int __xform(sos_attr_t from_attr, uint64_t input,
 
 int map_transform_ge(map_t map, uint64_t src, uint64_t *dst)
 {
+	if (map->cache)
+		return __cache_find(map->cache, 0, CACHE_GE, src, dst);
 	return __xform(map->src_attr, src, map->tgt_attr, dst, 1);
 }
 
 int map_transform_le(map_t map, uint64_t src, uint64_t *dst)
 {
+	if (map->cache)
+		return __cache_find(map->cache, 0, CACHE_LE, src, dst);
 	return __xform(map->src_attr, src, map->tgt_attr, dst, 0);
 }
 
 int map_inverse_ge(map_t map, uint64_t dst, uint64_t *src)
 {
+	if (map->cache)
+		return __cache_find(map->cache, 1, CACHE_GE, dst, src);
 	return __xform(map->tgt_attr, dst, map->src_attr, src, 1);
 }
 
 int map_inverse_le(map_t map, uint64_t dst, uint64_t *src)
 {
+	if (map->cache)
+		return __cache_find(map->cache, 1, CACHE_LE, dst, src);
 	return __xform(map->tgt_attr, dst, map->src_attr, src, 0);
 }
+
+struct __xform_ent {
+	uint64_t val;
+	size_t idx;
+};
+
+static int __xform_ent_cmp(const void *_a, const void *_b)
+{
+	const struct __xform_ent *a = _a, *b = _b;
+	if (a->val < b->val)
+		return -1;
+	if (a->val > b->val)
+		return 1;
+	return 0;
+}
+
+static
+int __iter_entry(sos_iter_t iter, sos_attr_t from_attr, uint64_t *from,
+		 sos_attr_t to_attr, uint64_t *to)
+{
+	sos_value_data_t data;
+	sos_obj_t obj = sos_iter_obj(iter);
+	if (!obj)
+		return errno?errno:ENOENT;
+	data = sos_obj_attr_data(obj, from_attr, NULL);
+	*from = data->prim.uint64_;
+	data = sos_obj_attr_data(obj, to_attr, NULL);
+	*to = data->prim.uint64_;
+	sos_obj_put(obj);
+	return 0;
+}
+
+/* Index entries stepped over before seeking the next input value */
+#define MAP_MERGE_STEPS 4
+
+/*
+ * The input values are sorted and merged against the index of from_attr:
+ * each distinct value is looked up once, and the iterator steps forward
+ * to the next value when it is near (dense input) rather than seeking.
+ * A private iterator is used so that callers need not hold any lock
+ * shared with map_transform()/map_inverse().
+ */
+static
+int __xform_many(sos_attr_t from_attr, sos_attr_t to_attr,
+		 const uint64_t *in, uint64_t *out, uint8_t *found, size_t n)
+{
+	struct __xform_ent *ent;
+	sos_iter_t iter;
+	uint64_t v, key_val = 0, to_val = 0;
+	size_t i, j, k;
+	int rc, steps, hit, valid = 0;
+	SOS_KEY(key);
+
+	if (!n)
+		return 0;
+	ent = malloc(n * sizeof(*ent));
+	if (!ent)
+		return ENOMEM;
+	iter = sos_attr_iter_new(from_attr);
+	if (!iter) {
+		rc = errno?errno:ENOMEM;
+		goto out;
+	}
+	for (i = 0; i < n; i++) {
+		ent[i].val = in[i];
+		ent[i].idx = i;
+	}
+	qsort(ent, n, sizeof(*ent), __xform_ent_cmp);
+	for (i = 0; i < n; i = j) {
+		v = ent[i].val;
+		for (j = i + 1; j < n && ent[j].val == v; j++)
+			;
+		steps = 0;
+		while (valid && key_val < v && steps < MAP_MERGE_STEPS) {
+			if (sos_iter_next(iter)) {
+				valid = 0;
+				break;
+			}
+			rc = __iter_entry(iter, from_attr, &key_val,
+					  to_attr, &to_val);
+			if (rc)
+				goto out;
+			steps++;
+		}
+		if (i == 0 || (valid && key_val < v)) {
+			sos_key_set(key, &v, sizeof(v));
+			valid = (0 == sos_iter_sup(iter, key));
+			if (valid) {
+				rc = __iter_entry(iter, from_attr, &key_val,
+						  to_attr, &to_val);
+				if (rc)
+					goto out;
+			}
+		}
+		/*
+		 * The iterator is at the first entry >= v (or past the last
+		 * entry), so v has an entry iff it is at v.
+		 */
+		hit = valid && key_val == v;
+		for (k = i; k < j; k++) {
+			out[ent[k].idx] = hit?to_val:0;
+			found[ent[k].idx] = hit;
+		}
+	}
+	rc = 0;
+ out:
+	if (iter)
+		sos_iter_free(iter);
+	free(ent);
+	return rc;
+}
+
+int map_transform_many(map_t map, const uint64_t *src, uint64_t *dst,
+		       uint8_t *found, size_t n)
+{
+	if (map->cache)
+		return __cache_find_many(map->cache, 0, src, dst, found, n);
+	return __xform_many(map->src_attr, map->tgt_attr, src, dst, found, n);
+}
+
+int map_inverse_many(map_t map, const uint64_t *dst, uint64_t *src,
+		     uint8_t *found, size_t n)
+{
+	if (map->cache)
+		return __cache_find_many(map->cache, 1, dst, src, found, n);
+	return __xform_many(map->tgt_attr, map->src_attr, dst, src, found, n);
+}
+
+/* Entries added per batch by map_entries_load()/map_entries_load_csv() */
+#define MAP_LOAD_BATCH (1024 * 1024)
+
+/* Order by source, then by target */
+static int __entry_cmp(const void *_a, const void *_b)
+{
+	const struct map_pair *a = _a, *b = _b;
+	if (a->key != b->key)
+		return (a->key < b->key)?-1:1;
+	if (a->val != b->val)
+		return (a->val < b->val)?-1:1;
+	return 0;
+}
+
+static
+int __entries_load(map_t map, const uint64_t *src, const uint64_t *tgt,
+		   size_t n, struct map_load_stats *stats)
+{
+	struct map_pair *p, *e;
+	uint64_t *keys = NULL, *vals = NULL;
+	uint8_t *found = NULL;
+	sos_value_data_t data;
+	sos_obj_t obj;
+	size_t i, m, k;
+	int rc;
+
+	if (!n)
+		return 0;
+	p = malloc(n * sizeof(*p));
+	if (!p)
+		return ENOMEM;
+	for (i = m = 0; i < n; i++) {
+		if (!src[i] || !tgt[i]) {
+			/* map_entry_new() rejects zeros too */
+			stats->rejected++;
+			continue;
+		}
+		p[m].key = src[i];
+		p[m].val = tgt[i];
+		m++;
+	}
+	qsort(p, m, sizeof(*p), __entry_cmp);
+	/*
+	 * Keep one entry per source: the other entries of a source are
+	 * duplicates (same target) or conflicts (another target).
+	 */
+	for (i = k = 0; i < m; i++) {
+		if (k && p[k-1].key == p[i].key) {
+			if (p[k-1].val == p[i].val)
+				stats->duplicates++;
+			else
+				stats->rejected++;
+			continue;
+		}
+		p[k++] = p[i];
+	}
+	m = k;
+	keys = malloc(m * sizeof(*keys));
+	vals = malloc(m * sizeof(*vals));
+	found = malloc(m);
+	if (m && (!keys || !vals || !found)) {
+		rc = ENOMEM;
+		goto out;
+	}
+	for (i = 0; i < m; i++)
+		keys[i] = p[i].key;
+	/* ... and against the entries already in the map */
+	rc = map_transform_many(map, keys, vals, found, m);
+	if (rc)
+		goto out;
+	for (i = k = 0; i < m; i++) {
+		if (found[i]) {
+			if (vals[i] == p[i].val)
+				stats->duplicates++;
+			else
+				stats->rejected++;
+			continue;
+		}
+		p[k++] = p[i];
+	}
+	m = k;
+	for (i = 0; i < m; i++) {
+		e = &p[i];
+		obj = sos_obj_new(map->schema);
+		if (!obj) {
+			rc = errno?errno:ENOMEM;
+			goto out;
+		}
+		data = sos_obj_attr_data(obj, map->src_attr, NULL);
+		data->prim.uint64_ = e->key;
+		data = sos_obj_attr_data(obj, map->tgt_attr, NULL);
+		data->prim.uint64_ = e->val;
+		rc = sos_obj_index(obj);
+		sos_obj_put(obj);
+		if (rc)
+			goto out;
+		stats->added++;
+	}
+	if (map->cache) {
+		struct map_cache *c = map->cache;
+		pthread_rwlock_wrlock(&c->lock);
+		rc = __cache_reserve(c, c->count + m);
+		if (!rc) {
+			for (i = 0; i < m; i++) {
+				c->fwd[c->count + i] = p[i];
+				c->inv[c->count + i].key = p[i].val;
+				c->inv[c->count + i].val = p[i].key;
+			}
+			c->count += m;
+			qsort(c->fwd, c->count, sizeof(*c->fwd), __pair_cmp);
+			qsort(c->inv, c->count, sizeof(*c->inv), __pair_cmp);
+		}
+		pthread_rwlock_unlock(&c->lock);
+	}
+ out:
+	free(found);
+	free(vals);
+	free(keys);
+	free(p);
+	return rc;
+}
+
+int map_entries_load(map_t map, const uint64_t *src, const uint64_t *tgt,
+		     size_t n, struct map_load_stats *stats)
+{
+	size_t i, len;
+	int rc = 0;
+
+	memset(stats, 0, sizeof(*stats));
+	for (i = 0; i < n; i += len) {
+		len = (n - i < MAP_LOAD_BATCH)?(n - i):MAP_LOAD_BATCH;
+		rc = __entries_load(map, &src[i], &tgt[i], len, stats);
+		if (rc)
+			break;
+	}
+	sos_container_commit(map->sos, SOS_COMMIT_SYNC);
+	return rc;
+}
+
+int map_entries_load_csv(map_t map, const char *path,
+			 struct map_load_stats *stats)
+{
+	FILE *f;
+	char *line = NULL, *p, *end;
+	size_t line_sz = 0, n = 0;
+	uint64_t *src, *tgt;
+	int rc = 0;
+
+	memset(stats, 0, sizeof(*stats));
+	f = fopen(path, "r");
+	if (!f)
+		return errno;
+	src = malloc(MAP_LOAD_BATCH * sizeof(*src));
+	tgt = malloc(MAP_LOAD_BATCH * sizeof(*tgt));
+	if (!src || !tgt) {
+		rc = ENOMEM;
+		goto out;
+	}
+	while (getline(&line, &line_sz, f) > 0) {
+		p = line;
+		while (isspace(*p))
+			p++;
+		if (*p == '\0' || *p == '#')
+			continue;
+		src[n] = strtoull(p, &end, 0);
+		if (end == p) {
+			stats->rejected++;
+			continue;
+		}
+		p = end;
+		while (isspace(*p))
+			p++;
+		if (*p != ',') {
+			stats->rejected++;
+			continue;
+		}
+		p++;
+		tgt[n] = strtoull(p, &end, 0);
+		while (isspace(*end))
+			end++;
+		if (end == p || *end != '\0') {
+			stats->rejected++;
+			continue;
+		}
+		if (++n == MAP_LOAD_BATCH) {
+			rc = __entries_load(map, src, tgt, n, stats);
+			if (rc)
+				goto out;
+			n = 0;
+		}
+	}
+	rc = __entries_load(map, src, tgt, n, stats);
+ out:
+	sos_container_commit(map->sos, SOS_COMMIT_SYNC);
+	free(line);
+	free(src);
+	free(tgt);
+	fclose(f);
+	return rc;
+}
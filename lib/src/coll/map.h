@@ -1,6 +1,7 @@
 #ifndef __MAP_H_
 #define __MAP_H_
 
+#include <stddef.h>
 #include <inttypes.h>
 
 struct map_s;
@@ -16,6 +17,15 @@ int map_new(const char *path, const char *name);
 int map_close(map_t map_s);
 /* create a new map */
 map_t map_open(char *path, char *map_name);
+/*
+ * Open a map with its entries cached in memory. The lookups are answered
+ * from the cache and map_entry_new() writes through to both the cache and
+ * the container. Entries added to the container by other processes are
+ * seen after map_cache_reload().
+ */
+map_t map_open_cached(char *path, char *map_name);
+/* Reload the cache of a map from its container */
+int map_cache_reload(map_t map_s);
 /* Add new object to map */
 int map_entry_new(map_t map_s, char *obj_cols);
 /* Return inverse value for transform val */
@@ -67,4 +77,52 @@ int map_inverse_ge(map_t map, uint64_t dst, uint64_t *src);
  * \retval ENOENT If no more entry can be found.
  */
 int map_inverse_le(map_t map, uint64_t dst, uint64_t *src);
+
+/**
+ * Transform \c n source values at once.
+ *
+ * \c dst[i] is set from the entry of \c src[i] and \c found[i] is set to
+ * 1, or both are set to 0 if \c src[i] has no entry. The values are
+ * sorted and merged against the source index, so a large batch costs far
+ * less than \c n calls of map_transform().
+ *
+ * \retval 0 If the values are transformed.
+ * \retval errno If an error occurred.
+ */
+int map_transform_many(map_t map, const uint64_t *src, uint64_t *dst,
+		       uint8_t *found, size_t n);
+
+/**
+ * Inverse transform \c n target values at once (see map_transform_many()).
+ */
+int map_inverse_many(map_t map, const uint64_t *dst, uint64_t *src,
+		     uint8_t *found, size_t n);
+
+struct map_load_stats {
+	size_t added;		/* entries added to the map */
+	size_t duplicates;	/* entries already in the map or the input */
+	size_t rejected;	/* zero values, malformed lines, or a source
+				 * already mapped to another target */
+};
+
+/**
+ * Add the \c n entries [src[i], tgt[i]] to the map.
+ *
+ * The entries are validated and deduplicated (see \c map_load_stats),
+ * sorted and added in batches, and the container is committed once.
+ *
+ * \retval 0 If the entries are loaded; \c stats tells which were added.
+ * \retval errno If an error occurred. The entries counted in \c stats
+ *               were added.
+ */
+int map_entries_load(map_t map, const uint64_t *src, const uint64_t *tgt,
+		     size_t n, struct map_load_stats *stats);
+
+/**
+ * Add the entries in the CSV file \c path, of "source,target" lines, to
+ * the map (see map_entries_load()). Blank lines and lines starting with
+ * '#' are skipped.
+ */
+int map_entries_load_csv(map_t map, const char *path,
+			 struct map_load_stats *stats);
 #endif
@@ -1,8 +1,23 @@
 #ifndef __MAP_PRIV_H_
 #define __MAP_PRIV_H_
 
+#include <pthread.h>
 #include <sos/sos.h>
 
+struct map_pair {
+	uint64_t key;
+	uint64_t val;
+};
+
+/* In-memory copy of the map entries (see map_open_cached()) */
+struct map_cache {
+	pthread_rwlock_t lock;
+	size_t count;
+	size_t alloc;
+	struct map_pair *fwd; /* [source, target], sorted by source */
+	struct map_pair *inv; /* [target, source], sorted by target */
+};
+
 struct map_s {
 	sos_t sos;
 	sos_schema_t schema;
@@ -10,6 +25,7 @@ struct map_s {
 	sos_attr_t tgt_attr;
 	sos_iter_t src_iter;
 	sos_iter_t tgt_iter;
+	struct map_cache *cache; /* NULL if not cached */
 };
 
 #endif
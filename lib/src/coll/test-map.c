@@ -0,0 +1,301 @@
+/*
+ * Test of the map lookups and loads against a scratch container.
+ *
+ *   test_map [container_path]
+ *
+ * The container is created in a temporary directory (and removed) unless
+ * a path is given. Every lookup is checked against a reference computed
+ * from the entries in the map, on both an uncached and a cached map.
+ * Returns 0 if ok or the line number of the failed check if not.
+ */
+#define _GNU_SOURCE
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <errno.h>
+#include <inttypes.h>
+#include <unistd.h>
+#include <limits.h>
+#include <ftw.h>
+#include "map.h"
+
+#define CHECK(cond) do { \
+	if (!(cond)) { \
+		printf("%s:%d: check failed: %s\n", __FILE__, __LINE__, #cond); \
+		return __LINE__; \
+	} \
+} while (0)
+
+#define NENT 50
+
+/* The entries in the map: [10*i, 1000 + 10*i] */
+static uint64_t ref_src[NENT + 8];
+static size_t ref_n;
+
+static void ref_add(uint64_t src)
+{
+	size_t i = ref_n++;
+	while (i && ref_src[i-1] > src) {
+		ref_src[i] = ref_src[i-1];
+		i--;
+	}
+	ref_src[i] = src;
+}
+
+static int ref_has(uint64_t src)
+{
+	size_t i;
+	for (i = 0; i < ref_n; i++) {
+		if (ref_src[i] == src)
+			return 1;
+	}
+	return 0;
+}
+
+/* The source nearest to \c v (>= if \c is_ge, <= otherwise), or 0 */
+static uint64_t ref_near(uint64_t v, int is_ge)
+{
+	size_t i;
+	if (is_ge) {
+		for (i = 0; i < ref_n; i++) {
+			if (ref_src[i] >= v)
+				return ref_src[i];
+		}
+	} else {
+		for (i = ref_n; i; i--) {
+			if (ref_src[i-1] <= v)
+				return ref_src[i-1];
+		}
+	}
+	return 0;
+}
+
+#define TGT(src) (1000 + (src))
+
+static int check_many(map_t map, const char *what)
+{
+	/* below min, hits, miss between entries, duplicate inputs, max,
+	 * above max, then a dense run and a sparse tail */
+	uint64_t in[] = { 5, 10, 15, 10, 500, 700, 250, 20, 30, 40, 50,
+			  60, 70, 15, 480, 1, UINT64_MAX, 500 };
+	size_t n = sizeof(in) / sizeof(in[0]);
+	uint64_t out[sizeof(in) / sizeof(in[0])];
+	uint64_t tin[sizeof(in) / sizeof(in[0])];
+	uint8_t found[sizeof(in) / sizeof(in[0])];
+	size_t i;
+	int hit;
+
+	memset(out, 0xff, sizeof(out));
+	memset(found, 0xff, sizeof(found));
+	CHECK(0 == map_transform_many(map, in, out, found, n));
+	for (i = 0; i < n; i++) {
+		hit = ref_has(in[i]);
+		if (found[i] != hit || out[i] != (hit?TGT(in[i]):0)) {
+			printf("%s: transform_many(%" PRIu64 ") = %d, %"
+			       PRIu64 "\n", what, in[i], found[i], out[i]);
+			return __LINE__;
+		}
+	}
+	for (i = 0; i < n; i++)
+		tin[i] = TGT(in[i]);
+	memset(out, 0xff, sizeof(out));
+	memset(found, 0xff, sizeof(found));
+	CHECK(0 == map_inverse_many(map, tin, out, found, n));
+	for (i = 0; i < n; i++) {
+		hit = ref_has(in[i]);
+		if (found[i] != hit || out[i] != (hit?in[i]:0)) {
+			printf("%s: inverse_many(%" PRIu64 ") = %d, %"
+			       PRIu64 "\n", what, tin[i], found[i], out[i]);
+			return __LINE__;
+		}
+	}
+	CHECK(0 == map_transform_many(map, in, out, found, 0));
+	return 0;
+}
+
+static int check_near(map_t map, const char *what)
+{
+	/* exact, between entries, below min, above max */
+	uint64_t in[] = { 0, 1, 9, 10, 11, 15, 250, 255, 499, 500, 501,
+			  599, 600, 601, UINT64_MAX };
+	size_t n = sizeof(in) / sizeof(in[0]);
+	uint64_t v, exp;
+	size_t i;
+	int rc, is_ge;
+
+	for (i = 0; i < n; i++) {
+		for (is_ge = 0; is_ge < 2; is_ge++) {
+			exp = ref_near(in[i], is_ge);
+			v = 0;
+			rc = is_ge?map_transform_ge(map, in[i], &v):
+				   map_transform_le(map, in[i], &v);
+			if (rc != (exp?0:ENOENT) || (exp && v != TGT(exp))) {
+				printf("%s: transform_%s(%" PRIu64 ") = %d, %"
+				       PRIu64 "\n", what, is_ge?"ge":"le",
+				       in[i], rc, v);
+				return __LINE__;
+			}
+			/* the targets are ordered as the sources */
+			if (in[i] > UINT64_MAX - 1000)
+				continue;
+			v = 0;
+			rc = is_ge?map_inverse_ge(map, TGT(in[i]), &v):
+				   map_inverse_le(map, TGT(in[i]), &v);
+			if (rc != (exp?0:ENOENT) || (exp && v != exp)) {
+				printf("%s: inverse_%s(%" PRIu64 ") = %d, %"
+				       PRIu64 "\n", what, is_ge?"ge":"le",
+				       TGT(in[i]), rc, v);
+				return __LINE__;
+			}
+		}
+	}
+	CHECK(0 == map_transform_min(map, &v) && v == TGT(ref_src[0]));
+	CHECK(0 == map_transform_max(map, &v) && v == TGT(ref_src[ref_n-1]));
+	CHECK(0 == map_inverse_min(map, &v) && v == ref_src[0]);
+	CHECK(0 == map_inverse_max(map, &v) && v == ref_src[ref_n-1]);
+	return 0;
+}
+
+static int check_one(map_t map, uint64_t src, int hit)
+{
+	uint64_t v = 0;
+	if (hit) {
+		CHECK(0 == map_transform(map, src, &v) && v == TGT(src));
+		CHECK(0 == map_inverse(map, TGT(src), &v) && v == src);
+	} else {
+		CHECK(0 != map_transform(map, src, &v));
+	}
+	return 0;
+}
+
+static int rm_ent(const char *path, const struct stat *st, int flag,
+		  struct FTW *ftw)
+{
+	return remove(path);
+}
+
+int main(int argc, char **argv)
+{
+	char tmp[] = "/tmp/test_map.XXXXXX";
+	char path[PATH_MAX], csv[PATH_MAX + 8], cols[32];
+	uint64_t src, lsrc[8], ltgt[8];
+	struct map_load_stats st;
+	map_t m, c;
+	FILE *f;
+	size_t i, n;
+	int rc;
+
+	if (argc > 1) {
+		snprintf(path, sizeof(path), "%s", argv[1]);
+	} else {
+		if (!mkdtemp(tmp)) {
+			printf("mkdtemp: %s\n", strerror(errno));
+			return __LINE__;
+		}
+		snprintf(path, sizeof(path), "%s/cont", tmp);
+	}
+	CHECK(0 == map_container_new(path));
+	CHECK(0 == map_new(path, "test"));
+	m = map_open(path, "test");
+	CHECK(m);
+
+	for (n = 0; n < NENT; n++) {
+		src = 10 * (n + 1);
+		snprintf(cols, sizeof(cols), "%" PRIu64 ",%" PRIu64,
+			 src, TGT(src));
+		CHECK(0 == map_entry_new(m, cols));
+		ref_add(src);
+	}
+
+	c = map_open_cached(path, "test");
+	CHECK(c);
+
+	/* the cached results are the uncached results */
+	for (i = 0; i < 2; i++) {
+		map_t map = i?c:m;
+		const char *what = i?"cached":"uncached";
+		rc = check_many(map, what);
+		if (rc)
+			return rc;
+		rc = check_near(map, what);
+		if (rc)
+			return rc;
+		for (n = 0; n < 4; n++) {
+			src = 10 * (n + 1);
+			rc = check_one(map, src, 1) ||
+			     check_one(map, src + 5, 0);
+			CHECK(rc == 0);
+		}
+	}
+
+	/* the cache is written through, and reloaded from the container */
+	strcpy(cols, "700,1700");
+	CHECK(0 == map_entry_new(c, cols));
+	ref_add(700);
+	rc = check_one(c, 700, 1) || check_one(m, 700, 1);
+	CHECK(rc == 0);
+	strcpy(cols, "800,1800");
+	CHECK(0 == map_entry_new(m, cols));
+	rc = check_one(c, 800, 0);
+	CHECK(rc == 0);
+	CHECK(0 == map_cache_reload(c));
+	ref_add(800);
+	rc = check_many(c, "reloaded") || check_near(c, "reloaded");
+	CHECK(rc == 0);
+	CHECK(EINVAL == map_cache_reload(m));
+
+	/* load(): zeros, duplicates and conflicts in the input and against
+	 * the entries already in the map */
+	n = 0;
+	lsrc[n] = 1100;	ltgt[n++] = TGT(1100);	/* added */
+	lsrc[n] = 0;	ltgt[n++] = 1;		/* rejected */
+	lsrc[n] = 1110;	ltgt[n++] = 0;		/* rejected */
+	lsrc[n] = 1100;	ltgt[n++] = TGT(1100);	/* duplicate in the input */
+	lsrc[n] = 1100;	ltgt[n++] = 9999;	/* conflict in the input */
+	lsrc[n] = 10;	ltgt[n++] = TGT(10);	/* duplicate */
+	lsrc[n] = 20;	ltgt[n++] = 7777;	/* conflict */
+	lsrc[n] = 1120;	ltgt[n++] = TGT(1120);	/* added */
+	CHECK(0 == map_entries_load(c, lsrc, ltgt, n, &st));
+	CHECK(st.added == 2 && st.duplicates == 2 && st.rejected == 4);
+	ref_add(1100);
+	ref_add(1120);
+	rc = check_many(c, "load") || check_near(c, "load") ||
+	     check_near(m, "load");
+	CHECK(rc == 0);
+	CHECK(0 == map_entries_load(c, lsrc, ltgt, 0, &st));
+	CHECK(st.added == 0 && st.duplicates == 0 && st.rejected == 0);
+
+	/* load_csv(): comments, blank and malformed lines */
+	snprintf(csv, sizeof(csv), "%s.csv", path);
+	f = fopen(csv, "w");
+	CHECK(f);
+	fprintf(f, "# source,target\n"
+		   "\n"
+		   "   \n"
+		   "  900 , 1900\n"		/* added */
+		   "0x384,1900\n"		/* duplicate */
+		   "10,1010\n"			/* duplicate */
+		   "20,1\n"			/* conflict */
+		   "0,5\n"			/* zero */
+		   "bad\n"
+		   "1000\n"
+		   "1000,\n"
+		   "1000,x\n"
+		   "1000,2000 x\n");
+	fclose(f);
+	CHECK(0 == map_entries_load_csv(c, csv, &st));
+	CHECK(st.added == 1 && st.duplicates == 2 && st.rejected == 7);
+	ref_add(900);
+	rc = check_many(c, "csv") || check_near(c, "csv") ||
+	     check_near(m, "csv");
+	CHECK(rc == 0);
+	CHECK(ENOENT == map_entries_load_csv(c, "/nonexistent/map.csv", &st));
+	unlink(csv);
+
+	map_close(c);
+	map_close(m);
+	if (argc < 2)
+		nftw(tmp, rm_ent, 16, FTW_DEPTH | FTW_PHYS);
+	printf("test_map: ok\n");
+	return 0;
+}
@@ -46,9 +46,9 @@ jbuf_t jbuf_append_va(jbuf_t jb, const char *fmt, va_list _ap)
 	space = jb->buf_len - jb->cursor;
 	cnt = vsnprintf(&jb->buf[jb->cursor], space, fmt, ap);
 	va_end(ap);
-	if (cnt > space) {
+	if (cnt >= space) {
 		space = jb->buf_len + cnt + JSON_BUF_START_LEN;
-		_jb = realloc(jb, space);
+		_jb = realloc(jb, sizeof(*jb) + space);
 		if (_jb) {
 			jb = _jb;
 			jb->buf_len = space;
@@ -303,6 +303,10 @@ json_entity_t json_entity_new(enum json_value_e type, ...)
 		e = json_dict_new();
 		break;
 	case JSON_NULL_VALUE:
+		e = malloc(sizeof *e);
+		if (!e)
+			goto out;
+		e->type = type;
 		break;
 	default:
 		assert(0 == "Invalid entity type");